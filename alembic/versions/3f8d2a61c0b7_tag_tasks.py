@@ -0,0 +1,35 @@
+"""Tag tasks
+
+Revision ID: 3f8d2a61c0b7
+Revises: e5b1c27a9d40
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f8d2a61c0b7'
+down_revision: Union[str, None] = 'e5b1c27a9d40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('tasks',
+    sa.Column('tags', postgresql.ARRAY(sa.Text()), server_default='{}', nullable=False)
+    )
+    op.add_column('tasks_archive',
+    sa.Column('tags', postgresql.ARRAY(sa.Text()), server_default='{}', nullable=False)
+    )
+    op.create_index('ix_tasks_tags', 'tasks', ['tags'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tasks_tags', table_name='tasks', postgresql_using='gin')
+    op.drop_column('tasks_archive', 'tags')
+    op.drop_column('tasks', 'tags')
@@ -0,0 +1,36 @@
+"""Add subtasks
+
+Revision ID: 7c4e9b05d2a3
+Revises: 3f8d2a61c0b7
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c4e9b05d2a3'
+down_revision: Union[str, None] = '3f8d2a61c0b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('tasks', sa.Column('parent_id', sa.Integer(), nullable=True))
+    op.add_column('tasks',
+    sa.Column('path', sa.String().with_variant(sa.String(collation='C'), 'postgresql'), server_default='', nullable=False)
+    )
+    op.create_foreign_key('tasks_parent_id_fkey', 'tasks', 'tasks', ['parent_id'], ['id'], ondelete='CASCADE')
+    op.create_index(op.f('ix_tasks_parent_id'), 'tasks', ['parent_id'], unique=False)
+    op.create_index('ix_tasks_user_id_path', 'tasks', ['user_id', 'path'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tasks_user_id_path', table_name='tasks')
+    op.drop_index(op.f('ix_tasks_parent_id'), table_name='tasks')
+    op.drop_constraint('tasks_parent_id_fkey', 'tasks', type_='foreignkey')
+    op.drop_column('tasks', 'path')
+    op.drop_column('tasks', 'parent_id')
@@ -0,0 +1,46 @@
+"""Archive completed tasks
+
+Revision ID: a85036e23be2
+Revises: 0dba396579cb
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a85036e23be2'
+down_revision: Union[str, None] = '0dba396579cb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('tasks',
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False)
+    )
+    op.create_index('ix_tasks_completed_updated_at', 'tasks', ['updated_at'], unique=False,
+    postgresql_where=sa.text("status = 'completed'"))
+    op.create_table('tasks_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('title', sa.String(), nullable=False),
+    sa.Column('description', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_tasks_archive_user_id'), 'tasks_archive', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_tasks_archive_user_id'), table_name='tasks_archive')
+    op.drop_table('tasks_archive')
+    op.drop_index('ix_tasks_completed_updated_at', table_name='tasks',
+    postgresql_where=sa.text("status = 'completed'"))
+    op.drop_column('tasks', 'updated_at')
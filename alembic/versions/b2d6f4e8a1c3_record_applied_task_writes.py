@@ -0,0 +1,36 @@
+"""Record applied task writes
+
+Revision ID: b2d6f4e8a1c3
+Revises: 7c4e9b05d2a3
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2d6f4e8a1c3'
+down_revision: Union[str, None] = '7c4e9b05d2a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('applied_task_writes',
+    sa.Column('write_id', sa.String(), nullable=False),
+    sa.Column('entry_id', sa.String(), nullable=False),
+    sa.Column('task_id', sa.Integer(), nullable=True),
+    sa.Column('applied_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('write_id')
+    )
+    op.create_index(op.f('ix_applied_task_writes_task_id'), 'applied_task_writes', ['task_id'], unique=False)
+    op.create_index(op.f('ix_applied_task_writes_applied_at'), 'applied_task_writes', ['applied_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_applied_task_writes_applied_at'), table_name='applied_task_writes')
+    op.drop_index(op.f('ix_applied_task_writes_task_id'), table_name='applied_task_writes')
+    op.drop_table('applied_task_writes')
@@ -0,0 +1,52 @@
+"""Order tasks by position
+
+Revision ID: e5b1c27a9d40
+Revises: a85036e23be2
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from itertools import groupby
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from api.db.fractional_index import keys_after
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b1c27a9d40'
+down_revision: Union[str, None] = 'a85036e23be2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('tasks',
+    sa.Column('position', sa.String().with_variant(sa.String(collation='C'), 'postgresql'), nullable=True)
+    )
+    # Existing tasks keep the order of their IDs.
+    tasks = sa.table('tasks', sa.column('id'), sa.column('user_id'), sa.column('position'))
+    connection = op.get_bind()
+    rows = connection.execute(
+        sa.select(tasks.c.id, tasks.c.user_id).order_by(tasks.c.user_id, tasks.c.id)
+    )
+    updates = [
+        {'task_id': task_id, 'new_position': position}
+        for _, user_tasks in groupby(rows, key=lambda row: row.user_id)
+        for (task_id, _), position in zip(user_tasks, keys_after(None))
+    ]
+    if updates:
+        connection.execute(
+            tasks.update()
+            .where(tasks.c.id == sa.bindparam('task_id'))
+            .values(position=sa.bindparam('new_position')),
+            updates,
+        )
+    op.alter_column('tasks', 'position', nullable=False)
+    op.create_index('ix_tasks_user_id_position', 'tasks', ['user_id', 'position', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tasks_user_id_position', table_name='tasks')
+    op.drop_column('tasks', 'position')
@@ -16,6 +16,21 @@ Components of the package:
 5. The 'main' module acts as the central module where the initialization and
     configuration of the web server and its components take place.
 6. The 'redis_client' contains connecting to Redis.
+7. The 'write_behind' package contains the write-behind mode for
+    task writes and its worker.
+8. The 'jobs' package contains the background job queue.
+9. The 'worker' module runs background jobs with `python -m api.worker`.
+10. The 'startup' module contains the work deferred from import time
+    and the startup profile `python -m api.startup --profile-startup`.
+11. The 'serve' module runs the API in several worker processes
+    with `python -m api.serve`.
+12. The 'metrics' module contains the Prometheus metrics.
+13. The 'diagnostics' module contains the sampling profiler and the
+    event loop lag monitor.
+14. The 'admin_token' module creates admin tokens for the diagnostics
+    endpoints with `python -m api.admin_token`.
+15. The 'load_shedding' module contains the adaptive concurrency limit
+    and the priorities of the requests.
 """
 
 __all__ = "settings"
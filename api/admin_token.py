@@ -0,0 +1,16 @@
+import argparse
+import asyncio
+
+from api.routers.auth.auth_helpers import create_admin_token
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Create an admin token for the diagnostics endpoints.",
+    )
+    parser.add_argument(
+        "--subject",
+        required=True,
+        help="who the token is issued to, e.g. the name of an operator",
+    )
+    args = parser.parse_args()
+    print(asyncio.run(create_admin_token(args.subject)))
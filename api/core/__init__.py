@@ -8,6 +8,12 @@ Components of the package.
     tables and records.
 3. The 'schemas' module contains schemas to validate the
     transmitted data and send a response.
+4. The 'lazy' module contains the proxy that defers the creation
+    of module-level singletons to their first use.
+5. The 'timing' module contains the per-request Server-Timing
+    instrumentation.
+6. The 'deadline' module contains the deadline of the current request
+    that bounds its database statements and Redis calls.
 """
 
 __all__ = (
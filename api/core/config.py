@@ -1,11 +1,52 @@
 import os
+from functools import cache
 from pathlib import Path
 
 from dotenv import load_dotenv
-from pydantic_settings import BaseSettings
+from pydantic import Field, model_validator
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+from api.core.lazy import LazyObject
 
 BASE_DIR = Path.cwd().resolve()
-load_dotenv()
+
+ACCESS_TOKEN_TYPE = "access"
+REFRESH_TOKEN_TYPE = "refresh"
+ADMIN_TOKEN_TYPE = "admin"
+
+
+def env_default(name: str, default: str | None = None):
+    """
+    Declare a field whose default is read from an environment variable
+    when the settings are created rather than when they are imported.
+
+    Parameters
+    ----------
+    name : str
+        The name of the environment variable.
+    default : str, optional
+        The value used if the variable is not set.
+    """
+    return Field(default_factory=lambda: os.environ.get(name, default))
+
+
+def env_list_default(name: str, default: str = ""):
+    """
+    Declare a list field whose default is read from a comma-separated
+    environment variable when the settings are created.
+
+    Parameters
+    ----------
+    name : str
+        The name of the environment variable.
+    default : str, optional
+        The comma-separated value used if the variable is not set.
+    """
+    return Field(
+        default_factory=lambda: [
+            item for item in os.environ.get(name, default).split(",") if item
+        ]
+    )
 
 
 class DbSettings(BaseSettings):
@@ -33,6 +74,90 @@ class DbSettings(BaseSettings):
         The connection string for the database in the
         postgresql+asyncpg format, constructed based on the other
         attributes.
+    replica_urls : list[str]
+        Connection strings of the read replicas. Obtained from the
+        comma-separated environment variable DB_REPLICA_URLS.
+        Defaults to an empty list, in which case every query goes
+        to the primary.
+    replica_health_check_interval : float
+        Seconds between health checks of the read replicas.
+        Defaults to 5.
+    read_your_writes_window : float
+        Seconds after a user's write during which that user's reads
+        are still sent to the primary. Defaults to 2.
+    last_write_key_prefix : str
+        The prefix of the Redis keys that share a user's last write
+        between processes. Defaults to "db:last_write:".
+    pool_size : int
+        The number of connections kept open in the pool. Defaults to 5.
+    max_overflow : int
+        The number of connections that may be opened above
+        `pool_size` under load. Defaults to 10.
+    pool_timeout : float
+        Seconds to wait for a free connection before giving up.
+        Defaults to 30.
+    pool_recycle : int
+        Seconds after which a connection is replaced by a new one.
+        Defaults to 1800.
+    pool_pre_ping : bool
+        Whether to test a connection for liveness on checkout.
+        Defaults to False.
+    connect_timeout : float
+        Seconds to wait for a new connection to be established.
+        Defaults to 10.
+    statement_timeout : float
+        The default statement_timeout of the pooled connections in
+        seconds, which also bounds the queries of work without a
+        deadline, such as background jobs. Requests whose remaining
+        time differs from it set their own per transaction, so it is
+        best equal to `ServerSettings.request_timeout`. Zero disables
+        it. Defaults to 10.
+    statement_cache_size : int
+        The size of the asyncpg statement cache of each connection.
+        Defaults to 100.
+    prepared_statement_cache_size : int
+        The size of the SQLAlchemy prepared statement cache of each
+        asyncpg connection. Defaults to 100.
+    insert_batch_enabled : bool
+        Whether concurrent task inserts are coalesced into multi-row
+        INSERT statements. Defaults to False.
+    insert_batch_max_delay_ms : float
+        Milliseconds a task insert may wait for other inserts to join
+        its batch. Defaults to 2.
+    insert_batch_max_rows : int
+        The number of rows that makes a batch be written without
+        waiting any longer. Defaults to 100.
+    archive_enabled : bool
+        Whether completed tasks are moved to the tasks_archive table
+        in the background. Defaults to False.
+    archive_after_days : int
+        Days after its last change when a completed task is archived.
+        Defaults to 30.
+    archive_batch_size : int
+        The number of tasks moved in one transaction. Defaults to 1000.
+    archive_interval_seconds : float
+        Seconds between two runs of the archiver. Defaults to 300.
+    slow_query_threshold_ms : float
+        Milliseconds after which a query is logged as slow, with the
+        types of its parameters. Zero disables the log. Defaults to 200.
+    query_budget : int
+        The number of queries a request may run before it is logged
+        as over budget. Zero disables the check. Defaults to 20.
+    read_coalescing_enabled : bool
+        Whether identical concurrent reads of a user, such as the task
+        list and the user lookup of every request, share one query and
+        one serialized result. Defaults to True.
+    rebalance_enabled : bool
+        Whether the positions of the tasks of users are rewritten in
+        the background once they get too long. Defaults to True.
+    position_max_length : int
+        The longest position of a task that is not rebalanced.
+        Defaults to 24.
+    rebalance_batch_size : int
+        The number of users the rebalancer looks up at once.
+        Defaults to 100.
+    rebalance_interval_seconds : float
+        Seconds between two runs of the rebalancer. Defaults to 600.
 
     Notes
     -----
@@ -40,12 +165,79 @@ class DbSettings(BaseSettings):
     variables DB_USERNAME, DB_PASSWORD, and DB_NAME before using it.
     """
 
-    username: str = os.environ.get("DB_USERNAME")
-    password: str = os.environ.get("DB_PASSWORD")
+    username: str | None = env_default("DB_USERNAME")
+    password: str | None = env_default("DB_PASSWORD")
     host: str = "db"
     port: str = "5432"
-    name: str = os.environ.get("DB_NAME")
-    url: str = f"postgresql+asyncpg://{username}:{password}@db:{port}/{name}"
+    name: str | None = env_default("DB_NAME")
+    url: str = ""
+    replica_urls: list[str] = env_list_default("DB_REPLICA_URLS")
+    replica_health_check_interval: float = 5
+    read_your_writes_window: float = 2
+    last_write_key_prefix: str = "db:last_write:"
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = False
+    connect_timeout: float = 10
+    statement_timeout: float = 10
+    statement_cache_size: int = 100
+    prepared_statement_cache_size: int = 100
+    insert_batch_enabled: bool = False
+    insert_batch_max_delay_ms: float = 2
+    insert_batch_max_rows: int = 100
+    archive_enabled: bool = False
+    archive_after_days: int = 30
+    archive_batch_size: int = 1000
+    archive_interval_seconds: float = 300
+    slow_query_threshold_ms: float = 200
+    query_budget: int = 20
+    read_coalescing_enabled: bool = True
+    rebalance_enabled: bool = True
+    position_max_length: int = 24
+    rebalance_batch_size: int = 100
+    rebalance_interval_seconds: float = 600
+
+    @model_validator(mode="after")
+    def build_url(self) -> "DbSettings":
+        """
+        Build the connection string from the other attributes unless
+        it is given explicitly.
+        """
+        if not self.url:
+            self.url = (
+                f"postgresql+asyncpg://{self.username}:{self.password}"
+                f"@db:{self.port}/{self.name}"
+            )
+        return self
+
+    def engine_options(self) -> dict:
+        """
+        Return the pool and driver options for `create_async_engine`.
+
+        Returns
+        -------
+        dict
+            Keyword arguments for `create_async_engine`.
+        """
+        connect_args = {
+            "timeout": self.connect_timeout,
+            "statement_cache_size": self.statement_cache_size,
+            "prepared_statement_cache_size": self.prepared_statement_cache_size,
+        }
+        if self.statement_timeout:
+            connect_args["server_settings"] = {
+                "statement_timeout": str(int(self.statement_timeout * 1000))
+            }
+        return {
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "pool_timeout": self.pool_timeout,
+            "pool_recycle": self.pool_recycle,
+            "pool_pre_ping": self.pool_pre_ping,
+            "connect_args": connect_args,
+        }
 
 
 class RedisSettings(BaseSettings):
@@ -73,6 +265,37 @@ class RedisSettings(BaseSettings):
     redis_url : str
         The connection string for Redis in the format
         "redis://<username>:<password>@<host>:<port>/<redis_db>".
+    redis_max_connections : int
+        The maximum number of connections in the pool. Defaults to 50.
+    redis_socket_timeout : float
+        Seconds to wait for the reply to a command. Must exceed
+        `WriteBehindSettings.block_ms`. Defaults to 2.
+    redis_socket_connect_timeout : float
+        Seconds to wait for a new connection. Defaults to 1.
+    redis_health_check_interval : int
+        Seconds a pooled connection may stay idle before it is checked
+        with PING on its next use. Defaults to 30.
+    client_cache_enabled : bool
+        Whether reads of the keys matching `client_cache_prefixes` are
+        served from a local cache kept valid by Redis server-assisted
+        invalidation (CLIENT TRACKING). Defaults to False.
+    client_cache_max_keys : int
+        The maximum number of keys in the local cache. The least
+        recently used keys are evicted first. Defaults to 10000.
+    client_cache_prefixes : list[str]
+        Prefixes of the cached keys. Obtained from the comma-separated
+        environment variable REDIS_CACHE_PREFIXES.
+        Defaults to ["refresh_token_"].
+    circuit_breaker_failure_threshold : int
+        The number of consecutive Redis connection errors or timeouts
+        after which Redis calls fail fast. Defaults to 5.
+    circuit_breaker_reset_timeout : float
+        Seconds Redis calls fail fast before a probe call is let
+        through. Defaults to 5.
+    stateless_refresh_fallback : bool
+        Whether /refresh accepts a valid refresh token without checking
+        that it is stored in Redis while Redis is unavailable.
+        Defaults to True.
 
     Notes
     -----
@@ -83,13 +306,369 @@ class RedisSettings(BaseSettings):
     - REDIS_USER_PASSWORD
     """
 
-    redis_password: str = os.environ.get("REDIS_PASSWORD")
-    username: str = os.environ.get("REDIS_USER")
-    password: str = os.environ.get("REDIS_USER_PASSWORD")
+    redis_password: str | None = env_default("REDIS_PASSWORD")
+    username: str | None = env_default("REDIS_USER")
+    password: str | None = env_default("REDIS_USER_PASSWORD")
     port: str = "6379"
     host: str = "redis"
     redis_db: str = "0"
-    redis_url: str = f"redis://{username}:{password}@{host}:{port}/{redis_db}"
+    redis_url: str = ""
+    redis_max_connections: int = 50
+    redis_socket_timeout: float = 2
+    redis_socket_connect_timeout: float = 1
+    redis_health_check_interval: int = 30
+    client_cache_enabled: bool = False
+    client_cache_max_keys: int = 10000
+    client_cache_prefixes: list[str] = env_list_default(
+        "REDIS_CACHE_PREFIXES", "refresh_token_"
+    )
+    circuit_breaker_failure_threshold: int = 5
+    circuit_breaker_reset_timeout: float = 5
+    stateless_refresh_fallback: bool = True
+
+    @model_validator(mode="after")
+    def build_url(self) -> "RedisSettings":
+        """
+        Build the connection string from the other attributes unless
+        it is given explicitly.
+        """
+        if not self.redis_url:
+            self.redis_url = (
+                f"redis://{self.username}:{self.password}"
+                f"@{self.host}:{self.port}/{self.redis_db}"
+            )
+        return self
+
+
+class WriteBehindSettings(BaseSettings):
+    """
+    Represents the configuration parameters of the write-behind mode
+    for task writes.
+
+    In this mode task creates, updates and deletes are appended to a
+    Redis Stream and applied to the database by a separate worker.
+
+    Attributes
+    ----------
+    enabled : bool
+        Whether task writes go through the Redis Stream.
+        Defaults to False.
+    stream : str
+        The name of the stream with pending task writes.
+        Defaults to "tasks:writes".
+    group : str
+        The consumer group of the workers. Defaults to "tasks-writers".
+    dead_letter_stream : str
+        The stream that receives writes that failed too many times.
+        Defaults to "tasks:writes:dead".
+    pending_key_prefix : str
+        The prefix of the per-user hashes with writes that are not
+        applied yet. Defaults to "tasks:pending:".
+    batch_size : int
+        The maximum number of writes applied in one transaction.
+        Defaults to 100.
+    block_ms : int
+        Milliseconds a worker waits for new writes. Defaults to 1000.
+    retry_idle_ms : int
+        Milliseconds after which an unacknowledged write is retried.
+        Defaults to 30000.
+    max_retries : int
+        The number of deliveries after which a write is moved to the
+        dead-letter stream. Defaults to 5.
+    applied_retention_hours : float
+        Hours the IDs of applied writes are kept to recognize writes
+        delivered again, e.g. after a lost acknowledgement.
+        Defaults to 168.
+
+    Notes
+    -----
+    Every attribute can be overridden by an environment variable with
+    the WRITE_BEHIND_ prefix, e.g. WRITE_BEHIND_ENABLED.
+    """
+
+    model_config = SettingsConfigDict(env_prefix="WRITE_BEHIND_")
+
+    enabled: bool = False
+    stream: str = "tasks:writes"
+    group: str = "tasks-writers"
+    dead_letter_stream: str = "tasks:writes:dead"
+    pending_key_prefix: str = "tasks:pending:"
+    batch_size: int = 100
+    block_ms: int = 1000
+    retry_idle_ms: int = 30000
+    max_retries: int = 5
+    applied_retention_hours: float = 168
+
+
+class JobSettings(BaseSettings):
+    """
+    Represents the configuration parameters of the background job
+    queue and its workers.
+
+    Attributes
+    ----------
+    key_prefix : str
+        The prefix of all Redis keys of the queue. Defaults to "jobs:".
+    concurrency : int
+        The number of jobs a worker process runs at the same time.
+        Defaults to 4.
+    visibility_timeout : float
+        Seconds a running job may go without a heartbeat before it is
+        handed to another worker. Defaults to 300.
+    max_attempts : int
+        The default number of attempts of a job. Defaults to 3.
+    retry_backoff : float
+        Seconds before the first retry; every next retry waits twice
+        as long. Defaults to 5.
+    retry_backoff_max : float
+        The longest wait before a retry in seconds. Defaults to 300.
+    poll_interval : float
+        Seconds an idle worker waits before polling the queue again.
+        Defaults to 0.5.
+    result_ttl : int
+        Seconds a finished job and its result are kept.
+        Defaults to 604800 (7 days).
+    import_dir : Path
+        The directory shared by the API and the workers where uploaded
+        import files wait for their job. Defaults to "imports" in the
+        BASE_DIR.
+    import_inline_max_bytes : int
+        Uploads up to this size are imported during the request, larger
+        ones by a background job. Defaults to 1048576 (1 MiB).
+    import_chunk_size : int
+        The number of rows loaded by one COPY. Defaults to 10000.
+    import_max_errors : int
+        The number of row errors listed in an import report.
+        Defaults to 100.
+
+    Notes
+    -----
+    Every attribute can be overridden by an environment variable with
+    the JOBS_ prefix, e.g. JOBS_CONCURRENCY.
+    """
+
+    model_config = SettingsConfigDict(env_prefix="JOBS_")
+
+    key_prefix: str = "jobs:"
+    concurrency: int = 4
+    visibility_timeout: float = 300
+    max_attempts: int = 3
+    retry_backoff: float = 5
+    retry_backoff_max: float = 300
+    poll_interval: float = 0.5
+    result_ttl: int = 604800
+    import_dir: Path = BASE_DIR / "imports"
+    import_inline_max_bytes: int = 1048576
+    import_chunk_size: int = 10000
+    import_max_errors: int = 100
+
+
+class SubtaskSettings(BaseSettings):
+    """
+    Represents the limits of the trees of subtasks.
+
+    Attributes
+    ----------
+    max_depth : int
+        The number of levels of subtasks below a top-level task.
+        Defaults to 8.
+    max_children : int
+        The number of direct subtasks of a task. Defaults to 200.
+
+    Notes
+    -----
+    Every attribute can be overridden by an environment variable with
+    the SUBTASKS_ prefix, e.g. SUBTASKS_MAX_DEPTH.
+    """
+
+    model_config = SettingsConfigDict(env_prefix="SUBTASKS_")
+
+    max_depth: int = 8
+    max_children: int = 200
+
+
+class ServerSettings(BaseSettings):
+    """
+    Represents the configuration parameters of the HTTP server started
+    by `python -m api.serve`.
+
+    Attributes
+    ----------
+    host : str
+        The address the server binds to. Defaults to "0.0.0.0".
+    port : int
+        The port the server listens on. Defaults to 8000.
+    workers : int
+        The number of worker processes. Every worker has its own
+        database and Redis connection pools. Defaults to 1.
+    graceful_shutdown_timeout : int
+        Seconds a worker waits for running requests to finish after
+        SIGTERM before it closes them. Defaults to 30.
+    keep_alive_timeout : int
+        Seconds an idle keep-alive connection is kept open.
+        Defaults to 5.
+    backlog : int
+        The maximum number of connections waiting to be accepted.
+        Defaults to 2048.
+    warmup_enabled : bool
+        Whether every worker warms up before it reports ready: it opens
+        database connections, runs the hot queries, signs a token and
+        connects to Redis. Defaults to True.
+    warmup_connections : int
+        The number of connections opened in advance in the primary and
+        every replica pool. Defaults to 2.
+    warmup_retry_interval : float
+        Seconds before a failed warm-up is retried. Defaults to 5.
+    timing_enabled : bool
+        Whether requests report where their time went: auth, JWT, the
+        database, Redis and serialization. Defaults to False.
+    timing_sample_rate : float
+        The share of requests measured when timing is enabled, between
+        0 and 1. Defaults to 1.
+    timing_header : bool
+        Whether measured requests get a `Server-Timing` response header.
+        Every measured request is also logged. Defaults to True.
+    loop_monitor_enabled : bool
+        Whether every worker records the code that blocks its event
+        loop. Defaults to True.
+    loop_lag_threshold_ms : float
+        Milliseconds the event loop must be blocked to be recorded.
+        Defaults to 100.
+    loop_lag_history : int
+        The number of recorded blocks kept by every worker.
+        Defaults to 100.
+    profiler_max_seconds : float
+        The longest sampling profile an admin may request.
+        Defaults to 60.
+    request_timeout : float
+        Seconds a request may take before it is cancelled and answered
+        with status code 504. Its database transactions and Redis calls
+        are bounded by the same deadline. Zero disables deadlines.
+        Defaults to 10.
+    request_timeout_max : float
+        The longest timeout a client may ask for in the
+        `request_timeout_header`. Defaults to 60.
+    request_timeout_header : str
+        The request header with the timeout the client waits for, in
+        seconds. Defaults to "X-Request-Timeout".
+    route_request_timeouts : list[str]
+        Timeouts of the routes that differ from `request_timeout`, as
+        "path=seconds" rules; zero runs the route without a deadline.
+        Obtained from the comma-separated environment variable
+        SERVER_ROUTE_TIMEOUTS.
+
+    Notes
+    -----
+    Every other attribute can be overridden by an environment variable
+    with the SERVER_ prefix, e.g. SERVER_WORKERS.
+    """
+
+    model_config = SettingsConfigDict(env_prefix="SERVER_")
+
+    host: str = "0.0.0.0"
+    port: int = 8000
+    workers: int = 1
+    graceful_shutdown_timeout: int = 30
+    keep_alive_timeout: int = 5
+    backlog: int = 2048
+    warmup_enabled: bool = True
+    warmup_connections: int = 2
+    warmup_retry_interval: float = 5
+    timing_enabled: bool = False
+    timing_sample_rate: float = 1.0
+    timing_header: bool = True
+    loop_monitor_enabled: bool = True
+    loop_lag_threshold_ms: float = 100
+    loop_lag_history: int = 100
+    profiler_max_seconds: float = 60
+    request_timeout: float = 10
+    request_timeout_max: float = 60
+    request_timeout_header: str = "X-Request-Timeout"
+    route_request_timeouts: list[str] = env_list_default(
+        "SERVER_ROUTE_TIMEOUTS",
+        "/api/v1/tasks/import=60,/api/v1/service/profile=0",
+    )
+
+
+class LoadSheddingSettings(BaseSettings):
+    """
+    Represents the configuration parameters of the adaptive concurrency
+    limit of every worker.
+
+    Attributes
+    ----------
+    enabled : bool
+        Whether requests above the limit are rejected with status code
+        503. Defaults to False.
+    initial_limit : int
+        The number of concurrent requests allowed before any latency is
+        observed. Defaults to 20.
+    min_limit : int
+        The lowest limit. Defaults to 4.
+    max_limit : int
+        The highest limit. Defaults to 200.
+    tolerance : float
+        How much slower than the long-term latency requests may get
+        before the limit shrinks. Defaults to 1.5.
+    smoothing : float
+        The weight of every new estimate of the limit, between 0 and 1.
+        Defaults to 0.2.
+    backoff : float
+        The factor the limit is multiplied by when a request fails with
+        a server error. Defaults to 0.9.
+    retry_after : int
+        Seconds in the Retry-After header of rejected requests.
+        Defaults to 1.
+    high_priority_paths : list[str]
+        Requests that may use the whole limit. Obtained from the
+        comma-separated environment variable LOAD_SHEDDING_HIGH_PRIORITY.
+    low_priority_paths : list[str]
+        Requests that are rejected first: they may only use
+        `low_priority_share` of the limit. Obtained from the
+        comma-separated environment variable LOAD_SHEDDING_LOW_PRIORITY.
+    exempt_paths : list[str]
+        Requests that are never limited, such as the health probes.
+        Obtained from the comma-separated environment variable
+        LOAD_SHEDDING_EXEMPT.
+    normal_priority_share : float
+        The share of the limit other requests may use. Defaults to 0.9.
+    low_priority_share : float
+        The share of the limit low priority requests may use.
+        Defaults to 0.7.
+
+    Notes
+    -----
+    Paths are matched exactly, or as a prefix if they end with "*",
+    and may be preceded by an HTTP method, e.g. "GET /api/v1/tasks/".
+    Every other attribute can be overridden by an environment variable
+    with the LOAD_SHEDDING_ prefix, e.g. LOAD_SHEDDING_ENABLED.
+    """
+
+    model_config = SettingsConfigDict(env_prefix="LOAD_SHEDDING_")
+
+    enabled: bool = False
+    initial_limit: int = 20
+    min_limit: int = 4
+    max_limit: int = 200
+    tolerance: float = 1.5
+    smoothing: float = 0.2
+    backoff: float = 0.9
+    retry_after: int = 1
+    high_priority_paths: list[str] = env_list_default(
+        "LOAD_SHEDDING_HIGH_PRIORITY",
+        "/api/v1/auth/refresh,/api/v1/auth/login",
+    )
+    low_priority_paths: list[str] = env_list_default(
+        "LOAD_SHEDDING_LOW_PRIORITY",
+        "GET /api/v1/tasks/,/api/v1/tasks/import",
+    )
+    exempt_paths: list[str] = env_list_default(
+        "LOAD_SHEDDING_EXEMPT",
+        "/api/v1/service/health/*,/metrics,/api/v1/service/profile,"
+        "/api/v1/service/loop-lag",
+    )
+    normal_priority_share: float = 0.9
+    low_priority_share: float = 0.7
 
 
 class AuthJWT(BaseSettings):
@@ -113,6 +692,9 @@ class AuthJWT(BaseSettings):
     refresh_token_expire_days : int
         The expiration time for refresh tokens in days.
         Defaults to 30.
+    admin_token_expire_minutes : int
+        The expiration time for admin tokens in minutes.
+        Defaults to 15.
     TOKEN_TYPE_FIELD : str
         The field name used to specify the type of the token.
         Defaults to "type".
@@ -120,6 +702,9 @@ class AuthJWT(BaseSettings):
         The type identifier for access tokens. Defaults to "access".
     REFRESH_TOKEN_TYPE : str
         The type identifier for refresh tokens. Defaults to "refresh".
+    ADMIN_TOKEN_TYPE : str
+        The type identifier for admin tokens, which give access to the
+        diagnostics of the workers. Defaults to "admin".
 
     Notes
     -----
@@ -133,9 +718,11 @@ class AuthJWT(BaseSettings):
     algorithm: str = "RS256"
     access_token_expire_minutes: int = 15
     refresh_token_expire_days: int = 30
+    admin_token_expire_minutes: int = 15
     TOKEN_TIPE_FIELD: str = "type"
-    ACCESS_TOKEN_TYPE: str = "access"
-    REFRESH_TOKEN_TYPE: str = "refresh"
+    ACCESS_TOKEN_TYPE: str = ACCESS_TOKEN_TYPE
+    REFRESH_TOKEN_TYPE: str = REFRESH_TOKEN_TYPE
+    ADMIN_TOKEN_TYPE: str = ADMIN_TOKEN_TYPE
 
 
 class Settings(BaseSettings):
@@ -155,18 +742,53 @@ class Settings(BaseSettings):
     redis_settings : RedisSettings
         The configuration settings for connecting to and using a
         Redis server. Instantiated by default.
+    write_behind : WriteBehindSettings
+        The configuration settings of the write-behind mode for task
+        writes. Instantiated by default.
+    jobs : JobSettings
+        The configuration settings of the background job queue.
+        Instantiated by default.
+    subtasks : SubtaskSettings
+        The limits of the trees of subtasks. Instantiated by default.
+    server : ServerSettings
+        The configuration settings of the HTTP server.
+        Instantiated by default.
+    load_shedding : LoadSheddingSettings
+        The configuration settings of the adaptive concurrency limit.
+        Instantiated by default.
 
     Notes
     -----
     Ensure that each of the sub-configuration classes (`AuthJWT`,
-    `DbSettings`, `RedisSettings`) is properly defined and imported.
+    `DbSettings`, `RedisSettings`, `WriteBehindSettings`, `JobSettings`,
+    `SubtaskSettings`, `ServerSettings`, `LoadSheddingSettings`)
+    is properly defined and imported.
     This class combines these settings to facilitate centralized
     management and access to application-level configurations.
     """
 
-    auth_jwt: AuthJWT = AuthJWT()
-    db_settings: DbSettings = DbSettings()
-    redis_settings: RedisSettings = RedisSettings()
+    auth_jwt: AuthJWT = Field(default_factory=AuthJWT)
+    db_settings: DbSettings = Field(default_factory=DbSettings)
+    redis_settings: RedisSettings = Field(default_factory=RedisSettings)
+    write_behind: WriteBehindSettings = Field(default_factory=WriteBehindSettings)
+    jobs: JobSettings = Field(default_factory=JobSettings)
+    subtasks: SubtaskSettings = Field(default_factory=SubtaskSettings)
+    server: ServerSettings = Field(default_factory=ServerSettings)
+    load_shedding: LoadSheddingSettings = Field(default_factory=LoadSheddingSettings)
+
+
+@cache
+def get_settings() -> Settings:
+    """
+    Load the .env file and create the settings on first use.
+
+    Returns
+    -------
+    Settings
+        The settings of the application.
+    """
+    load_dotenv()
+    return Settings()
 
 
-settings = Settings()
+settings: Settings = LazyObject(get_settings)
@@ -0,0 +1,195 @@
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable
+
+from api.core.config import settings
+from api.core.lazy import LazyObject
+from api.load_shedding import PathRules
+
+# Seconds the statements and the calls bounded by the deadline get to
+# fail cleanly, e.g. by the statement_timeout of the server, before the
+# whole request is cancelled.
+CANCEL_GRACE = 0.25
+
+_deadline: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when the deadline of the current request has passed.
+    """
+
+
+def start_deadline(timeout: float | None) -> object:
+    """
+    Set the deadline of the current request.
+
+    Parameters
+    ----------
+    timeout : float or None
+        Seconds from now until the deadline, or None to run without
+        a deadline.
+
+    Returns
+    -------
+    object
+        The token to pass to `stop_deadline`.
+    """
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    return _deadline.set(deadline)
+
+
+def stop_deadline(token) -> None:
+    """
+    Restore the deadline that was set before `start_deadline`.
+
+    Parameters
+    ----------
+    token : object
+        The token returned by `start_deadline`.
+    """
+    _deadline.reset(token)
+
+
+def remaining() -> float | None:
+    """
+    Return the time left until the deadline of the current request.
+
+    Returns
+    -------
+    float or None
+        Seconds until the deadline, negative if it has passed, or None
+        if the code runs without a deadline.
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check_deadline() -> float | None:
+    """
+    Fail if the deadline of the current request has passed.
+
+    Returns
+    -------
+    float or None
+        Seconds until the deadline, or None without a deadline.
+
+    Raises
+    ------
+    DeadlineExceeded
+        If the deadline has passed.
+    """
+    timeout = remaining()
+    if timeout is not None and timeout <= 0:
+        raise DeadlineExceeded("The deadline of the request has passed")
+    return timeout
+
+
+async def within_deadline(func: Callable[..., Awaitable], *args, **kwargs) -> Any:
+    """
+    Call a coroutine function and cancel it at the deadline of the
+    current request.
+
+    Parameters
+    ----------
+    func : Callable[..., Awaitable]
+        The coroutine function.
+    *args, **kwargs
+        Its arguments.
+
+    Returns
+    -------
+    Any
+        The result of the call.
+
+    Raises
+    ------
+    DeadlineExceeded
+        If the deadline passed before or during the call.
+    """
+    timeout = check_deadline()
+    if timeout is None:
+        return await func(*args, **kwargs)
+    try:
+        return await asyncio.wait_for(func(*args, **kwargs), timeout)
+    except asyncio.TimeoutError:
+        # The loop may run timers up to its clock resolution early.
+        if remaining() > 0.01:
+            # A timeout of the call itself, not of the deadline.
+            raise
+        raise DeadlineExceeded("The deadline of the request has passed") from None
+
+
+class RequestTimeouts:
+    """
+    Chooses the deadline of every request.
+
+    A request gets the timeout of the first route rule it matches, or
+    the default one. The client may ask for another timeout in a
+    header, up to `max_timeout`. Routes with a timeout of zero, such as
+    the profiler, run without a deadline.
+
+    Parameters
+    ----------
+    default : float
+        Seconds a request may take. Zero disables deadlines.
+    max_timeout : float
+        The longest timeout a client may ask for.
+    routes : list[str]
+        Rules such as "GET /api/v1/tasks/=5", matched like the paths of
+        `PathRules`.
+    """
+
+    def __init__(self, default: float, max_timeout: float, routes: list[str]) -> None:
+        self.default = default
+        self.max_timeout = max_timeout
+        self.routes = []
+        for rule in routes:
+            path, _, timeout = rule.rpartition("=")
+            self.routes.append((PathRules([path]), float(timeout)))
+
+    def timeout(self, method: str, path: str, requested: str | None) -> float | None:
+        """
+        Return the timeout of a request.
+
+        Parameters
+        ----------
+        method : str
+            The HTTP method of the request.
+        path : str
+            The path of the request.
+        requested : str or None
+            The value of the timeout header, in seconds.
+
+        Returns
+        -------
+        float or None
+            Seconds the request may take, or None if it has no deadline.
+        """
+        timeout = next(
+            (timeout for rules, timeout in self.routes if rules.match(method, path)),
+            self.default,
+        )
+        if timeout <= 0:
+            return None
+        if requested:
+            try:
+                requested_timeout = float(requested)
+            except ValueError:
+                requested_timeout = 0.0
+            # Also ignores "nan".
+            if requested_timeout > 0:
+                timeout = requested_timeout
+        return min(timeout, self.max_timeout)
+
+
+request_timeouts: RequestTimeouts = LazyObject(
+    lambda: RequestTimeouts(
+        default=settings.server.request_timeout,
+        max_timeout=settings.server.request_timeout_max,
+        routes=settings.server.route_request_timeouts,
+    )
+)
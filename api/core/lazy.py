@@ -0,0 +1,89 @@
+from typing import Any, Callable
+
+
+class LazyObject:
+    """
+    Proxy that creates the wrapped object on first attribute access.
+
+    Module-level singletons such as the settings, the database helper
+    and the Redis client are wrapped in it, so importing the
+    application does no I/O and creates no clients. They are created
+    by the startup of the application, or by the first code that uses
+    them.
+
+    Parameters
+    ----------
+    factory : Callable[[], Any]
+        The function that creates the wrapped object.
+    """
+
+    def __init__(self, factory: Callable[[], Any]) -> None:
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_instance", None)
+
+    def _resolve(self) -> Any:
+        if self._instance is None:
+            object.__setattr__(self, "_instance", self._factory())
+        return self._instance
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._resolve(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._resolve(), name, value)
+
+    def __repr__(self) -> str:
+        if self._instance is None:
+            return f"<LazyObject of {self._factory.__qualname__}>"
+        return repr(self._instance)
+
+
+def resolve(obj: Any) -> Any:
+    """
+    Create the object wrapped in a lazy proxy.
+
+    Parameters
+    ----------
+    obj : Any
+        A `LazyObject` or any other object.
+
+    Returns
+    -------
+    Any
+        The wrapped object, or `obj` itself if it is not a proxy.
+    """
+    if isinstance(obj, LazyObject):
+        return obj._resolve()
+    return obj
+
+
+def is_resolved(obj: LazyObject) -> bool:
+    """
+    Tell whether the object wrapped in a lazy proxy has been created.
+
+    Parameters
+    ----------
+    obj : LazyObject
+        The proxy.
+
+    Returns
+    -------
+    bool
+        True if the wrapped object exists.
+    """
+    return obj._instance is not None
+
+
+def override(obj: LazyObject, instance: Any) -> None:
+    """
+    Make a lazy proxy wrap an object created elsewhere, e.g. a client
+    of another database in benchmarks.
+
+    Parameters
+    ----------
+    obj : LazyObject
+        The proxy.
+    instance : Any
+        The object used instead of the one the proxy would create.
+    """
+    object.__setattr__(obj, "_instance", instance)
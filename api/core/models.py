@@ -1,8 +1,18 @@
+from datetime import datetime
 from typing import List
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import (JSON, DateTime, ForeignKey, Index, String, Text, func,
+                        text)
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
+# PostgreSQL text[], stored as a JSON list where arrays are not supported.
+# The tag filters use the array operators and need PostgreSQL.
+TagArray = ARRAY(Text).with_variant(JSON(), "sqlite")
+# Strings compared byte by byte, so that positions sort and paths are
+# scanned by prefix the same way in Python and in the indexes.
+KeyString = String().with_variant(String(collation="C"), "postgresql")
+
 
 class Base(DeclarativeBase):
     """
@@ -56,16 +66,167 @@ class Task(Base):
     user_id : int
       A foreign key mapped column referring to the user's ID
       in the users table.
+    position : str
+      The key that orders the tasks of the user, generated by
+      `api.db.fractional_index`. Keys are compared byte by byte, and
+      tasks with equal keys are ordered by their ID.
+    tags : List[str]
+      The tags of the task, indexed with GIN for the tag filters.
+    parent_id : int, optional
+      The ID of the task this task is a subtask of.
+    path : str
+      The IDs of the ancestors of the task from the top-level task
+      down, each followed by "/", e.g. "1/5/" for a subtask of task 5,
+      a subtask of task 1; empty for a top-level task. A subtree is
+      scanned by the prefix of its paths.
+    updated_at : datetime
+      The time of the last change of the task.
     user : User
       A relationship attribute that connects the task to the user
       it belongs to.
     """
 
     __tablename__ = "tasks"
+    __table_args__ = (
+        Index(
+            "ix_tasks_completed_updated_at",
+            "updated_at",
+            postgresql_where=text("status = 'completed'"),
+        ),
+        Index("ix_tasks_user_id_position", "user_id", "position", "id"),
+        Index("ix_tasks_tags", "tags", postgresql_using="gin"),
+        Index("ix_tasks_user_id_path", "user_id", "path"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     title: Mapped[str] = mapped_column(nullable=False)
     description: Mapped[str] = mapped_column(nullable=False)
     status: Mapped[str] = mapped_column(nullable=False)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    position: Mapped[str] = mapped_column(KeyString, nullable=False)
+    tags: Mapped[List[str]] = mapped_column(
+        TagArray, nullable=False, default=list, server_default="{}"
+    )
+    parent_id: Mapped[int | None] = mapped_column(
+        ForeignKey("tasks.id", ondelete="CASCADE"), index=True
+    )
+    path: Mapped[str] = mapped_column(
+        KeyString, nullable=False, default="", server_default=""
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+    )
     user: Mapped["User"] = relationship(back_populates="tasks")
+
+
+class TaskArchive(Base):
+    """
+    The TaskArchive class represents a completed task moved out of
+    the tasks table by the archiver. It maps to the tasks_archive table.
+
+    Attributes
+    ----------
+    id : int
+      The ID the task had in the tasks table.
+    title : str
+      The title of the task.
+    description : str
+      A description of the task.
+    status : str
+      The status of the task, always "completed".
+    tags : List[str]
+      The tags of the task.
+    user_id : int
+      A foreign key mapped column referring to the user's ID
+      in the users table.
+    updated_at : datetime
+      The time of the last change of the task.
+    archived_at : datetime
+      The time the task was archived.
+    """
+
+    __tablename__ = "tasks_archive"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    title: Mapped[str] = mapped_column(nullable=False)
+    description: Mapped[str] = mapped_column(nullable=False)
+    status: Mapped[str] = mapped_column(nullable=False)
+    tags: Mapped[List[str]] = mapped_column(
+        TagArray, nullable=False, default=list, server_default="{}"
+    )
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), index=True
+    )
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    archived_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+    )
+
+
+class AppliedTaskWrite(Base):
+    """
+    The AppliedTaskWrite class records a task write of the write-behind
+    mode applied to the database. It maps to the applied_task_writes
+    table and is written in the same transaction as the write itself.
+
+    Attributes
+    ----------
+    write_id : str
+      The ID of the write given by the producer.
+    entry_id : str
+      The ID of the stream entry of the write, which orders the writes.
+    task_id : int, optional
+      The ID of the updated or deleted task, None for a create.
+    applied_at : datetime
+      The time the write was applied.
+    """
+
+    __tablename__ = "applied_task_writes"
+
+    write_id: Mapped[str] = mapped_column(String, primary_key=True)
+    entry_id: Mapped[str] = mapped_column(String, nullable=False)
+    task_id: Mapped[int | None] = mapped_column(index=True)
+    applied_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        index=True,
+    )
+
+
+class TaskImport(Base):
+    """
+    The TaskImport class represents the progress of an import job.
+    This class maps to the task_imports table and is written in the
+    same transaction as every chunk of imported tasks.
+
+    Attributes
+    ----------
+    id : str
+      The ID of the import job.
+    line : int
+      The last line of the file whose record is imported or failed.
+    imported : int
+      The number of imported tasks.
+    failed : int
+      The number of failed records.
+    errors : list[dict]
+      The errors of the first failed records.
+    updated_at : datetime
+      The time of the last committed chunk.
+    """
+
+    __tablename__ = "task_imports"
+
+    id: Mapped[str] = mapped_column(String, primary_key=True)
+    line: Mapped[int] = mapped_column(nullable=False)
+    imported: Mapped[int] = mapped_column(nullable=False)
+    failed: Mapped[int] = mapped_column(nullable=False)
+    errors: Mapped[list] = mapped_column(JSON, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        index=True,
+    )
@@ -1,8 +1,9 @@
 import re
 from enum import Enum
-from typing import Literal
+from typing import Annotated, Any, Literal
 
-from pydantic import BaseModel, ConfigDict, Field, field_validator
+from pydantic import (BaseModel, BeforeValidator, ConfigDict, Field,
+                      field_validator)
 
 
 class TokenInfo(BaseModel):
@@ -41,16 +42,64 @@ class UserCreate(BaseModel):
         return password
 
 
+MAX_TAGS = 20
+MAX_TAG_LENGTH = 50
+MAX_PAGE_SIZE = 1000
+
+
+def normalize_tags(tags: Any) -> Any:
+    """
+    Split, strip and deduplicate tags, keeping their order.
+
+    Parameters
+    ----------
+    tags : Any
+        A list of tags, or a string of comma-separated tags as in a CSV
+        column. Every item of a list may also hold several tags.
+
+    Returns
+    -------
+    Any
+        The list of tags, or the value unchanged if it is neither a
+        string nor a list.
+    """
+    if isinstance(tags, str):
+        tags = [tags]
+    if not isinstance(tags, list):
+        return tags
+    normalized = []
+    for item in tags:
+        for tag in item.split(",") if isinstance(item, str) else [item]:
+            tag = tag.strip() if isinstance(tag, str) else tag
+            if tag != "" and tag not in normalized:
+                normalized.append(tag)
+    return normalized
+
+
+TagList = list[Annotated[str, Field(max_length=MAX_TAG_LENGTH)]]
+Tags = Annotated[TagList, BeforeValidator(normalize_tags)]
+
+
 class TaskCreate(BaseModel):
     title: str = Field(max_length=50)
     description: str = Field(max_length=500)
     status: Literal["completed", "in_progress"] = "in_progress"
+    tags: Tags = Field(default=[], max_length=MAX_TAGS)
 
 
 class TaskUpdate(BaseModel):
     title: str | None = Field(max_length=50)
     description: str | None = Field(max_length=500)
     status: Literal["completed", "in_progress"] = "in_progress"
+    tags: Annotated[TagList | None, BeforeValidator(normalize_tags)] = Field(
+        default=None, max_length=MAX_TAGS
+    )
+
+
+class TaskTagsUpdate(BaseModel):
+    task_ids: list[int] = Field(min_length=1, max_length=1000)
+    add: Tags = Field(default=[], max_length=MAX_TAGS)
+    remove: Tags = Field(default=[], max_length=MAX_TAGS)
 
 
 class TaskStatus(str, Enum):
@@ -58,11 +107,48 @@ class TaskStatus(str, Enum):
     completed = "completed"
 
 
+class TaskMove(BaseModel):
+    after_id: int | None = None
+
+
+class TaskParent(BaseModel):
+    parent_id: int | None = None
+
+
 class Task(BaseModel):
+    id: int | None = None
     title: str
     description: str
     status: str
+    tags: list[str] = []
+    parent_id: int | None = None
+
+
+class TaskTree(Task):
+    subtasks: list["TaskTree"] = []
 
 
 class TasksResponse(BaseModel):
     tasks: list[Task]
+    next_cursor: str | None = None
+
+
+class JobInfo(BaseModel):
+    id: str
+    name: str
+    status: str
+    attempts: int
+    progress: dict = {}
+    result: Any = None
+    error: str | None = None
+
+
+class ImportFormat(str, Enum):
+    csv = "csv"
+    ndjson = "ndjson"
+
+
+class ImportReport(BaseModel):
+    imported: int
+    failed: int
+    errors: list[dict]
@@ -0,0 +1,225 @@
+import inspect
+import time
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+_request_timing: ContextVar["RequestTiming | None"] = ContextVar(
+    "request_timing", default=None
+)
+
+
+class RequestTiming:
+    """
+    Durations spent in each part of one request.
+
+    The instrumentation hooks of the application add to the timing of
+    the current request only if the request was sampled.
+
+    Attributes
+    ----------
+    started_at : float
+        `time.perf_counter()` when the request was received.
+    metrics : dict[str, list]
+        The total duration in seconds and the number of calls of every
+        metric, e.g. "db" or "redis".
+    endpoint_finished_at : float or None
+        `time.perf_counter()` when the endpoint function returned.
+    """
+
+    __slots__ = ("started_at", "metrics", "endpoint_finished_at")
+
+    def __init__(self) -> None:
+        self.started_at = time.perf_counter()
+        self.metrics: dict[str, list] = {}
+        self.endpoint_finished_at: float | None = None
+
+    def add(self, name: str, duration: float) -> None:
+        """
+        Add a duration to a metric.
+
+        Parameters
+        ----------
+        name : str
+            The name of the metric.
+        duration : float
+            The duration in seconds.
+        """
+        metric = self.metrics.get(name)
+        if metric is None:
+            self.metrics[name] = [duration, 1]
+        else:
+            metric[0] += duration
+            metric[1] += 1
+
+    def total(self) -> float:
+        """
+        Return the seconds since the request was received.
+        """
+        return time.perf_counter() - self.started_at
+
+    def header(self) -> str:
+        """
+        Render the metrics as the value of a `Server-Timing` header.
+
+        Returns
+        -------
+        str
+            The duration of every metric in milliseconds with the number
+            of calls, and the total duration of the request.
+        """
+        entries = [
+            f'{name};dur={duration * 1000:.2f};desc="{calls} calls"'
+            for name, (duration, calls) in self.metrics.items()
+        ]
+        entries.append(f"total;dur={self.total() * 1000:.2f}")
+        return ", ".join(entries)
+
+    def log_fields(self) -> str:
+        """
+        Render the metrics as `name=milliseconds` pairs of a log line.
+
+        Returns
+        -------
+        str
+            The duration and the number of calls of every metric, and
+            the total duration of the request.
+        """
+        fields = [f"total_ms={self.total() * 1000:.2f}"]
+        for name, (duration, calls) in self.metrics.items():
+            fields.append(f"{name}_ms={duration * 1000:.2f} {name}_calls={calls}")
+        return " ".join(fields)
+
+
+class _Span:
+    __slots__ = ("timing", "name", "start")
+
+    def __init__(self, timing: RequestTiming, name: str) -> None:
+        self.timing = timing
+        self.name = name
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.timing.add(self.name, time.perf_counter() - self.start)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+
+_NO_SPAN = _NoSpan()
+
+
+def current_timing() -> RequestTiming | None:
+    """
+    Return the timing of the current request.
+
+    Returns
+    -------
+    RequestTiming or None
+        The timing, or None if the request is not sampled or the code
+        does not run in a request.
+    """
+    return _request_timing.get()
+
+
+def timed(name: str) -> _Span | _NoSpan:
+    """
+    Measure the block and add its duration to a metric of the current
+    request.
+
+    Outside a sampled request the returned context manager does
+    nothing, so hooks cost a context variable lookup.
+
+    Parameters
+    ----------
+    name : str
+        The name of the metric.
+
+    Returns
+    -------
+    _Span or _NoSpan
+        The context manager.
+    """
+    timing = _request_timing.get()
+    if timing is None:
+        return _NO_SPAN
+    return _Span(timing, name)
+
+
+def start_request_timing() -> tuple[RequestTiming, object]:
+    """
+    Start measuring the current request.
+
+    Returns
+    -------
+    tuple[RequestTiming, object]
+        The timing and the token to pass to `stop_request_timing`.
+    """
+    timing = RequestTiming()
+    return timing, _request_timing.set(timing)
+
+
+def stop_request_timing(token) -> None:
+    """
+    Stop measuring the current request.
+
+    Parameters
+    ----------
+    token : object
+        The token returned by `start_request_timing`.
+    """
+    _request_timing.reset(token)
+
+
+class TimedRoute(APIRoute):
+    """
+    Route that measures how long the response takes to be validated
+    and serialized after the endpoint function returns.
+
+    The duration is added to the "serialization" metric of sampled
+    requests. Endpoints that are not coroutine functions are not
+    measured.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        call = self.dependant.call
+        if not inspect.iscoroutinefunction(call):
+            return
+
+        @wraps(call)
+        async def endpoint(*args, **kwargs):
+            result = await call(*args, **kwargs)
+            timing = _request_timing.get()
+            if timing is not None:
+                timing.endpoint_finished_at = time.perf_counter()
+            return result
+
+        self.dependant.call = endpoint
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def timed_handler(request: Request) -> Response:
+            response = await handler(request)
+            timing = _request_timing.get()
+            if timing is not None and timing.endpoint_finished_at is not None:
+                timing.add(
+                    "serialization", time.perf_counter() - timing.endpoint_finished_at
+                )
+            return response
+
+        return timed_handler
@@ -5,6 +5,21 @@ Components of the package.
 1. The 'db_queries' package contains all database queries
 2. The 'db_helper' module contains helper class for
     working with the database.
+3. The 'db_metrics' module contains the instrumented connection
+    pool and the metrics of the pools and the statement cache.
+4. The 'write_coalescer' module contains the coalescer that writes
+    concurrent task inserts as multi-row INSERT statements.
+5. The 'archiver' module contains the background archiver that moves
+    old completed tasks into the tasks_archive table.
+6. The 'query_profiler' module times every query, logs slow queries,
+    counts the queries of each request and contains the
+    `assert_query_count` test helper.
+7. The 'read_coalescer' module contains the coalescer that shares
+    one query between identical concurrent reads of a user.
+8. The 'fractional_index' module generates the keys that order
+    the tasks of a user.
+9. The 'rebalancer' module contains the background rebalancer that
+    rewrites the positions of tasks once they get too long.
 """
 
 __all__ = (
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import Select, delete, exists, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from api.core.config import settings
+from api.core.lazy import LazyObject
+from api.core.models import Task, TaskArchive
+from api.db.dbhelper import DataBaseHelper, db_helper
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED_COLUMNS = (
+    "id",
+    "title",
+    "description",
+    "status",
+    "tags",
+    "user_id",
+    "updated_at",
+)
+
+
+def archivable_tasks(cutoff: datetime, batch_size: int) -> Select:
+    """
+    Select the IDs of a batch of tasks to archive, locking them.
+
+    Only top-level completed tasks without subtasks are archived, since
+    the archive does not keep the place of a task in a tree: a subtask
+    stays with its parent, and a task with subtasks stays until they
+    are deleted. Rows locked by another archiver are skipped.
+
+    Parameters
+    ----------
+    cutoff : datetime
+        Tasks changed after this time are not archived.
+    batch_size : int
+        The maximum number of selected tasks.
+
+    Returns
+    -------
+    Select
+        The statement selecting the IDs of the tasks.
+    """
+    subtask = aliased(Task)
+    return (
+        select(Task.id)
+        .where(
+            Task.status == "completed",
+            Task.updated_at < cutoff,
+            Task.parent_id.is_(None),
+            ~exists().where(subtask.parent_id == Task.id),
+        )
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+
+
+async def archive_completed_tasks(
+    session: AsyncSession,
+    older_than: timedelta,
+    batch_size: int,
+) -> int:
+    """
+    Move one batch of completed tasks unchanged for `older_than`
+    into the tasks_archive table.
+
+    The tasks are deleted and inserted into the archive by a single
+    `DELETE ... RETURNING` statement feeding an `INSERT`. The tasks are
+    selected by `archivable_tasks`.
+
+    Parameters
+    ----------
+    session : AsyncSession
+        An active SQLAlchemy asynchronous session used for database operations.
+    older_than : timedelta
+        The minimum time since the last change of an archived task.
+    batch_size : int
+        The maximum number of tasks moved.
+
+    Returns
+    -------
+    int
+        The number of archived tasks.
+    """
+    cutoff = datetime.now(timezone.utc) - older_than
+    batch = archivable_tasks(cutoff, batch_size)
+    moved = (
+        delete(Task)
+        .where(Task.id.in_(batch.scalar_subquery()))
+        .returning(*(getattr(Task, column) for column in ARCHIVED_COLUMNS))
+        .cte("moved")
+    )
+    stmt = insert(TaskArchive).from_select(
+        ARCHIVED_COLUMNS,
+        select(*(moved.c[column] for column in ARCHIVED_COLUMNS)),
+    )
+    result = await session.execute(stmt)
+    await session.commit()
+    return result.rowcount
+
+
+class TaskArchiver:
+    """
+    Background task that keeps the tasks table small by periodically
+    archiving old completed tasks.
+
+    Parameters
+    ----------
+    db_helper : DataBaseHelper
+        The helper whose sessions move the tasks.
+    after_days : int
+        Days after its last change when a completed task is archived.
+    batch_size : int
+        The number of tasks moved in one transaction.
+    interval : float
+        Seconds between two runs.
+    """
+
+    def __init__(
+        self,
+        db_helper: DataBaseHelper,
+        after_days: int,
+        batch_size: int,
+        interval: float,
+    ) -> None:
+        self.db_helper = db_helper
+        self.older_than = timedelta(days=after_days)
+        self.batch_size = batch_size
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    async def run_once(self) -> int:
+        """
+        Archive batches until no old completed tasks are left.
+
+        Returns
+        -------
+        int
+            The number of archived tasks.
+        """
+        archived = 0
+        while True:
+            async with self.db_helper.get_session() as session:
+                moved = await archive_completed_tasks(
+                    session=session,
+                    older_than=self.older_than,
+                    batch_size=self.batch_size,
+                )
+            archived += moved
+            if moved < self.batch_size:
+                return archived
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                archived = await self.run_once()
+            except Exception:
+                logger.exception("Archiving completed tasks failed")
+            else:
+                if archived:
+                    logger.info("Archived %d completed tasks", archived)
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """
+        Start archiving in the running event loop.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stop archiving.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+task_archiver: TaskArchiver = LazyObject(
+    lambda: TaskArchiver(
+        db_helper=db_helper,
+        after_days=settings.db_settings.archive_after_days,
+        batch_size=settings.db_settings.archive_batch_size,
+        interval=settings.db_settings.archive_interval_seconds,
+    )
+)
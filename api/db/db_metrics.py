@@ -0,0 +1,314 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from api.core.timing import current_timing
+from api.db.query_profiler import query_profiler
+from api.metrics import (TIME_BUCKETS, db_pool_checked_out, db_pool_size,
+                         db_pool_timeouts, db_pool_wait, db_statement_cache)
+
+_request_acquire_time: ContextVar[list[float] | None] = ContextVar(
+    "request_acquire_time", default=None
+)
+
+
+class Histogram:
+    """
+    Cumulative histogram of durations in seconds.
+
+    Attributes
+    ----------
+    buckets : tuple[float, ...]
+        Upper bounds of the buckets. Values above the last bound
+        are counted in the "+Inf" bucket.
+    count : int
+        The number of observed values.
+    sum : float
+        The sum of observed values.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = TIME_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        Add a value to the histogram.
+
+        Parameters
+        ----------
+        value : float
+            The observed duration in seconds.
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> dict:
+        """
+        Return the histogram as a dictionary of cumulative bucket counts.
+
+        Returns
+        -------
+        dict
+            The bucket counts, the total count and the sum.
+        """
+        cumulative = 0
+        buckets = {}
+        for bound, bucket_count in zip((*map(str, self.buckets), "+Inf"), self.counts):
+            cumulative += bucket_count
+            buckets[bound] = cumulative
+        return {"buckets": buckets, "count": self.count, "sum": self.sum}
+
+
+request_acquire_time = Histogram()
+connection_hold_time = Histogram()
+
+
+class PoolMetrics:
+    """
+    Counters of a connection pool that are not kept by the pool itself.
+
+    The wait times and timeouts are also exported to Prometheus with
+    the `name` of the pool as the label, if it has one.
+
+    Attributes
+    ----------
+    name : str or None
+        The label of the pool in the Prometheus metrics.
+    wait_time : Histogram
+        Time spent waiting for a connection on each checkout.
+    timeouts : int
+        The number of checkouts that gave up after `pool_timeout`.
+    """
+
+    def __init__(self, name: str | None = None) -> None:
+        self.name = name
+        self.wait_time = Histogram()
+        self.timeouts = 0
+        self._exported_wait_time = db_pool_wait.labels(name) if name else None
+        self._exported_timeouts = db_pool_timeouts.labels(name) if name else None
+
+    def observe_wait(self, elapsed: float) -> None:
+        """
+        Record the time a checkout waited for a connection.
+
+        Parameters
+        ----------
+        elapsed : float
+            The wait time in seconds.
+        """
+        self.wait_time.observe(elapsed)
+        if self._exported_wait_time is not None:
+            self._exported_wait_time.observe(elapsed)
+
+    def observe_timeout(self) -> None:
+        """
+        Record a checkout that gave up after `pool_timeout`.
+        """
+        self.timeouts += 1
+        if self._exported_timeouts is not None:
+            self._exported_timeouts.inc()
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Asyncio queue pool that measures how long each checkout waits.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self) -> "InstrumentedQueuePool":
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            self.metrics.observe_timeout()
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.metrics.observe_wait(elapsed)
+            acquire_time = _request_acquire_time.get()
+            if acquire_time is not None:
+                acquire_time[0] += elapsed
+            timing = current_timing()
+            if timing is not None:
+                timing.add("db_acquire", elapsed)
+
+    def snapshot(self) -> dict:
+        """
+        Return the live state and the counters of the pool.
+
+        Returns
+        -------
+        dict
+            The pool size, checked out and checked in connections,
+            overflow, timeouts and the wait time histogram.
+        """
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": self.overflow(),
+            "timeouts": self.metrics.timeouts,
+            "wait_time": self.metrics.wait_time.snapshot(),
+        }
+
+
+class StatementCacheMetrics:
+    """
+    Counters of the SQLAlchemy compiled statement cache.
+
+    Attributes
+    ----------
+    hits : int
+        Statements whose compiled form was taken from the cache.
+    misses : int
+        Statements that were compiled and put into the cache.
+    uncached : int
+        Statements that could not be cached at all.
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.uncached = 0
+
+    def observe(self, conn, cursor, statement, parameters, context, executemany):
+        if context is None:
+            return
+        if context.cache_hit == context.dialect.CACHE_HIT:
+            self.hits += 1
+            _exported_cache_hits.inc()
+        elif context.cache_hit == context.dialect.CACHE_MISS:
+            self.misses += 1
+            _exported_cache_misses.inc()
+        else:
+            self.uncached += 1
+            _exported_cache_uncached.inc()
+
+    def snapshot(self) -> dict:
+        """
+        Return the counters and the hit ratio of the cache.
+
+        Returns
+        -------
+        dict
+            Hits, misses, uncached statements and the hit ratio of the
+            cacheable statements.
+        """
+        cacheable = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "uncached": self.uncached,
+            "hit_ratio": self.hits / cacheable if cacheable else None,
+        }
+
+
+_exported_cache_hits = db_statement_cache.labels("hit")
+_exported_cache_misses = db_statement_cache.labels("miss")
+_exported_cache_uncached = db_statement_cache.labels("uncached")
+statement_cache = StatementCacheMetrics()
+
+
+def _remember_checkout(dbapi_connection, connection_record, connection_proxy):
+    connection_record.info["checked_out_at"] = time.perf_counter()
+
+
+def _observe_hold_time(dbapi_connection, connection_record):
+    checked_out_at = connection_record.info.pop("checked_out_at", None)
+    if checked_out_at is not None:
+        connection_hold_time.observe(time.perf_counter() - checked_out_at)
+
+
+def pool_label(url: str) -> str:
+    """
+    Return the label of a connection pool in the Prometheus metrics.
+
+    Parameters
+    ----------
+    url : str
+        The connection string for the database.
+
+    Returns
+    -------
+    str
+        The host, port and database of the URL, without credentials.
+    """
+    parsed = make_url(url)
+    if parsed.host:
+        return f"{parsed.host}:{parsed.port or ''}/{parsed.database or ''}"
+    return parsed.database or parsed.drivername
+
+
+def create_instrumented_engine(url: str, echo: bool = False, **engine_options):
+    """
+    Create an asynchronous engine whose pool records its metrics.
+
+    Parameters
+    ----------
+    url : str
+        The connection string for the database.
+    echo : bool
+        Whether to log every statement.
+    **engine_options
+        Pool and driver options passed to `create_async_engine`.
+
+    Returns
+    -------
+    AsyncEngine
+        The engine with an `InstrumentedQueuePool` that also reports
+        to `statement_cache` and Prometheus, and whose queries are
+        timed by `query_profiler`.
+    """
+    engine = create_async_engine(
+        url=url,
+        echo=echo,
+        poolclass=InstrumentedQueuePool,
+        **engine_options,
+    )
+    name = pool_label(url)
+    engine.pool.metrics = PoolMetrics(name)
+    db_pool_size.labels(name).set(engine.pool.size())
+    checked_out = db_pool_checked_out.labels(name)
+    event.listen(engine.sync_engine, "checkout", lambda *args: checked_out.inc())
+    event.listen(engine.sync_engine, "checkin", lambda *args: checked_out.dec())
+    event.listen(engine.sync_engine, "checkout", _remember_checkout)
+    event.listen(engine.sync_engine, "checkin", _observe_hold_time)
+    event.listen(engine.sync_engine, "after_cursor_execute", statement_cache.observe)
+    query_profiler.instrument(engine)
+    return engine
+
+
+@contextmanager
+def track_request_acquire_time():
+    """
+    Sum the time spent acquiring connections inside the block and
+    add it to `request_acquire_time` on exit, if a connection was
+    acquired at all.
+    """
+    acquire_time = [0.0]
+    token = _request_acquire_time.set(acquire_time)
+    try:
+        yield acquire_time
+    finally:
+        _request_acquire_time.reset(token)
+        if acquire_time[0]:
+            request_acquire_time.observe(acquire_time[0])
@@ -1,9 +1,96 @@
-from sqlalchemy import select
+from sqlalchemy import (String, Text, all_, and_, bindparam, case, cast,
+                        delete, func, insert, lambda_stmt, literal, null, or_,
+                        select, tuple_, update)
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.core import schemas
-from api.core.models import Task
+from api.core.models import Task, TaskArchive, User
+from api.db.dbhelper import read_only
+from api.db.fractional_index import key_between, keys_after
+
+# Sorts right after the digits of the IDs in a path, so the paths of a
+# subtree lie between its prefix and the prefix followed by this.
+SUBTREE_END = ":"
+
+
+class TreeLimitError(ValueError):
+    """
+    Raised when a change would break the limits or the shape of a tree
+    of subtasks.
+    """
+
+
+async def append_positions(
+    session: AsyncSession,
+    counts: dict[int, int],
+) -> dict[int, list[str]]:
+    """
+    Generate the positions of new tasks appended to the tasks of users.
+
+    The last position of every user is read from the end of the
+    (user_id, position) index in a single query.
+
+    Parameters
+    ----------
+    session : AsyncSession
+        An active SQLAlchemy asynchronous session used for database operations.
+    counts : dict[int, int]
+        The number of new tasks of every user.
+
+    Returns
+    -------
+    dict[int, list[str]]
+        The increasing positions of the new tasks of every user.
+    """
+    last_position = (
+        select(func.max(Task.position))
+        .where(Task.user_id == User.id)
+        .correlate(User)
+        .scalar_subquery()
+    )
+    result = await session.execute(
+        select(User.id, last_position).where(User.id.in_(counts))
+    )
+    last_positions = dict(result.all())
+    positions = {}
+    for user_id, count in counts.items():
+        keys = keys_after(last_positions.get(user_id))
+        positions[user_id] = [next(keys) for _ in range(count)]
+    return positions
+
+
+async def assign_positions(
+    session: AsyncSession,
+    rows: list[dict],
+) -> list[dict]:
+    """
+    Set the positions of new tasks appended to the tasks of their users.
+
+    Parameters
+    ----------
+    session : AsyncSession
+        An active SQLAlchemy asynchronous session used for database operations.
+    rows : list[dict]
+        The new tasks, each with a "user_id" key, in the order they are
+        appended in.
+
+    Returns
+    -------
+    list[dict]
+        The same rows, each with its "position" set.
+    """
+    counts = {}
+    for row in rows:
+        counts[row["user_id"]] = counts.get(row["user_id"], 0) + 1
+    positions = {
+        user_id: iter(keys)
+        for user_id, keys in (await append_positions(session, counts)).items()
+    }
+    for row in rows:
+        row["position"] = next(positions[row["user_id"]])
+    return rows
 
 
 async def create_task(
@@ -23,7 +110,7 @@ async def create_task(
         The ID of the user to whom the task is assigned.
     task_data : TaskCreate
         An instance containing the data required to create a new task.
-        Must include `title`, `description`, and `status`.
+        Must include `title`, `description`, `status` and `tags`.
 
     Returns
     -------
@@ -31,11 +118,14 @@ async def create_task(
         Returns `True` if the task was successfully created and
         committed to the database.
     """
+    positions = await append_positions(session, {user_id: 1})
     task = Task(
         title=task_data.title,
         description=task_data.description,
         status=task_data.status,
+        tags=task_data.tags,
         user_id=user_id,
+        position=positions[user_id][0],
     )
     session.add(task)
     await session.commit()
@@ -43,44 +133,246 @@ async def create_task(
     return True
 
 
+async def copy_tasks(
+    session: AsyncSession,
+    rows: list[tuple],
+) -> int:
+    """
+    Load tasks into the database with the PostgreSQL COPY protocol.
+
+    The tasks are appended to the tasks of their users in the order of
+    the rows. The caller commits the rows.
+
+    Parameters
+    ----------
+    session : AsyncSession
+        An active SQLAlchemy asynchronous session used for database operations.
+    rows : list[tuple]
+        The tasks as `(title, description, status, tags, user_id)` tuples.
+
+    Returns
+    -------
+    int
+        The number of loaded tasks.
+    """
+    counts = {}
+    for row in rows:
+        counts[row[4]] = counts.get(row[4], 0) + 1
+    positions = {
+        user_id: iter(keys)
+        for user_id, keys in (await append_positions(session, counts)).items()
+    }
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        Task.__tablename__,
+        records=[(*row, next(positions[row[4]])) for row in rows],
+        columns=("title", "description", "status", "tags", "user_id", "position"),
+    )
+    return len(rows)
+
+
+@read_only()
 async def get_tasks(
     session: AsyncSession,
+    user_id: int,
     status: str,
+    tags_all: list[str] | None = None,
+    tags_any: list[str] | None = None,
+    after: tuple[str | None, int] | None = None,
+    limit: int | None = None,
 ) -> list[schemas.Task]:
     """
-    Retrieve a list of tasks from the database based on their status.
+    Retrieve the tasks of a user with a status in the order of their
+    positions, optionally filtered by tags and one page at a time.
 
     Parameters
     ----------
     session : AsyncSession
         An active SQLAlchemy asynchronous session used for database operations.
+    user_id : int
+        The ID of the user whose tasks are retrieved.
     status : str
         The status of the tasks to be retrieved (e.g., "pending", "completed").
+    tags_all : list[str], optional
+        Only retrieve the tasks that have all of these tags.
+    tags_any : list[str], optional
+        Only retrieve the tasks that have at least one of these tags.
+    after : tuple[str or None, int], optional
+        The position and the ID of the last task of the previous page.
+        The position of an archived task is None.
+    limit : int, optional
+        The maximum number of retrieved tasks.
+
+    Returns
+    -------
+    list[Row]
+        A list of rows with the `id`, `title`, `description`, `status`,
+        `tags`, `parent_id` and `position` of the tasks that match the
+        filters, read in order from the (user_id, position) index; the
+        tag filters use the GIN index of the tags. Completed tasks are
+        read from both the tasks and the tasks_archive tables; the
+        archived ones have no parent and no position and come last, in
+        the order of their IDs. The archive is only read if the page is
+        not filled by the tasks table. If no tasks match, an empty list
+        will be returned.
+    """
+    tasks = []
+    if after is None or after[0] is not None:
+        stmt = lambda_stmt(
+            lambda: select(
+                Task.id,
+                Task.title,
+                Task.description,
+                Task.status,
+                Task.tags,
+                Task.parent_id,
+                Task.position,
+            ).where(Task.user_id == user_id, Task.status == status)
+        )
+        if tags_all:
+            stmt += lambda s: s.where(Task.tags.contains(tags_all))
+        if tags_any:
+            stmt += lambda s: s.where(Task.tags.overlap(tags_any))
+        if after is not None:
+            after_position, after_id = after
+            stmt += lambda s: s.where(
+                tuple_(Task.position, Task.id) > tuple_(after_position, after_id)
+            )
+        stmt += lambda s: s.order_by(Task.position, Task.id)
+        if limit is not None:
+            stmt += lambda s: s.limit(limit)
+        tasks.extend(await session.execute(stmt))
+
+    if status != schemas.TaskStatus.completed or (
+        limit is not None and len(tasks) >= limit
+    ):
+        return tasks
+    stmt = lambda_stmt(
+        lambda: select(
+            TaskArchive.id,
+            TaskArchive.title,
+            TaskArchive.description,
+            TaskArchive.status,
+            TaskArchive.tags,
+            null().label("parent_id"),
+            null().label("position"),
+        ).where(TaskArchive.user_id == user_id)
+    )
+    if tags_all:
+        stmt += lambda s: s.where(TaskArchive.tags.contains(tags_all))
+    if tags_any:
+        stmt += lambda s: s.where(TaskArchive.tags.overlap(tags_any))
+    if after is not None and after[0] is None:
+        after_id = after[1]
+        stmt += lambda s: s.where(TaskArchive.id > after_id)
+    stmt += lambda s: s.order_by(TaskArchive.id)
+    if limit is not None:
+        remaining = limit - len(tasks)
+        stmt += lambda s: s.limit(remaining)
+    tasks.extend(await session.execute(stmt))
+
+    return tasks
+
+
+@read_only()
+async def get_tasks_by_ids(
+    session: AsyncSession,
+    user_id: int,
+    task_ids: list[int],
+) -> list:
+    """
+    Retrieve tasks of a user by their IDs, whatever their status and
+    tags.
+
+    Parameters
+    ----------
+    session : AsyncSession
+        An active SQLAlchemy asynchronous session used for database operations.
+    user_id : int
+        The ID of the user who owns the tasks.
+    task_ids : list[int]
+        The unique identifiers of the tasks.
 
     Returns
     -------
-    list[Task]
-        A list of task instances that match the specified status.
-        If no tasks match the status, an empty list will be returned.
+    list[Row]
+        Rows with the same columns as `get_tasks` for the tasks that
+        exist and belong to the user, in no particular order.
+    """
+    stmt = select(
+        Task.id,
+        Task.title,
+        Task.description,
+        Task.status,
+        Task.tags,
+        Task.parent_id,
+        Task.position,
+    ).where(Task.user_id == user_id, Task.id.in_(task_ids))
+    return list(await session.execute(stmt))
+
+
+async def restore_archived_task(
+    session: AsyncSession,
+    task_id: int,
+    user_id: int | None = None,
+) -> None:
     """
-    stmt = select(Task).where(Task.status == status)
-    tasks = await session.scalars(stmt)
+    Move an archived task back into the tasks table, after the other
+    tasks of its user.
 
-    return list(tasks)
+    Parameters
+    ----------
+    session : AsyncSession
+        An active SQLAlchemy asynchronous session used for database operations.
+    task_id : int
+        The unique identifier of the task to be restored.
+    user_id : int, optional
+        Only restore the task if it belongs to this user.
+    """
+    stmt = select(TaskArchive.user_id).where(TaskArchive.id == task_id)
+    if user_id is not None:
+        stmt = stmt.where(TaskArchive.user_id == user_id)
+    owner_id = await session.scalar(stmt)
+    if owner_id is None:
+        return
+    positions = await append_positions(session, {owner_id: 1})
+    columns = ("id", "title", "description", "status", "tags", "user_id", "updated_at")
+    restored = (
+        delete(TaskArchive)
+        .where(TaskArchive.id == task_id)
+        .returning(*(getattr(TaskArchive, column) for column in columns))
+        .cte("restored")
+    )
+    await session.execute(
+        insert(Task).from_select(
+            (*columns, "position"),
+            select(
+                *(restored.c[column] for column in columns),
+                bindparam("position", positions[owner_id][0]),
+            ),
+        )
+    )
 
 
 async def update_task(
-    session: AsyncSession, task_id: int, update_data: schemas.TaskUpdate
+    session: AsyncSession,
+    user_id: int,
+    task_id: int,
+    update_data: schemas.TaskUpdate,
 ):
     """
-    Update a task in the database with the provided
-    task ID and update data.
+    Update a task of a user in the database with the provided
+    task ID and update data. An archived task is moved back
+    into the tasks table first.
 
     Parameters
     ----------
     session : AsyncSession
         An active SQLAlchemy asynchronous session used
         for database operations.
+    user_id : int
+        The ID of the user who owns the task.
     task_id : int
         The unique identifier of the task to be updated.
     update_data : schemas.TaskUpdate
@@ -88,16 +380,22 @@ async def update_task(
         - title (str, optional): The new title for the task.
         - description (str, optional): The new description for the task.
         - status (str, optional): The new status for the task.
+        - tags (list[str], optional): The new tags of the task.
 
     Returns
     -------
     Task
         The updated task instance after applying the changes.
     """
-    stmt = select(Task).where(Task.id == task_id)
+    stmt = select(Task).where(Task.id == task_id, Task.user_id == user_id)
     result = await session.execute(stmt)
     task = result.scalars().one_or_none()
 
+    if task is None:
+        await restore_archived_task(session=session, task_id=task_id, user_id=user_id)
+        result = await session.execute(stmt)
+        task = result.scalars().one_or_none()
+
     if task is None:
         raise NoResultFound(f"Task with id {task_id} not found.")
 
@@ -107,6 +405,8 @@ async def update_task(
         task.description = update_data.description
     if update_data.status is not None:
         task.status = update_data.status
+    if update_data.tags is not None:
+        task.tags = update_data.tags
 
     session.add(task)
 
@@ -114,18 +414,83 @@ async def update_task(
     return task
 
 
+async def update_tags(
+    session: AsyncSession,
+    user_id: int,
+    task_ids: list[int],
+    add: list[str],
+    remove: list[str],
+) -> int:
+    """
+    Add and remove tags of several tasks of a user in one statement.
+
+    The new tags of every task are computed by the database, keeping
+    the order of the existing tags and appending the added ones.
+    Tasks that would get more than `schemas.MAX_TAGS` tags and archived
+    tasks are left unchanged.
+
+    Parameters
+    ----------
+    session : AsyncSession
+        An active SQLAlchemy asynchronous session used for database operations.
+    user_id : int
+        The ID of the user who owns the tasks.
+    task_ids : list[int]
+        The unique identifiers of the tasks.
+    add : list[str]
+        The tags to be added.
+    remove : list[str]
+        The tags to be removed. A tag both added and removed is removed.
+
+    Returns
+    -------
+    int
+        The number of updated tasks.
+    """
+    tag = (
+        func.unnest(Task.tags + bindparam("add_tags", add, type_=ARRAY(Text)))
+        .table_valued("tag", with_ordinality="number")
+        .render_derived()
+    )
+    new_tags = func.array(
+        select(tag.c.tag)
+        .where(tag.c.tag != all_(bindparam("remove_tags", remove, type_=ARRAY(Text))))
+        .group_by(tag.c.tag)
+        .order_by(func.min(tag.c.number))
+        .scalar_subquery()
+    )
+    result = await session.execute(
+        update(Task)
+        .where(
+            Task.id.in_(task_ids),
+            Task.user_id == user_id,
+            func.cardinality(new_tags) <= schemas.MAX_TAGS,
+        )
+        .values(tags=new_tags)
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    return result.rowcount
+
+
 async def delete_task(
     session: AsyncSession,
+    user_id: int,
     task_id: int,
 ) -> bool:
     """
-    Delete a task from the database with the specified task ID.
+    Delete a task of a user from the database with the specified task
+    ID. The task is looked up in the tasks table and then in the
+    archive. The subtasks of the task are deleted with it.
 
     Parameters
     ----------
     session : AsyncSession
         An active SQLAlchemy asynchronous session used for database operations.
 
+    user_id : int
+        The ID of the user who owns the task.
+
     task_id : int
         The unique identifier of the task to be deleted.
 
@@ -133,13 +498,429 @@ async def delete_task(
     -------
     bool
         True if the task was successfully deleted, False if no task with
-        the specified task_id exists.
+        the specified task_id exists for the user.
     """
-    stmt = select(Task).where(Task.id == task_id)
+    stmt = select(Task).where(Task.id == task_id, Task.user_id == user_id)
     result = await session.execute(stmt)
     task_to_delete = result.scalars().one_or_none()
     if task_to_delete is None:
-        return False
+        result = await session.execute(
+            delete(TaskArchive).where(
+                TaskArchive.id == task_id, TaskArchive.user_id == user_id
+            )
+        )
+        await session.commit()
+        return bool(result.rowcount)
+    await session.execute(
+        delete(Task)
+        .where(
+            Task.user_id == task_to_delete.user_id,
+            in_subtree(f"{task_to_delete.path}{task_to_delete.id}/"),
+        )
+        .execution_options(synchronize_session=False)
+    )
     await session.delete(task_to_delete)
     await session.commit()
     return True
+
+
+async def move_task(
+    session: AsyncSession,
+    user_id: int,
+    task_id: int,
+    after_id: int | None,
+) -> Task:
+    """
+    Move a task of a user right after another of its tasks, or to the
+    top of its tasks. An archived task is moved back into the tasks
+    table first.
+
+    Only the moved task is updated: it gets a position between the
+    positions of its new neighbours. The neighbours are locked until
+    the commit, so a concurrent rebalancing cannot change them in the
+    meantime. If the neighbours have equal positions, the positions of
+    the user are rebalanced first.
+
+    Parameters
+    ----------
+    session : AsyncSession
+        An active SQLAlchemy asynchronous session used for database operations.
+    user_id : int
+        The ID of the user who owns the tasks.
+    task_id : int
+        The unique identifier of the task to be moved.
+    after_id : int or None
+        The ID of the task the moved task is placed after, or None to
+        move it to the top.
+
+    Returns
+    -------
+    Task
+        The moved task.
+
+    Raises
+    ------
+    NoResultFound
+        If the user has no task with `task_id` or `after_id`.
+    """
+    stmt = select(Task).where(Task.id == task_id, Task.user_id == user_id)
+    task = await session.scalar(stmt)
+    if task is None:
+        await restore_archived_task(session=session, task_id=task_id, user_id=user_id)
+        task = await session.scalar(stmt)
+    if task is None:
+        raise NoResultFound(f"Task with id {task_id} not found.")
+    if after_id == task_id:
+        return task
+
+    for _ in range(2):
+        before = None
+        following = select(Task.position, Task.id).where(
+            Task.user_id == user_id, Task.id != task_id
+        )
+        if after_id is not None:
+            before = (
+                await session.execute(
+                    select(Task.position, Task.id)
+                    .where(Task.id == after_id, Task.user_id == user_id)
+                    .with_for_update()
+                )
+            ).one_or_none()
+            if before is None:
+                raise NoResultFound(f"Task with id {after_id} not found.")
+            following = following.where(
+                tuple_(Task.position, Task.id) > tuple_(before.position, before.id)
+            )
+        after = (
+            await session.execute(
+                following.order_by(Task.position, Task.id).limit(1).with_for_update()
+            )
+        ).one_or_none()
+        lower = before.position if before is not None else None
+        upper = after.position if after is not None else None
+        if lower is None or upper is None or lower < upper:
+            break
+        await rebalance_positions(session=session, user_id=user_id)
+
+    task.position = key_between(lower, upper)
+    await session.commit()
+    return task
+
+
+async def rebalance_positions(
+    session: AsyncSession,
+    user_id: int,
+) -> int:
+    """
+    Rewrite the positions of the tasks of a user to the shortest keys,
+    keeping their order.
+
+    The tasks are locked until the transaction, which the caller must
+    commit, ends. The time of their last change is kept.
+
+    Parameters
+    ----------
+    session : AsyncSession
+        An active SQLAlchemy asynchronous session used for database operations.
+    user_id : int
+        The ID of the user whose tasks are rebalanced.
+
+    Returns
+    -------
+    int
+        The number of rebalanced tasks.
+    """
+    result = await session.scalars(
+        select(Task.id)
+        .where(Task.user_id == user_id)
+        .order_by(Task.position, Task.id)
+        .with_for_update()
+    )
+    task_ids = result.all()
+    if task_ids:
+        tasks = Task.__table__
+        await session.execute(
+            update(tasks)
+            .where(tasks.c.id == bindparam("task_id"))
+            .values(position=bindparam("new_position"), updated_at=tasks.c.updated_at),
+            [
+                {"task_id": task_id, "new_position": position}
+                for task_id, position in zip(task_ids, keys_after(None))
+            ],
+        )
+    return len(task_ids)
+
+
+def in_subtree(prefix):
+    """
+    Return the condition that a task lies below a path prefix.
+
+    Parameters
+    ----------
+    prefix : str or ColumnElement
+        The path of the subtasks of the root of the subtree.
+
+    Returns
+    -------
+    ColumnElement
+        A range condition on the path that uses the (user_id, path)
+        index.
+    """
+    return and_(Task.path >= prefix, Task.path < prefix + SUBTREE_END)
+
+
+async def lock_trees(session: AsyncSession, user_id: int) -> None:
+    """
+    Serialize the changes of the trees of subtasks of a user.
+
+    The row of the user is locked until the end of the transaction.
+    `FOR NO KEY UPDATE` does not block the foreign key checks of the
+    other writes of the user's tasks.
+
+    Parameters
+    ----------
+    session : AsyncSession
+        An active SQLAlchemy asynchronous session used for database operations.
+    user_id : int
+        The ID of the user.
+    """
+    await session.execute(
+        select(User.id).where(User.id == user_id).with_for_update(key_share=True)
+    )
+
+
+async def create_subtask(
+    session: AsyncSession,
+    user_id: int,
+    parent_id: int,
+    task_data: schemas.TaskCreate,
+    max_depth: int,
+    max_children: int,
+) -> Task:
+    """
+    Create a subtask of a task of a user.
+
+    Parameters
+    ----------
+    session : AsyncSession
+        An active SQLAlchemy asynchronous session used for database operations.
+    user_id : int
+        The ID of the user who owns the tasks.
+    parent_id : int
+        The ID of the task the new task is a subtask of.
+    task_data : TaskCreate
+        An instance containing the data required to create a new task.
+    max_depth : int
+        The number of levels of subtasks below a top-level task.
+    max_children : int
+        The number of direct subtasks of a task.
+
+    Returns
+    -------
+    Task
+        The created subtask.
+
+    Raises
+    ------
+    NoResultFound
+        If the user has no task with `parent_id`.
+    TreeLimitError
+        If the subtask would be too deep or the parent has too many
+        subtasks.
+    """
+    await lock_trees(session, user_id)
+    parent = (
+        await session.execute(
+            select(Task.id, Task.path).where(
+                Task.id == parent_id, Task.user_id == user_id
+            )
+        )
+    ).one_or_none()
+    if parent is None:
+        raise NoResultFound(f"Task with id {parent_id} not found.")
+    path = f"{parent.path}{parent.id}/"
+    if path.count("/") > max_depth:
+        raise TreeLimitError(f"Subtasks may be at most {max_depth} levels deep.")
+    children = await session.scalar(
+        select(func.count()).select_from(Task).where(Task.parent_id == parent.id)
+    )
+    if children >= max_children:
+        raise TreeLimitError(f"A task may have at most {max_children} subtasks.")
+
+    positions = await append_positions(session, {user_id: 1})
+    task = Task(
+        title=task_data.title,
+        description=task_data.description,
+        status=task_data.status,
+        tags=task_data.tags,
+        user_id=user_id,
+        position=positions[user_id][0],
+        parent_id=parent.id,
+        path=path,
+    )
+    session.add(task)
+    await session.commit()
+    return task
+
+
+@read_only()
+async def get_subtree(
+    session: AsyncSession,
+    user_id: int,
+    task_id: int,
+) -> list:
+    """
+    Retrieve a task of a user and all its subtasks in a single query.
+
+    The prefix of the paths of the subtree is computed from the root
+    by a subquery, and the subtree is read by a range scan of the
+    (user_id, path) index.
+
+    Parameters
+    ----------
+    session : AsyncSession
+        An active SQLAlchemy asynchronous session used for database operations.
+    user_id : int
+        The ID of the user who owns the tasks.
+    task_id : int
+        The unique identifier of the root of the subtree.
+
+    Returns
+    -------
+    list[Row]
+        Rows with the `id`, `title`, `description`, `status`, `tags`,
+        `parent_id` and `path` of the tasks, every level of the tree
+        after the level above it and the subtasks of a task in the
+        order of their positions. Empty if the user has no task with
+        `task_id`.
+    """
+    stmt = lambda_stmt(
+        lambda: select(
+            Task.id,
+            Task.title,
+            Task.description,
+            Task.status,
+            Task.tags,
+            Task.parent_id,
+            Task.path,
+        )
+        .where(
+            Task.user_id == user_id,
+            or_(
+                Task.id == task_id,
+                in_subtree(
+                    select(Task.path + cast(Task.id, String) + "/")
+                    .where(Task.id == task_id, Task.user_id == user_id)
+                    .scalar_subquery()
+                ),
+            ),
+        )
+        .order_by(func.length(Task.path), Task.path, Task.position, Task.id)
+    )
+    return list(await session.execute(stmt))
+
+
+async def move_subtree(
+    session: AsyncSession,
+    user_id: int,
+    task_id: int,
+    parent_id: int | None,
+    max_depth: int,
+    max_children: int,
+) -> int:
+    """
+    Make a task of a user, with all its subtasks, a subtask of another
+    task or a top-level task.
+
+    The paths of the whole subtree are rewritten by a single UPDATE
+    that replaces their common prefix.
+
+    Parameters
+    ----------
+    session : AsyncSession
+        An active SQLAlchemy asynchronous session used for database operations.
+    user_id : int
+        The ID of the user who owns the tasks.
+    task_id : int
+        The unique identifier of the root of the moved subtree.
+    parent_id : int or None
+        The ID of the new parent task, or None to make the task a
+        top-level task.
+    max_depth : int
+        The number of levels of subtasks below a top-level task.
+    max_children : int
+        The number of direct subtasks of a task.
+
+    Returns
+    -------
+    int
+        The number of moved tasks.
+
+    Raises
+    ------
+    NoResultFound
+        If the user has no task with `task_id` or `parent_id`.
+    TreeLimitError
+        If the new parent is in the moved subtree, the subtree would
+        get too deep or the new parent has too many subtasks.
+    """
+    await lock_trees(session, user_id)
+    task = (
+        await session.execute(
+            select(Task.id, Task.path, Task.parent_id).where(
+                Task.id == task_id, Task.user_id == user_id
+            )
+        )
+    ).one_or_none()
+    if task is None:
+        raise NoResultFound(f"Task with id {task_id} not found.")
+    if task.parent_id == parent_id:
+        return 0
+    subtree = f"{task.path}{task.id}/"
+
+    path = ""
+    if parent_id is not None:
+        parent = (
+            await session.execute(
+                select(Task.id, Task.path).where(
+                    Task.id == parent_id, Task.user_id == user_id
+                )
+            )
+        ).one_or_none()
+        if parent is None:
+            raise NoResultFound(f"Task with id {parent_id} not found.")
+        path = f"{parent.path}{parent.id}/"
+        if path.startswith(subtree):
+            raise TreeLimitError("A task cannot be moved into its own subtasks.")
+        children = await session.scalar(
+            select(func.count()).select_from(Task).where(Task.parent_id == parent.id)
+        )
+        if children >= max_children:
+            raise TreeLimitError(f"A task may have at most {max_children} subtasks.")
+
+    deepest = await session.scalar(
+        select(
+            func.max(
+                func.length(Task.path) - func.length(func.replace(Task.path, "/", ""))
+            )
+        ).where(Task.user_id == user_id, in_subtree(subtree))
+    )
+    height = deepest - task.path.count("/") if deepest is not None else 0
+    if path.count("/") + height > max_depth:
+        raise TreeLimitError(f"Subtasks may be at most {max_depth} levels deep.")
+
+    result = await session.execute(
+        update(Task)
+        .where(
+            Task.user_id == user_id,
+            or_(Task.id == task_id, in_subtree(subtree)),
+        )
+        .values(
+            path=literal(path, String) + func.substr(Task.path, len(task.path) + 1),
+            parent_id=case((Task.id == task_id, parent_id), else_=Task.parent_id),
+            updated_at=case((Task.id == task_id, func.now()), else_=Task.updated_at),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    return result.rowcount
@@ -1,8 +1,9 @@
-from sqlalchemy import select
+from sqlalchemy import lambda_stmt, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.core import schemas
 from api.core.models import User
+from api.db.dbhelper import read_only
 
 
 async def create_user(
@@ -39,6 +40,7 @@ async def create_user(
     return True if user.id else False
 
 
+@read_only(retry_on_primary_if_none=True)
 async def get_user_by_id(
     session: AsyncSession,
     id: int,
@@ -57,11 +59,12 @@ async def get_user_by_id(
     -------
     UserSchema or None
     """
-    stmt = select(User).where(User.id == id)
+    stmt = lambda_stmt(lambda: select(User).where(User.id == id))
     user = await session.scalar(stmt)
     return user
 
 
+@read_only(retry_on_primary_if_none=True)
 async def get_user_by_username(
     session: AsyncSession,
     username: str,
@@ -80,6 +83,6 @@ async def get_user_by_username(
     -------
     UserSchema or None
     """
-    stmt = select(User).where(User.username == username)
+    stmt = lambda_stmt(lambda: select(User).where(User.username == username))
     user = await session.scalar(stmt)
     return user
@@ -1,9 +1,290 @@
-from asyncio import current_task
+import asyncio
+import logging
+import time
+from functools import wraps
+from itertools import count
+from typing import Iterable
 
-from sqlalchemy.ext.asyncio import (async_scoped_session, async_sessionmaker,
-                                    create_async_engine)
+from aioredis import Redis
+from sqlalchemy import Engine, event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import (AsyncEngine, AsyncSession,
+                                    async_sessionmaker)
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
 
 from api.core.config import settings
+from api.core.deadline import (CANCEL_GRACE, DeadlineExceeded, check_deadline,
+                               remaining)
+from api.core.lazy import LazyObject, resolve
+from api.db.db_metrics import (connection_hold_time,
+                               create_instrumented_engine,
+                               request_acquire_time, statement_cache)
+from api.redis_client import RedisUnavailableError, redis
+
+logger = logging.getLogger(__name__)
+
+# The SQLSTATE of a statement cancelled by statement_timeout.
+QUERY_CANCELED = "57014"
+
+
+class ReplicaPool:
+    """
+    Round-robin pool of read replica engines.
+
+    Replicas that fail a health check or a query are skipped until
+    the next successful health check.
+
+    Attributes
+    ----------
+    engines : list[AsyncEngine]
+        The asynchronous engines created for the replica URLs.
+    health_check_interval : float
+        Seconds between two health checks of the replicas.
+    """
+
+    def __init__(
+        self,
+        urls: list[str],
+        echo: bool = False,
+        health_check_interval: float = 5,
+        **engine_options,
+    ) -> None:
+        self.engines = [
+            create_instrumented_engine(url=url, echo=echo, **engine_options)
+            for url in urls
+        ]
+        self.health_check_interval = health_check_interval
+        self._healthy = {engine: True for engine in self.engines}
+        self._counter = count()
+        self._health_check_task: asyncio.Task | None = None
+
+    def get_engine(self) -> AsyncEngine | None:
+        """
+        Return the next healthy replica engine.
+
+        Returns
+        -------
+        AsyncEngine or None
+            The replica engine, or None if there are no healthy replicas.
+        """
+        healthy = [engine for engine in self.engines if self._healthy[engine]]
+        if not healthy:
+            return None
+        return healthy[next(self._counter) % len(healthy)]
+
+    def mark_unhealthy(self, engine: AsyncEngine) -> None:
+        """
+        Exclude a replica from routing until its next successful
+        health check.
+
+        Parameters
+        ----------
+        engine : AsyncEngine
+            The replica engine that failed.
+        """
+        self._healthy[engine] = False
+
+    async def check_health(self) -> None:
+        """
+        Run `SELECT 1` on every replica and update its health flag.
+        """
+        for engine in self.engines:
+            try:
+                async with engine.connect() as connection:
+                    await asyncio.wait_for(
+                        connection.execute(text("SELECT 1")),
+                        timeout=self.health_check_interval,
+                    )
+            except (OSError, DBAPIError, asyncio.TimeoutError):
+                self._healthy[engine] = False
+            else:
+                self._healthy[engine] = True
+
+    async def _run_health_checks(self) -> None:
+        while True:
+            await self.check_health()
+            await asyncio.sleep(self.health_check_interval)
+
+    def start_health_checks(self) -> None:
+        """
+        Start the periodic health checks in the running event loop.
+        """
+        if self.engines and self._health_check_task is None:
+            self._health_check_task = asyncio.create_task(self._run_health_checks())
+
+    async def stop_health_checks(self) -> None:
+        """
+        Stop the periodic health checks.
+        """
+        if self._health_check_task is not None:
+            self._health_check_task.cancel()
+            self._health_check_task = None
+
+
+class RoutingSession(Session):
+    """
+    Session that sends reads made by `read_only` query functions
+    to a read replica and everything else to the primary.
+
+    A user's reads stay on the primary for
+    `DbSettings.read_your_writes_window` seconds after that user's
+    last commit, so the user reads their own writes. The commit is
+    remembered in the process and, when the helper has a Redis client,
+    in a Redis key that expires after the window, so the requests
+    served by other processes see it too. Without Redis the guarantee
+    holds only within one process.
+    """
+
+    def __init__(self, *args, db_helper: "DataBaseHelper", **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.db_helper = db_helper
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if (
+            self.info.get("read_only")
+            and not self._flushing
+            and not isinstance(clause, UpdateBase)
+            and not self.info.get("sticky")
+            and not self.db_helper.is_sticky(self.info.get("user_id"))
+        ):
+            engine = self.db_helper.replicas.get_engine()
+            if engine is not None:
+                self.info["replica"] = engine
+                return engine.sync_engine
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _remember_flush(session: RoutingSession, flush_context) -> None:
+    session.info["has_writes"] = True
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_flush(session: RoutingSession) -> None:
+    session.info.pop("has_writes", None)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _remember_write(session: RoutingSession) -> None:
+    if session.info.pop("has_writes", False):
+        session.db_helper.record_write(session.info.get("user_id"))
+        session.info["unshared_write"] = True
+
+
+class RoutingAsyncSession(AsyncSession):
+    """
+    Session that shares the commits of a user with the other processes
+    before `commit` returns.
+    """
+
+    async def commit(self) -> None:
+        await super().commit()
+        if self.info.pop("unshared_write", False):
+            await self.sync_session.db_helper.share_writes([self.info.get("user_id")])
+
+
+@event.listens_for(RoutingSession, "after_begin")
+def _bound_by_deadline(session: RoutingSession, transaction, connection) -> None:
+    # The server cancels the statements of the transaction at the
+    # deadline of the request, so a slow query does not keep holding
+    # the connection after the client has given up.
+    timeout = check_deadline()
+    if timeout is None or connection.dialect.name != "postgresql":
+        return
+    default = session.db_helper.statement_timeout
+    if default and timeout <= default <= timeout + CANCEL_GRACE:
+        # The default of the connection already cancels the statements
+        # before the request is cancelled, e.g. in the first
+        # transaction of a request with the default deadline.
+        return
+    connection.exec_driver_sql(
+        f"SET LOCAL statement_timeout = {max(int(timeout * 1000), 1)}"
+    )
+
+
+@event.listens_for(Engine, "handle_error")
+def _translate_statement_timeout(context) -> Exception | None:
+    if (
+        remaining() is not None
+        and getattr(context.original_exception, "sqlstate", None) == QUERY_CANCELED
+    ):
+        return DeadlineExceeded("The deadline of the request has passed")
+    return None
+
+
+async def release_connection(session: AsyncSession) -> None:
+    """
+    Return the connections of a session to the pool if it has no
+    unfinished writes.
+
+    The transaction is committed rather than closed, so the loaded
+    objects stay attached to the session and keep their state.
+
+    Parameters
+    ----------
+    session : AsyncSession
+        The session whose connections are released.
+    """
+    if (
+        session.in_transaction()
+        and not session.info.get("has_writes")
+        and not (session.new or session.dirty or session.deleted)
+    ):
+        await session.commit()
+
+
+def read_only(retry_on_primary_if_none: bool = False):
+    """
+    Mark a query function as safe to run on a read replica.
+
+    The decorated function must receive the session as the `session`
+    keyword argument. If the replica fails, it is excluded from routing
+    and the query is repeated on the primary. After the query the
+    connection is returned to the pool, unless the session has
+    unfinished writes.
+
+    Parameters
+    ----------
+    retry_on_primary_if_none : bool
+        Repeat the query on the primary when the replica returns None.
+        Useful for lookups of rows that may have just been created and
+        not yet replicated.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            session = kwargs["session"]
+            user_id = session.info.get("user_id")
+            if user_id is not None and "sticky" not in session.info:
+                # Checked once per session, the writes of the session
+                # itself are remembered on commit.
+                helper = session.sync_session.db_helper
+                session.info["sticky"] = await helper.wrote_recently(user_id)
+            session.info["read_only"] = True
+            try:
+                result = await func(*args, **kwargs)
+            except (OSError, DBAPIError):
+                replica = session.info.pop("replica", None)
+                if replica is None:
+                    raise
+                db_helper.replicas.mark_unhealthy(replica)
+                session.info["read_only"] = False
+                await session.rollback()
+                return await func(*args, **kwargs)
+            finally:
+                session.info["read_only"] = False
+
+            replica = session.info.pop("replica", None)
+            if result is None and retry_on_primary_if_none and replica is not None:
+                result = await func(*args, **kwargs)
+            await release_connection(session)
+            return result
+
+        return wrapper
+
+    return decorator
 
 
 class DataBaseHelper:
@@ -18,6 +299,14 @@ class DataBaseHelper:
     engine : AsyncEngine
         The asynchronous database engine created based on the
         provided URL.
+    replicas : ReplicaPool
+        The pool of read replica engines.
+    statement_timeout : float
+        The default statement_timeout of the connections in seconds,
+        zero if none.
+    redis : Redis or None
+        The client that shares the read-your-writes markers between
+        processes.
     session_factory : async_sessionmaker
         The factory for creating asynchronous sessions.
 
@@ -26,35 +315,206 @@ class DataBaseHelper:
     init(self, url: str, echo: bool = False)
         Initializes an instance of DatabaseHelper with the specified
         parameters.
-    get_scoped_session(self)
-        Returns a new managed session associated with the current task.
+    get_session(self)
+        Returns a new session that connects on its first query.
+    record_write(self, user_id: int | None)
+        Remembers that the user has just written to the primary.
+    share_writes(self, user_ids: Iterable[int | None])
+        Tells the other processes that the users have just written.
+    is_sticky(self, user_id: int | None)
+        Checks whether the user's reads must still go to the primary.
+    wrote_recently(self, user_id: int | None)
+        Checks the same in every process.
+    pool_metrics(self)
+        Returns the live metrics of the primary and replica pools.
     """
 
-    def __init__(self, url: str, echo: bool = False) -> None:
-        self.engine = create_async_engine(
+    def __init__(
+        self,
+        url: str,
+        echo: bool = False,
+        replica_urls: list[str] | None = None,
+        replica_health_check_interval: float = 5,
+        read_your_writes_window: float = 2,
+        statement_timeout: float = 0,
+        redis: Redis | None = None,
+        last_write_key_prefix: str = "db:last_write:",
+        **engine_options,
+    ) -> None:
+        self.engine = create_instrumented_engine(
             url=url,
             echo=echo,
+            **engine_options,
         )
+        self.replicas = ReplicaPool(
+            urls=replica_urls or [],
+            echo=echo,
+            health_check_interval=replica_health_check_interval,
+            **engine_options,
+        )
+        self.read_your_writes_window = read_your_writes_window
+        self.statement_timeout = statement_timeout
+        self.redis = redis
+        self.last_write_key_prefix = last_write_key_prefix
+        self._last_writes: dict[int, float] = {}
         self.session_factory = async_sessionmaker(
             bind=self.engine,
+            class_=RoutingAsyncSession,
+            sync_session_class=RoutingSession,
+            db_helper=self,
             autocommit=False,
             autoflush=False,
             expire_on_commit=False,
         )
 
-    def get_scoped_session(self):
+    def get_session(self) -> AsyncSession:
         """
-        Return a new managed session associated with the current task.
+        Return a new session.
+
+        The session checks out a connection only when it runs its
+        first query.
 
         Returns
         -------
-        async_scoped_session
-            The managed session.
+        AsyncSession
+            The new session.
         """
-        return async_scoped_session(
-            session_factory=self.session_factory,
-            scopefunc=current_task,
-        )
+        return self.session_factory()
+
+    def record_write(self, user_id: int | None) -> None:
+        """
+        Remember that the user has just committed a write.
+
+        Parameters
+        ----------
+        user_id : int or None
+            The ID of the user who made the write.
+        """
+        if user_id is None or not self.replicas.engines:
+            return
+        now = time.monotonic()
+        self._last_writes[user_id] = now
+        if len(self._last_writes) > 10_000:
+            self._last_writes = {
+                user: written_at
+                for user, written_at in self._last_writes.items()
+                if now - written_at < self.read_your_writes_window
+            }
+
+    async def share_writes(self, user_ids: Iterable[int | None]) -> None:
+        """
+        Remember in Redis that the users have just committed a write.
+
+        The markers expire after the read-your-writes window. A marker
+        that cannot be written is logged, and only the process that
+        made the write then sends the user's reads to the primary.
+
+        Parameters
+        ----------
+        user_ids : Iterable[int or None]
+            The IDs of the users who made the writes.
+        """
+        user_ids = {user_id for user_id in user_ids if user_id is not None}
+        if self.redis is None or not self.replicas.engines or not user_ids:
+            return
+        window_ms = max(int(self.read_your_writes_window * 1000), 1)
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for user_id in user_ids:
+                    pipe.set(f"{self.last_write_key_prefix}{user_id}", 1, px=window_ms)
+                await pipe.execute()
+        except RedisUnavailableError:
+            logger.warning("Writes of users %s were not shared", sorted(user_ids))
+
+    def is_sticky(self, user_id: int | None) -> bool:
+        """
+        Check whether the user's reads must still go to the primary.
+
+        Parameters
+        ----------
+        user_id : int or None
+            The ID of the user who makes the read.
+
+        Returns
+        -------
+        bool
+            True if the user wrote within the read-your-writes window.
+        """
+        written_at = self._last_writes.get(user_id)
+        if written_at is None:
+            return False
+        return time.monotonic() - written_at < self.read_your_writes_window
+
+    async def wrote_recently(self, user_id: int | None) -> bool:
+        """
+        Check whether the user wrote within the read-your-writes window
+        in this or any other process.
+
+        Parameters
+        ----------
+        user_id : int or None
+            The ID of the user who makes the read.
+
+        Returns
+        -------
+        bool
+            True if the user's reads must go to the primary. Also True
+            when Redis cannot be reached, so the user does not miss a
+            write made elsewhere.
+        """
+        if user_id is None or not self.replicas.engines:
+            return False
+        if self.is_sticky(user_id):
+            return True
+        if self.redis is None:
+            return False
+        try:
+            return bool(
+                await self.redis.exists(f"{self.last_write_key_prefix}{user_id}")
+            )
+        except RedisUnavailableError:
+            return True
+
+    async def dispose(self) -> None:
+        """
+        Stop the replica health checks and close every pooled
+        connection of the primary and the replicas.
+        """
+        await self.replicas.stop_health_checks()
+        await self.engine.dispose()
+        for engine in self.replicas.engines:
+            await engine.dispose()
+
+    def pool_metrics(self) -> dict:
+        """
+        Return the live metrics of the primary and replica pools.
+
+        Returns
+        -------
+        dict
+            The state of every pool, the histogram of the time each
+            request spent acquiring connections, the histogram of the
+            time connections were held and the compiled statement
+            cache counters.
+        """
+        return {
+            "primary": self.engine.pool.snapshot(),
+            "replicas": [engine.pool.snapshot() for engine in self.replicas.engines],
+            "request_acquire_time": request_acquire_time.snapshot(),
+            "connection_hold_time": connection_hold_time.snapshot(),
+            "statement_cache": statement_cache.snapshot(),
+        }
 
 
-db_helper = DataBaseHelper(url=settings.db_settings.url)
+db_helper: DataBaseHelper = LazyObject(
+    lambda: DataBaseHelper(
+        url=settings.db_settings.url,
+        replica_urls=settings.db_settings.replica_urls,
+        replica_health_check_interval=settings.db_settings.replica_health_check_interval,
+        read_your_writes_window=settings.db_settings.read_your_writes_window,
+        statement_timeout=settings.db_settings.statement_timeout,
+        redis=resolve(redis),
+        last_write_key_prefix=settings.db_settings.last_write_key_prefix,
+        **settings.db_settings.engine_options(),
+    )
+)
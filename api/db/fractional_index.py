@@ -0,0 +1,170 @@
+from typing import Iterator
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+FIRST_KEY = "a0"
+SMALLEST_INTEGER = "A" + DIGITS[0] * 26
+
+
+class InvalidKeyError(ValueError):
+    """
+    Raised for a malformed key or keys that are not in order.
+    """
+
+
+def _integer_length(head: str) -> int:
+    if "a" <= head <= "z":
+        return ord(head) - ord("a") + 2
+    if "A" <= head <= "Z":
+        return ord("Z") - ord(head) + 2
+    raise InvalidKeyError(f"Invalid head of the key: {head!r}")
+
+
+def _split(key: str) -> tuple[str, str]:
+    length = _integer_length(key[0])
+    if length > len(key):
+        raise InvalidKeyError(f"Invalid key: {key!r}")
+    integer, fraction = key[:length], key[length:]
+    if key == SMALLEST_INTEGER or fraction.endswith(DIGITS[0]):
+        raise InvalidKeyError(f"Invalid key: {key!r}")
+    return integer, fraction
+
+
+def _midpoint(a: str, b: str | None) -> str:
+    # The digits of a fraction strictly between a and b, both read as
+    # fractions in base 62 without trailing zeros.
+    if b is not None:
+        common = 0
+        while (a[common] if common < len(a) else DIGITS[0]) == b[common]:
+            common += 1
+        if common:
+            return b[:common] + _midpoint(a[common:], b[common:])
+    digit_a = DIGITS.index(a[0]) if a else 0
+    digit_b = DIGITS.index(b[0]) if b is not None else len(DIGITS)
+    if digit_b - digit_a > 1:
+        return DIGITS[(digit_a + digit_b + 1) // 2]
+    if b is not None and len(b) > 1:
+        return b[0]
+    return DIGITS[digit_a] + _midpoint(a[1:], None)
+
+
+def _increment(integer: str) -> str | None:
+    head, digits = integer[0], list(integer[1:])
+    for index in reversed(range(len(digits))):
+        digit = DIGITS.index(digits[index]) + 1
+        if digit < len(DIGITS):
+            digits[index] = DIGITS[digit]
+            return head + "".join(digits)
+        digits[index] = DIGITS[0]
+    if head == "Z":
+        return "a" + DIGITS[0]
+    if head == "z":
+        return None
+    head = chr(ord(head) + 1)
+    if head > "a":
+        digits.append(DIGITS[0])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def _decrement(integer: str) -> str | None:
+    head, digits = integer[0], list(integer[1:])
+    for index in reversed(range(len(digits))):
+        digit = DIGITS.index(digits[index]) - 1
+        if digit >= 0:
+            digits[index] = DIGITS[digit]
+            return head + "".join(digits)
+        digits[index] = DIGITS[-1]
+    if head == "a":
+        return "Z" + DIGITS[-1]
+    if head == "A":
+        return None
+    head = chr(ord(head) - 1)
+    if head < "Z":
+        digits.append(DIGITS[-1])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def key_between(a: str | None, b: str | None) -> str:
+    """
+    Generate a key that sorts strictly between two keys.
+
+    Keys are compared as byte strings. A key is a variable-length
+    integer part, whose first character encodes its length, followed
+    by an optional fraction in base 62. Appending or prepending only
+    increments or decrements the integer part, so keys grow
+    logarithmically with the number of items; repeated inserts between
+    the same two items grow the fraction by about one character every
+    six inserts.
+
+    Parameters
+    ----------
+    a : str or None
+        The key before the new one, or None to generate a key before `b`.
+    b : str or None
+        The key after the new one, or None to generate a key after `a`.
+
+    Returns
+    -------
+    str
+        The new key.
+
+    Raises
+    ------
+    InvalidKeyError
+        If a key is malformed, or `a` does not sort before `b`.
+    """
+    if a is not None:
+        integer_a, fraction_a = _split(a)
+    if b is not None:
+        integer_b, fraction_b = _split(b)
+    if a is not None and b is not None and a >= b:
+        raise InvalidKeyError(f"{a!r} does not sort before {b!r}")
+
+    if a is None:
+        if b is None:
+            return FIRST_KEY
+        if integer_b == SMALLEST_INTEGER:
+            return integer_b + _midpoint("", fraction_b)
+        if integer_b < b:
+            return integer_b
+        key = _decrement(integer_b)
+        if key is None:
+            raise InvalidKeyError("Cannot generate a key before the smallest key")
+        return key
+
+    if b is None:
+        key = _increment(integer_a)
+        return integer_a + _midpoint(fraction_a, None) if key is None else key
+
+    if integer_a == integer_b:
+        return integer_a + _midpoint(fraction_a, fraction_b)
+    key = _increment(integer_a)
+    if key is not None and key < b:
+        return key
+    return integer_a + _midpoint(fraction_a, None)
+
+
+def keys_after(a: str | None) -> Iterator[str]:
+    """
+    Generate an endless sequence of increasing keys after a key.
+
+    Starting from None, the keys are the shortest possible ones, which
+    is what the rebalancer rewrites the positions to.
+
+    Parameters
+    ----------
+    a : str or None
+        The key before the first generated one, or None to start at
+        the first key.
+
+    Yields
+    ------
+    str
+        The next key.
+    """
+    while True:
+        a = key_between(a, None)
+        yield a
@@ -0,0 +1,257 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from api.core.config import settings
+from api.core.lazy import LazyObject
+from api.core.timing import current_timing
+
+logger = logging.getLogger(__name__)
+
+MAX_LOGGED_STATEMENT_LENGTH = 2000
+MAX_SHAPE_PARAMETERS = 20
+
+_query_count: ContextVar["QueryCount | None"] = ContextVar("query_count", default=None)
+
+
+class QueryCount:
+    """
+    Queries run inside a `count_queries` block.
+
+    Blocks may be nested, e.g. a test counting the queries of a request
+    that the application counts as well. Every query is added to all
+    enclosing blocks.
+
+    Attributes
+    ----------
+    count : int
+        The number of queries.
+    duration : float
+        The total time of the queries in seconds.
+    statements : list[str] or None
+        The SQL of every query, if the block records them.
+    parent : QueryCount or None
+        The enclosing block.
+    """
+
+    __slots__ = ("count", "duration", "statements", "parent")
+
+    def __init__(
+        self,
+        record_statements: bool = False,
+        parent: "QueryCount | None" = None,
+    ) -> None:
+        self.count = 0
+        self.duration = 0.0
+        self.statements: list[str] | None = [] if record_statements else None
+        self.parent = parent
+
+    def add(self, statement: str, duration: float) -> None:
+        """
+        Add a query to this block and all enclosing blocks.
+
+        Parameters
+        ----------
+        statement : str
+            The SQL of the query.
+        duration : float
+            The time of the query in seconds.
+        """
+        block = self
+        while block is not None:
+            block.count += 1
+            block.duration += duration
+            if block.statements is not None:
+                block.statements.append(statement)
+            block = block.parent
+
+
+@contextmanager
+def count_queries(record_statements: bool = False):
+    """
+    Count the queries run inside the block, in the current task and the
+    tasks it starts.
+
+    Parameters
+    ----------
+    record_statements : bool, optional
+        Whether to keep the SQL of every query. Defaults to False.
+
+    Yields
+    ------
+    QueryCount
+        The counters, updated as queries run.
+    """
+    block = QueryCount(record_statements, parent=_query_count.get())
+    token = _query_count.set(block)
+    try:
+        yield block
+    finally:
+        _query_count.reset(token)
+
+
+@contextmanager
+def assert_query_count(expected: int):
+    """
+    Fail if the block does not run exactly the expected number of
+    queries.
+
+    Meant for tests that pin the number of queries of an endpoint, e.g.
+    around a request sent through `httpx.ASGITransport`::
+
+        with assert_query_count(2):
+            await client.get("/api/v1/tasks/", headers=headers)
+
+    Parameters
+    ----------
+    expected : int
+        The expected number of queries.
+
+    Yields
+    ------
+    QueryCount
+        The counters of the block.
+
+    Raises
+    ------
+    AssertionError
+        If the number of queries differs. The message lists the SQL of
+        every query that was run.
+    """
+    with count_queries(record_statements=True) as block:
+        yield block
+    if block.count != expected:
+        statements = "\n".join(
+            f"{number}. {statement}"
+            for number, statement in enumerate(block.statements, start=1)
+        )
+        raise AssertionError(
+            f"Expected {expected} queries, {block.count} were run:\n{statements}"
+        )
+
+
+def parameter_shape(parameters, executemany: bool) -> str:
+    """
+    Describe the bound parameters of a query without their values.
+
+    Parameters
+    ----------
+    parameters : dict, tuple, list or None
+        The parameters passed to the cursor.
+    executemany : bool
+        Whether `parameters` holds the parameters of several rows.
+
+    Returns
+    -------
+    str
+        The types of the parameters, e.g. "(int, str)", "{id: int}" or
+        "100 x (int, str)" for several rows.
+    """
+    if executemany and parameters:
+        return f"{len(parameters)} x {parameter_shape(parameters[0], False)}"
+    if not parameters:
+        return "()"
+    if isinstance(parameters, dict):
+        items = [
+            f"{name}: {type(value).__name__}"
+            for name, value in list(parameters.items())[:MAX_SHAPE_PARAMETERS]
+        ]
+        opening, closing = "{", "}"
+    else:
+        items = [
+            type(value).__name__ for value in list(parameters)[:MAX_SHAPE_PARAMETERS]
+        ]
+        opening, closing = "(", ")"
+    if len(parameters) > MAX_SHAPE_PARAMETERS:
+        items.append(f"... {len(parameters)} parameters")
+    return f"{opening}{', '.join(items)}{closing}"
+
+
+class QueryProfiler:
+    """
+    Engine event listeners that time every query.
+
+    The time of each query is added to the Server-Timing of the current
+    request and to the enclosing `count_queries` blocks. Queries slower
+    than the threshold are logged with the shape of their parameters,
+    but never with the values.
+
+    Parameters
+    ----------
+    slow_query_threshold : float
+        Seconds after which a query is logged as slow. Zero or less
+        disables the log.
+    """
+
+    def __init__(self, slow_query_threshold: float) -> None:
+        self.slow_query_threshold = slow_query_threshold
+
+    def instrument(self, engine: AsyncEngine) -> None:
+        """
+        Listen to the queries of an engine.
+
+        Parameters
+        ----------
+        engine : AsyncEngine
+            The engine.
+        """
+        event.listen(engine.sync_engine, "before_cursor_execute", self._before)
+        event.listen(engine.sync_engine, "after_cursor_execute", self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_started_at"] = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started_at = conn.info.pop("query_started_at", None)
+        if started_at is None:
+            return
+        elapsed = time.perf_counter() - started_at
+        timing = current_timing()
+        if timing is not None:
+            timing.add("db", elapsed)
+        block = _query_count.get()
+        if block is not None:
+            block.add(statement, elapsed)
+        if 0 < self.slow_query_threshold <= elapsed:
+            logger.warning(
+                "Slow query (%.1f ms, parameters %s): %s",
+                elapsed * 1000,
+                parameter_shape(parameters, executemany),
+                " ".join(statement.split())[:MAX_LOGGED_STATEMENT_LENGTH],
+            )
+
+
+def check_query_budget(block: QueryCount, method: str, path: str) -> None:
+    """
+    Log a request that ran more queries than `DbSettings.query_budget`.
+
+    Parameters
+    ----------
+    block : QueryCount
+        The queries of the request.
+    method : str
+        The HTTP method of the request.
+    path : str
+        The path of the request.
+    """
+    budget = settings.db_settings.query_budget
+    if 0 < budget < block.count:
+        logger.warning(
+            "%s %s ran %d queries in %.1f ms, over the budget of %d",
+            method,
+            path,
+            block.count,
+            block.duration * 1000,
+            budget,
+        )
+
+
+query_profiler: QueryProfiler = LazyObject(
+    lambda: QueryProfiler(
+        slow_query_threshold=settings.db_settings.slow_query_threshold_ms / 1000,
+    )
+)
@@ -0,0 +1,246 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Hashable
+
+from aioredis import Redis
+
+from api.core.config import settings
+from api.core.deadline import start_deadline
+from api.core.lazy import LazyObject, resolve
+from api.metrics import coalesced_reads
+from api.redis_client import RedisUnavailableError, redis
+
+logger = logging.getLogger(__name__)
+
+# The channel that carries the invalidations of all processes.
+INVALIDATION_CHANNEL = "read_coalescer:invalidate"
+
+
+class ReadCoalescer:
+    """
+    Shares one execution of identical concurrent reads (single flight).
+
+    The first caller of a read starts it as a task; callers asking for
+    the same read of the same scope, typically a user, while it runs
+    wait for that task and get the same result or exception. Nothing
+    is cached: the read is forgotten as soon as it completes.
+
+    Every scope has a generation that `invalidate` changes after a
+    write, and reads only join a read started in the same generation.
+    A read that starts after a write therefore never gets a result
+    loaded before it.
+
+    Writes made by other processes, such as the other workers of the
+    server, the write-behind worker and the job worker, are published
+    on `INVALIDATION_CHANNEL` and applied by a listener started with
+    `start`. Until the listener is subscribed, and whenever it fails,
+    reads are not shared.
+
+    Parameters
+    ----------
+    enabled : bool
+        Whether reads are shared. If False, every caller runs its read.
+    max_scopes : int
+        The number of invalidated scopes that are remembered. When it
+        is exceeded, all scopes are invalidated at once.
+    timeout : float or None
+        The deadline of every shared read in seconds. A shared read is
+        not bound to the deadline of the request that happened to start
+        it; every caller still stops waiting at its own deadline.
+    redis : Redis, optional
+        The client that publishes and receives the invalidations. If
+        None, only the writes of this process invalidate its reads,
+        and reads are shared without a listener.
+    health_check_interval : float
+        Seconds of silence on the invalidation channel after which the
+        listener checks its connection with PING.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        max_scopes: int = 10_000,
+        timeout: float | None = None,
+        redis: Redis | None = None,
+        health_check_interval: float = 30,
+    ) -> None:
+        self.enabled = enabled
+        self.max_scopes = max_scopes
+        self.timeout = timeout
+        self.redis = redis
+        self.health_check_interval = health_check_interval
+        self._flights: dict[tuple, asyncio.Task] = {}
+        self._generations: dict[Hashable, int] = {}
+        self._counter = 0
+        self._floor = 0
+        self._id = uuid.uuid4().hex
+        self._synced = redis is None
+        self._task: asyncio.Task | None = None
+
+    async def invalidate(self, scope: Hashable) -> None:
+        """
+        Make the reads of a scope started from now on run anew, in this
+        and in every other process.
+
+        Must be called after a write of the scope is committed.
+
+        Parameters
+        ----------
+        scope : Hashable
+            The scope of the write, e.g. the ID of the user. It is sent
+            to the other processes as JSON, so it must be a string or
+            a number.
+        """
+        self._invalidate(scope)
+        if not self.enabled or self.redis is None:
+            return
+        try:
+            await self.redis.publish(
+                INVALIDATION_CHANNEL, f"{self._id} {json.dumps(scope)}"
+            )
+        except RedisUnavailableError:
+            # The listeners of the other processes lost the connection
+            # too, so they are not sharing reads.
+            logger.warning("Invalidation of %r was not published", scope)
+
+    def _invalidate(self, scope: Hashable) -> None:
+        self._counter += 1
+        self._generations[scope] = self._counter
+        if len(self._generations) > self.max_scopes:
+            self._invalidate_all()
+
+    def _invalidate_all(self) -> None:
+        # Generations are never reused, so no later read can join a
+        # read started before the scopes were forgotten.
+        self._generations.clear()
+        self._counter += 1
+        self._floor = self._counter
+
+    def _receive(self, data: str) -> None:
+        sender, _, scope = data.partition(" ")
+        if sender != self._id:
+            self._invalidate(json.loads(scope))
+
+    async def run(
+        self,
+        scope: Hashable,
+        key: Hashable,
+        read: Callable[[], Awaitable[Any]],
+        name: str,
+    ) -> Any:
+        """
+        Run a read, or wait for the identical read already running.
+
+        The read runs in its own task, so a caller that is cancelled
+        does not cancel it for the others. It must therefore not use
+        the session of the request.
+
+        Parameters
+        ----------
+        scope : Hashable
+            The scope of the read, e.g. the ID of the user.
+        key : Hashable
+            The read and its parameters within the scope.
+        read : Callable[[], Awaitable[Any]]
+            The function that runs the read.
+        name : str
+            The name of the read in the metrics.
+
+        Returns
+        -------
+        Any
+            The result of the read, shared with the other callers, so
+            it must not be modified.
+        """
+        if not self.enabled or not self._synced:
+            return await read()
+        flight_key = (scope, self._generations.get(scope, self._floor), key)
+        flight = self._flights.get(flight_key)
+        if flight is None:
+            flight = asyncio.create_task(self._fly(read))
+            self._flights[flight_key] = flight
+            flight.add_done_callback(lambda _: self._land(flight_key, flight))
+            coalesced_reads.labels(name, "leader").inc()
+        else:
+            coalesced_reads.labels(name, "follower").inc()
+        return await asyncio.shield(flight)
+
+    async def _fly(self, read: Callable[[], Awaitable[Any]]) -> Any:
+        # The task runs in a copy of the context of the caller, so this
+        # does not change the deadline of the caller.
+        start_deadline(self.timeout)
+        return await read()
+
+    def _land(self, flight_key: tuple, flight: asyncio.Task) -> None:
+        if self._flights.get(flight_key) is flight:
+            del self._flights[flight_key]
+        if not flight.cancelled():
+            # Retrieve the exception, so a read nobody waits for any
+            # more is not reported as never retrieved.
+            flight.exception()
+
+    async def _listen(self) -> None:
+        pubsub = self.redis.pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            # Invalidations published before the subscription are lost.
+            self._invalidate_all()
+            self._synced = True
+            logger.info("Read coalescer is listening for invalidations")
+            last_seen = time.monotonic()
+            while True:
+                message = await pubsub.get_message(timeout=self.health_check_interval)
+                now = time.monotonic()
+                if message is not None:
+                    last_seen = now
+                    if message["type"] == "message":
+                        self._receive(message["data"])
+                    continue
+                if now - last_seen > 2 * self.health_check_interval:
+                    raise ConnectionError("Invalidation connection is not responding")
+                await pubsub.ping()
+        finally:
+            self._synced = False
+            await pubsub.close()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Read coalescer invalidation listener failed")
+            await asyncio.sleep(self.health_check_interval)
+
+    def start(self) -> None:
+        """
+        Start listening for invalidations in the running event loop.
+        """
+        if self._task is None and self.enabled and self.redis is not None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stop listening for invalidations and stop sharing reads.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+read_coalescer: ReadCoalescer = LazyObject(
+    lambda: ReadCoalescer(
+        enabled=settings.db_settings.read_coalescing_enabled,
+        timeout=settings.server.request_timeout_max or None,
+        redis=resolve(redis),
+        health_check_interval=settings.redis_settings.redis_health_check_interval,
+    )
+)
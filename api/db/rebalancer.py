@@ -0,0 +1,122 @@
+import asyncio
+import logging
+
+from sqlalchemy import func, select
+
+from api.core.config import settings
+from api.core.lazy import LazyObject
+from api.core.models import Task
+from api.db.db_queries.tasks_qr import rebalance_positions
+from api.db.dbhelper import DataBaseHelper, db_helper
+from api.db.read_coalescer import read_coalescer
+
+logger = logging.getLogger(__name__)
+
+
+class PositionRebalancer:
+    """
+    Background task that keeps the positions of tasks short.
+
+    Moving tasks again and again between the same neighbours makes
+    their positions longer. Users with a position longer than
+    `max_length` get all their positions rewritten to the shortest keys
+    in the same order, one user per transaction.
+
+    Parameters
+    ----------
+    db_helper : DataBaseHelper
+        The helper whose sessions rewrite the positions.
+    max_length : int
+        The longest position left as it is.
+    batch_size : int
+        The number of users looked up at once.
+    interval : float
+        Seconds between two runs.
+    """
+
+    def __init__(
+        self,
+        db_helper: DataBaseHelper,
+        max_length: int,
+        batch_size: int,
+        interval: float,
+    ) -> None:
+        self.db_helper = db_helper
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    async def run_once(self) -> int:
+        """
+        Rebalance every user with a position that is too long.
+
+        The users are visited in the order of their IDs, each one once
+        per run, so a user whose shortest positions are still too long
+        does not keep the run going.
+
+        Returns
+        -------
+        int
+            The number of rebalanced users.
+        """
+        rebalanced = 0
+        last_user_id = None
+        while True:
+            query = select(Task.user_id).where(
+                func.length(Task.position) > self.max_length
+            )
+            if last_user_id is not None:
+                query = query.where(Task.user_id > last_user_id)
+            async with self.db_helper.get_session() as session:
+                result = await session.scalars(
+                    query.distinct().order_by(Task.user_id).limit(self.batch_size)
+                )
+                user_ids = result.all()
+                await session.commit()
+            for user_id in user_ids:
+                async with self.db_helper.get_session() as session:
+                    await rebalance_positions(session=session, user_id=user_id)
+                    await session.commit()
+                await read_coalescer.invalidate(user_id)
+            rebalanced += len(user_ids)
+            if user_ids:
+                last_user_id = user_ids[-1]
+            if len(user_ids) < self.batch_size:
+                return rebalanced
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                rebalanced = await self.run_once()
+            except Exception:
+                logger.exception("Rebalancing task positions failed")
+            else:
+                if rebalanced:
+                    logger.info("Rebalanced the task positions of %d users", rebalanced)
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """
+        Start rebalancing in the running event loop.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stop rebalancing.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+position_rebalancer: PositionRebalancer = LazyObject(
+    lambda: PositionRebalancer(
+        db_helper=db_helper,
+        max_length=settings.db_settings.position_max_length,
+        batch_size=settings.db_settings.rebalance_batch_size,
+        interval=settings.db_settings.rebalance_interval_seconds,
+    )
+)
@@ -0,0 +1,150 @@
+import asyncio
+
+from sqlalchemy import insert
+
+from api.core import schemas
+from api.core.config import settings
+from api.core.deadline import start_deadline, within_deadline
+from api.core.lazy import LazyObject
+from api.core.models import Task
+from api.db.db_queries.tasks_qr import assign_positions
+from api.db.dbhelper import DataBaseHelper, db_helper
+
+
+class TaskInsertCoalescer:
+    """
+    Coalesces concurrent task inserts into multi-row INSERT statements.
+
+    Inserts that arrive within `max_delay_ms` of the first pending one
+    are written in a single transaction, or sooner once `max_rows`
+    inserts are pending. Each caller gets back the ID of its own task.
+    The tasks of a batch are appended to the tasks of their users in
+    the order the inserts arrived in.
+    If a batch fails, its rows are retried one by one, so only the
+    callers whose rows are invalid receive the error.
+
+    A batch is not bound to the deadline of the request that happened
+    to trigger its write; every caller stops waiting for its task at
+    its own deadline.
+
+    Parameters
+    ----------
+    db_helper : DataBaseHelper
+        The helper whose sessions write the batches.
+    max_delay_ms : float
+        Milliseconds an insert may wait for other inserts to join it.
+    max_rows : int
+        The number of pending inserts that triggers an immediate write.
+    timeout : float or None
+        The deadline of the write of every batch in seconds.
+    """
+
+    def __init__(
+        self,
+        db_helper: DataBaseHelper,
+        max_delay_ms: float = 2,
+        max_rows: int = 100,
+        timeout: float | None = None,
+    ) -> None:
+        self.db_helper = db_helper
+        self.max_delay = max_delay_ms / 1000
+        self.max_rows = max_rows
+        self.timeout = timeout
+        self._pending: list[tuple[dict, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._writes: set[asyncio.Task] = set()
+
+    async def insert(self, user_id: int, task_data: schemas.TaskCreate) -> int:
+        """
+        Insert a task as part of the next batch.
+
+        Parameters
+        ----------
+        user_id : int
+            The ID of the user to whom the task is assigned.
+        task_data : TaskCreate
+            The data of the new task.
+
+        Returns
+        -------
+        int
+            The ID of the created task.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        row = {
+            "title": task_data.title,
+            "description": task_data.description,
+            "status": task_data.status,
+            "tags": task_data.tags,
+            "user_id": user_id,
+        }
+        self._pending.append((row, future))
+        if len(self._pending) >= self.max_rows:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+        # The write goes on for the other callers of the batch, so only
+        # the wait is cancelled at the deadline.
+        return await within_deadline(asyncio.shield, future)
+
+    async def drain(self) -> None:
+        """
+        Write the pending inserts now and wait for all running writes.
+        """
+        self._flush()
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            write = asyncio.create_task(self._write_batch(batch))
+            self._writes.add(write)
+            write.add_done_callback(self._writes.discard)
+
+    async def _write_batch(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        # The task runs in a copy of the context of the request that
+        # triggered it, or of the one that started the timer, so this
+        # does not change the deadline of that request.
+        start_deadline(self.timeout)
+        await self._write(batch)
+
+    async def _write(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        try:
+            async with self.db_helper.get_session() as session:
+                rows = await assign_positions(session, [row for row, _ in batch])
+                result = await session.scalars(
+                    insert(Task).returning(Task.id, sort_by_parameter_order=True),
+                    rows,
+                )
+                ids = result.all()
+                await session.commit()
+        except Exception as exc:
+            if len(batch) > 1:
+                await asyncio.gather(*(self._write([item]) for item in batch))
+                return
+            _, future = batch[0]
+            if not future.done():
+                future.set_exception(exc)
+            return
+
+        for row, _ in batch:
+            self.db_helper.record_write(row["user_id"])
+        await self.db_helper.share_writes(row["user_id"] for row, _ in batch)
+        for (row, future), task_id in zip(batch, ids):
+            if not future.done():
+                future.set_result(task_id)
+
+
+task_insert_coalescer: TaskInsertCoalescer = LazyObject(
+    lambda: TaskInsertCoalescer(
+        db_helper=db_helper,
+        max_delay_ms=settings.db_settings.insert_batch_max_delay_ms,
+        max_rows=settings.db_settings.insert_batch_max_rows,
+        timeout=settings.server.request_timeout_max or None,
+    )
+)
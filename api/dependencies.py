@@ -1,3 +1,4 @@
+import asyncio
 from typing import Annotated, AsyncGenerator
 
 from aioredis import Redis
@@ -9,9 +10,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 import api.routers.auth.auth
 import api.routers.auth.auth_helpers
 from api.core import schemas, settings
+from api.core.config import (ACCESS_TOKEN_TYPE, ADMIN_TOKEN_TYPE,
+                             REFRESH_TOKEN_TYPE)
+from api.core.timing import timed
 from api.db import user_qr
 from api.db.dbhelper import db_helper
-from api.redis_client import redis
+from api.db.read_coalescer import read_coalescer
+from api.redis_client import ClientSideCache, redis, redis_cache
 from api.routers.auth import jwt_utils
 
 oauth2_scheme = OAuth2PasswordBearer(
@@ -19,20 +24,25 @@ oauth2_scheme = OAuth2PasswordBearer(
 )
 
 
-async def scoped_session_db() -> AsyncGenerator[AsyncSession, None]:
+async def session_db() -> AsyncGenerator[AsyncSession, None]:
     """
     Creates a new session for each request and ensures it is closed after use.
 
+    The session checks out a connection only on its first query,
+    so requests answered without the database never hold one. The
+    session is closed even if the request is cancelled at its deadline,
+    so its connection goes back to the pool.
+
     Yields
     ------
     AsyncSession
         An asynchronous session object for database operations.
     """
-    session = db_helper.get_scoped_session()
+    session = db_helper.get_session()
     try:
         yield session
     finally:
-        await session.close()
+        await asyncio.shield(session.close())
 
 
 async def get_redis() -> Redis:
@@ -46,10 +56,21 @@ async def get_redis() -> Redis:
     return redis
 
 
+async def get_redis_cache() -> ClientSideCache:
+    """
+    Get the client-side cache of hot Redis keys
+
+    Returns
+    -------
+        ClientSideCache
+    """
+    return redis_cache
+
+
 async def validate_auth_user(
     username: Annotated[str, Form()],
     password: Annotated[str, Form()],
-    session: Annotated[AsyncSession, Depends(scoped_session_db)],
+    session: Annotated[AsyncSession, Depends(session_db)],
 ):
     """
     Validate user authentication credentials.
@@ -80,13 +101,14 @@ async def validate_auth_user(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid username or password",
     )
-    user = await user_qr.get_user_by_username(session=session, username=username)
-    if not user:
-        raise unauthed_exp
-    if await api.routers.auth.auth_helpers.validate_password(
-        password=password, hashed_password=user.password_hash
-    ):
-        return user
+    with timed("auth"):
+        user = await user_qr.get_user_by_username(session=session, username=username)
+        if not user:
+            raise unauthed_exp
+        if await api.routers.auth.auth_helpers.validate_password(
+            password=password, hashed_password=user.password_hash
+        ):
+            return user
 
     raise unauthed_exp
 
@@ -159,6 +181,19 @@ async def validate_token_type(
     )
 
 
+async def _load_user(user_id: int) -> schemas.UserSchema | None:
+    """
+    Load a user in a session of its own, so the lookup can be shared
+    by concurrent requests of the user.
+    """
+    async with db_helper.get_session() as session:
+        session.info["user_id"] = user_id
+        user = await user_qr.get_user_by_id(session=session, id=user_id)
+    if user is None:
+        return None
+    return schemas.UserSchema(id=user.id, username=user.username)
+
+
 async def get_user_by_token_sub(
     payload: dict,
     session: AsyncSession,
@@ -167,6 +202,9 @@ async def get_user_by_token_sub(
     Retrieve a user from the database based on the 'sub' claim
     in the token payload.
 
+    Concurrent lookups of the same user share one query through
+    `read_coalescer`.
+
     Parameters
     ----------
     payload : dict
@@ -187,9 +225,12 @@ async def get_user_by_token_sub(
         with the provided user ID, indicating that the token is invalid.
     """
     user_id: int = payload.get("sub")
-    user = await user_qr.get_user_by_id(
-        session=session,
-        id=user_id,
+    session.info["user_id"] = user_id
+    user = await read_coalescer.run(
+        scope=user_id,
+        key="user",
+        read=lambda: _load_user(user_id),
+        name="user",
     )
     if not user:
         raise HTTPException(
@@ -226,7 +267,7 @@ class UserGetterFromToken:
     async def __call__(
         self,
         payload: dict = Depends(get_current_token_payload),
-        session: AsyncSession = Depends(scoped_session_db),
+        session: AsyncSession = Depends(session_db),
     ) -> schemas.UserSchema:
         """
         Validates the token type and retrieves the user associated
@@ -248,11 +289,39 @@ class UserGetterFromToken:
             the user associated with the provided token payload.
 
         """
-        await validate_token_type(payload, self.token_type)
-        return await get_user_by_token_sub(payload=payload, session=session)
+        with timed("auth"):
+            await validate_token_type(payload, self.token_type)
+            return await get_user_by_token_sub(payload=payload, session=session)
 
 
-get_current_auth_user = UserGetterFromToken(settings.auth_jwt.ACCESS_TOKEN_TYPE)
-get_current_auth_user_for_refresh = UserGetterFromToken(
-    settings.auth_jwt.REFRESH_TOKEN_TYPE
-)
+get_current_auth_user = UserGetterFromToken(ACCESS_TOKEN_TYPE)
+get_current_auth_user_for_refresh = UserGetterFromToken(REFRESH_TOKEN_TYPE)
+
+
+async def get_admin_token_payload(
+    payload: Annotated[dict, Depends(get_current_token_payload)],
+) -> dict:
+    """
+    Allow the request only with an admin token.
+
+    Admin tokens are not tied to a user, so the database is not
+    queried.
+
+    Parameters
+    ----------
+    payload : dict
+        A dictionary containing the decoded JWT token payload
+
+    Returns
+    -------
+    dict
+        The payload of the admin token.
+
+    Raises
+    ------
+    HTTPException
+        Raises an HTTP 401 Unauthorized exception if the token is not
+        an admin token.
+    """
+    await validate_token_type(payload, ADMIN_TOKEN_TYPE)
+    return payload
@@ -0,0 +1,255 @@
+import asyncio
+import inspect
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from types import FrameType
+
+from api.core.config import settings
+from api.core.lazy import LazyObject
+from api.metrics import event_loop_lag
+
+logger = logging.getLogger(__name__)
+
+MAX_STACK_DEPTH = 128
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    filename = os.path.basename(code.co_filename)
+    # Semicolons separate frames in the collapsed stack format.
+    return f"{name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _stack(frame: FrameType | None) -> list[str]:
+    """
+    Return the labels of a stack from the outermost frame to `frame`.
+    """
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+def _outermost_coroutine(frame: FrameType | None) -> str | None:
+    """
+    Return the outermost coroutine function on a stack, i.e. the
+    coroutine of the task that is running.
+    """
+    coroutine = None
+    while frame is not None:
+        if frame.f_code.co_flags & inspect.CO_COROUTINE:
+            coroutine = _frame_label(frame)
+        frame = frame.f_back
+    return coroutine
+
+
+class SamplingProfiler:
+    """
+    Sampling profiler of the thread that runs the event loop.
+
+    A background thread takes the stack of the loop thread at a fixed
+    interval, so the profiled code is not instrumented and only pays
+    for the sampling thread holding the GIL briefly.
+
+    Parameters
+    ----------
+    thread_id : int
+        The identifier of the profiled thread.
+    interval : float
+        Seconds between two samples.
+    """
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self.stacks: Counter[str] = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._sample, name="sampling-profiler", daemon=True
+        )
+
+    def _sample(self) -> None:
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.stacks[";".join(_stack(frame))] += 1
+            self.samples += 1
+
+    async def run(self, seconds: float) -> None:
+        """
+        Sample the stacks for the given number of seconds.
+
+        Parameters
+        ----------
+        seconds : float
+            The duration of the profile.
+        """
+        self._thread.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self._stopped.set()
+            await asyncio.to_thread(self._thread.join)
+
+    def collapsed(self) -> str:
+        """
+        Render the samples in the collapsed stack format.
+
+        Every line is a stack of semicolon-separated frames, outermost
+        first, followed by the number of samples. The output can be
+        fed to `flamegraph.pl` or opened in speedscope.
+
+        Returns
+        -------
+        str
+            The collapsed stacks, the most frequent first.
+        """
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+
+class LoopLagMonitor:
+    """
+    Watchdog that records the code blocking the event loop.
+
+    A heartbeat task runs on the loop every half threshold. A watchdog
+    thread notices when the heartbeat is late by more than the
+    threshold, i.e. something is running on the loop without awaiting,
+    and takes the stack of the loop thread while it is still blocked.
+    When the heartbeat runs again, the block is recorded with its
+    duration, the coroutine of the blocking task and the stack, and
+    logged.
+
+    Parameters
+    ----------
+    threshold : float
+        Seconds the loop must be blocked to be recorded.
+    history : int
+        The number of recorded blocks that are kept.
+    """
+
+    def __init__(self, threshold: float, history: int) -> None:
+        self.threshold = threshold
+        self.blocks: deque[dict] = deque(maxlen=history)
+        self._beat = time.perf_counter()
+        self._captured: dict | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread_id: int | None = None
+        self._task: asyncio.Task | None = None
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """
+        Start monitoring the running event loop.
+        """
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self._beat = time.perf_counter()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(
+            target=self._watch, name="loop-lag-monitor", daemon=True
+        )
+        self._thread.start()
+
+    async def stop(self) -> None:
+        """
+        Stop monitoring.
+        """
+        if self._task is None:
+            return
+        self._stopped.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        await asyncio.to_thread(self._thread.join)
+        self._task = None
+        self._thread = None
+
+    async def _heartbeat(self) -> None:
+        interval = self.threshold / 2
+        while True:
+            started_at = time.perf_counter()
+            await asyncio.sleep(interval)
+            now = time.perf_counter()
+            self._beat = now
+            lag = max(now - started_at - interval, 0.0)
+            event_loop_lag.observe(lag)
+            captured, self._captured = self._captured, None
+            if lag >= self.threshold:
+                self._record(lag, captured)
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.threshold / 2):
+            if (
+                self._captured is not None
+                or time.perf_counter() - self._beat < self.threshold
+            ):
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            try:
+                task = asyncio.current_task(self._loop)
+            except RuntimeError:
+                task = None
+            self._captured = {
+                "task": task.get_name() if task is not None else None,
+                "coroutine": _outermost_coroutine(frame),
+                "stack": _stack(frame),
+            }
+
+    def _record(self, lag: float, captured: dict | None) -> None:
+        block = {
+            "at": time.time(),
+            "blocked_ms": round(lag * 1000, 1),
+            "task": None,
+            "coroutine": None,
+            "stack": [],
+        }
+        if captured is not None:
+            block.update(captured)
+        self.blocks.append(block)
+        logger.warning(
+            "Event loop blocked for %.1f ms by %s at %s",
+            block["blocked_ms"],
+            block["coroutine"] or "unknown code",
+            block["stack"][-1] if block["stack"] else "unknown frame",
+        )
+
+    def stats(self) -> dict:
+        """
+        Return the recorded blocks of the event loop.
+
+        Returns
+        -------
+        dict
+            Whether the monitor runs, its threshold in milliseconds and
+            the recorded blocks, the latest last.
+        """
+        return {
+            "running": self._task is not None,
+            "threshold_ms": self.threshold * 1000,
+            "blocks": list(self.blocks),
+        }
+
+
+loop_monitor: LoopLagMonitor = LazyObject(
+    lambda: LoopLagMonitor(
+        threshold=settings.server.loop_lag_threshold_ms / 1000,
+        history=settings.server.loop_lag_history,
+    )
+)
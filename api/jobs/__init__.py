@@ -0,0 +1,22 @@
+"""
+Package 'jobs'.
+
+Components of the package.
+1. The 'queue' module contains the Redis-backed job queue: the
+    registration of job handlers, enqueueing, claiming, retries and
+    visibility timeouts.
+2. The 'handlers' module contains the registered job handlers.
+
+Jobs are run by the worker started with `python -m api.worker`.
+"""
+
+__all__ = (
+    "JobContext",
+    "enqueue",
+    "get_job",
+    "job",
+    "job_info",
+)
+
+from . import handlers
+from .queue import JobContext, enqueue, get_job, job, job_info
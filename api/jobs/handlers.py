@@ -0,0 +1,83 @@
+from pathlib import Path
+
+from api.core.config import settings
+from api.db.archiver import task_archiver
+from api.jobs.queue import JobContext, job
+from api.tasks_import import delete_stale_imports, import_tasks
+
+
+@job("tasks.archive")
+async def archive_completed_tasks(ctx: JobContext) -> dict:
+    """
+    Archive all old completed tasks.
+
+    Parameters
+    ----------
+    ctx : JobContext
+        The state of the running job.
+
+    Returns
+    -------
+    dict
+        The number of archived tasks.
+    """
+    archived = await task_archiver.run_once()
+    return {"archived": archived}
+
+
+async def delete_import_file(path: str, **payload) -> None:
+    """
+    Delete the uploaded file of an import that has failed for good.
+
+    Parameters
+    ----------
+    path : str
+        The path of the uploaded file in `JobSettings.import_dir`.
+    **payload
+        The rest of the payload of the import job.
+    """
+    Path(path).unlink(missing_ok=True)
+
+
+@job("tasks.import", on_failure=delete_import_file)
+async def import_tasks_file(
+    ctx: JobContext,
+    path: str,
+    file_format: str,
+    user_id: int,
+) -> dict:
+    """
+    Import tasks from an uploaded file and delete the file afterwards.
+
+    A retried job resumes after the last committed chunk, whose
+    progress is saved in the database with the chunk. The file of a
+    job that fails for good is deleted by `delete_import_file`.
+
+    Parameters
+    ----------
+    ctx : JobContext
+        The state of the running job.
+    path : str
+        The path of the uploaded file in `JobSettings.import_dir`.
+    file_format : str
+        "csv" or "ndjson".
+    user_id : int
+        The ID of the user to whom the tasks are assigned.
+
+    Returns
+    -------
+    dict
+        The import report.
+    """
+    # The progress is needed only while the job can be retried.
+    await delete_stale_imports(older_than=settings.jobs.result_ttl)
+    with open(path, "rb") as file:
+        report = await import_tasks(
+            file,
+            file_format,
+            user_id,
+            import_id=ctx.job_id,
+            on_progress=ctx.set_progress,
+        )
+    Path(path).unlink(missing_ok=True)
+    return report.model_dump()
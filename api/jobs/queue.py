@@ -0,0 +1,357 @@
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+from aioredis import Redis
+
+from api.core import schemas
+from api.core.config import settings
+
+JOB_HANDLERS: dict[str, "JobHandler"] = {}
+
+_CLAIM_SCRIPT = """
+local job_id = redis.call('RPOP', KEYS[1])
+if job_id then
+    redis.call('ZADD', KEYS[2], ARGV[1], job_id)
+end
+return job_id
+"""
+
+_PROMOTE_SCRIPT = """
+local moved = 0
+for i = 1, 2 do
+    local due = redis.call('ZRANGEBYSCORE', KEYS[i], '-inf', ARGV[1], 'LIMIT', 0, 100)
+    for _, job_id in ipairs(due) do
+        redis.call('ZREM', KEYS[i], job_id)
+        redis.call('LPUSH', KEYS[3], job_id)
+        moved = moved + 1
+    end
+end
+return moved
+"""
+
+
+@dataclass
+class JobHandler:
+    """
+    A registered job function and its retry policy.
+
+    Attributes
+    ----------
+    func : Callable[..., Awaitable]
+        The coroutine function that runs the job. It receives the
+        `JobContext` and the payload as keyword arguments.
+    max_attempts : int or None
+        The number of attempts before the job is marked as failed, or
+        None for `JobSettings.max_attempts`.
+    on_failure : Callable[..., Awaitable] or None
+        The coroutine function called with the payload as keyword
+        arguments once the job has failed for good, to clean up after
+        it.
+    """
+
+    func: Callable[..., Awaitable]
+    max_attempts: int | None
+    on_failure: Callable[..., Awaitable] | None = None
+
+
+@dataclass
+class JobContext:
+    """
+    The state of a running job passed to its handler.
+
+    Attributes
+    ----------
+    job_id : str
+        The ID of the job.
+    attempt : int
+        The number of the current attempt, starting with 1.
+    redis : Redis
+        The Redis connection of the worker.
+    progress : dict
+        The last progress reported by the handler.
+    """
+
+    job_id: str
+    attempt: int
+    redis: Redis
+    progress: dict = field(default_factory=dict)
+
+    async def set_progress(self, **progress) -> None:
+        """
+        Report the progress of the job and extend its visibility timeout.
+
+        Parameters
+        ----------
+        **progress
+            JSON serializable progress fields, e.g. `rows=1000`.
+        """
+        self.progress.update(progress)
+        await self.redis.hset(
+            job_key(self.job_id),
+            mapping={"progress": json.dumps(self.progress), "updated_at": time.time()},
+        )
+        await self.heartbeat()
+
+    async def heartbeat(self) -> None:
+        """
+        Extend the visibility timeout of the job.
+
+        A job that has already been released is not put back in
+        flight.
+        """
+        await self.redis.zadd(
+            queue_key("inflight"),
+            {self.job_id: time.time() + settings.jobs.visibility_timeout},
+            xx=True,
+        )
+
+
+def queue_key(name: str) -> str:
+    """
+    Return the Redis key of a queue structure.
+
+    Parameters
+    ----------
+    name : str
+        "ready", "delayed" or "inflight".
+
+    Returns
+    -------
+    str
+        The Redis key.
+    """
+    return f"{settings.jobs.key_prefix}{name}"
+
+
+def job_key(job_id: str) -> str:
+    """
+    Return the Redis key of the hash with the job's state.
+
+    Parameters
+    ----------
+    job_id : str
+        The ID of the job.
+
+    Returns
+    -------
+    str
+        The Redis key.
+    """
+    return f"{settings.jobs.key_prefix}job:{job_id}"
+
+
+def job(
+    name: str,
+    max_attempts: int | None = None,
+    on_failure: Callable[..., Awaitable] | None = None,
+):
+    """
+    Register a coroutine function as the handler of a job.
+
+    Parameters
+    ----------
+    name : str
+        The name the job is enqueued with.
+    max_attempts : int, optional
+        The number of attempts of the job. Defaults to
+        `JobSettings.max_attempts`.
+    on_failure : Callable, optional
+        Coroutine function called with the payload once the job has
+        failed for good, including when its workers were lost.
+    """
+
+    def decorator(func: Callable[..., Awaitable]):
+        JOB_HANDLERS[name] = JobHandler(
+            func=func,
+            max_attempts=max_attempts,
+            on_failure=on_failure,
+        )
+        return func
+
+    return decorator
+
+
+async def enqueue(
+    redis: Redis,
+    name: str,
+    payload: dict | None = None,
+    user_id: int | None = None,
+) -> str:
+    """
+    Put a job into the queue.
+
+    Parameters
+    ----------
+    redis : Redis
+        The Redis connection.
+    name : str
+        The name of a registered job.
+    payload : dict, optional
+        JSON serializable keyword arguments of the job handler.
+    user_id : int, optional
+        The ID of the user who owns the job and may see its status.
+
+    Returns
+    -------
+    str
+        The ID of the job.
+    """
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.hset(
+            job_key(job_id),
+            mapping={
+                "id": job_id,
+                "name": name,
+                "payload": json.dumps(payload or {}),
+                "user_id": "" if user_id is None else user_id,
+                "status": "queued",
+                "attempts": 0,
+                "progress": "{}",
+                "created_at": now,
+                "updated_at": now,
+            },
+        )
+        pipe.lpush(queue_key("ready"), job_id)
+        await pipe.execute()
+    return job_id
+
+
+async def get_job(redis: Redis, job_id: str) -> dict | None:
+    """
+    Return the raw state of a job.
+
+    Parameters
+    ----------
+    redis : Redis
+        The Redis connection.
+    job_id : str
+        The ID of the job.
+
+    Returns
+    -------
+    dict or None
+        The fields of the job hash, or None if the job does not exist
+        or has expired.
+    """
+    state = await redis.hgetall(job_key(job_id))
+    return state or None
+
+
+def job_info(state: dict) -> schemas.JobInfo:
+    """
+    Convert the raw state of a job into its public schema.
+
+    Parameters
+    ----------
+    state : dict
+        The fields of the job hash.
+
+    Returns
+    -------
+    JobInfo
+        The status, progress, result and error of the job.
+    """
+    return schemas.JobInfo(
+        id=state["id"],
+        name=state["name"],
+        status=state["status"],
+        attempts=int(state["attempts"]),
+        progress=json.loads(state.get("progress") or "{}"),
+        result=json.loads(state["result"]) if state.get("result") else None,
+        error=state.get("error") or None,
+    )
+
+
+async def claim_job(redis: Redis) -> str | None:
+    """
+    Take the next ready job and make it invisible to other workers
+    for the visibility timeout.
+
+    Parameters
+    ----------
+    redis : Redis
+        The Redis connection.
+
+    Returns
+    -------
+    str or None
+        The ID of the claimed job, or None if the queue is empty.
+    """
+    return await redis.eval(
+        _CLAIM_SCRIPT,
+        2,
+        queue_key("ready"),
+        queue_key("inflight"),
+        time.time() + settings.jobs.visibility_timeout,
+    )
+
+
+async def promote_due_jobs(redis: Redis) -> int:
+    """
+    Move jobs whose retry delay or visibility timeout has passed back
+    into the ready queue.
+
+    Parameters
+    ----------
+    redis : Redis
+        The Redis connection.
+
+    Returns
+    -------
+    int
+        The number of moved jobs.
+    """
+    return await redis.eval(
+        _PROMOTE_SCRIPT,
+        3,
+        queue_key("delayed"),
+        queue_key("inflight"),
+        queue_key("ready"),
+        time.time(),
+    )
+
+
+async def finish_job(
+    redis: Redis,
+    job_id: str,
+    status: str,
+    result=None,
+    error: str | None = None,
+    retry_in: float | None = None,
+) -> None:
+    """
+    Record the outcome of an attempt and release the job.
+
+    Parameters
+    ----------
+    redis : Redis
+        The Redis connection.
+    job_id : str
+        The ID of the job.
+    status : str
+        "succeeded", "failed" or "retrying".
+    result : optional
+        The JSON serializable result of a succeeded job.
+    error : str, optional
+        The error of a failed attempt.
+    retry_in : float, optional
+        Seconds before the next attempt of a retried job.
+    """
+    fields = {"status": status, "updated_at": time.time()}
+    if result is not None:
+        fields["result"] = json.dumps(result)
+    if error is not None:
+        fields["error"] = error
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.zrem(queue_key("inflight"), job_id)
+        pipe.hset(job_key(job_id), mapping=fields)
+        if retry_in is not None:
+            pipe.zadd(queue_key("delayed"), {job_id: time.time() + retry_in})
+        else:
+            pipe.expire(job_key(job_id), settings.jobs.result_ttl)
+        await pipe.execute()
@@ -0,0 +1,287 @@
+import math
+
+from api.core.config import settings
+from api.core.lazy import LazyObject
+from api.metrics import concurrency_limit, requests_shed
+
+HIGH_PRIORITY = "high"
+NORMAL_PRIORITY = "normal"
+LOW_PRIORITY = "low"
+EXEMPT = "exempt"
+
+
+class PathRules:
+    """
+    Matches requests against a list of paths.
+
+    Every rule is a path matched exactly, or as a prefix if it ends
+    with "*", optionally preceded by an HTTP method, e.g.
+    "GET /api/v1/tasks/".
+
+    Parameters
+    ----------
+    rules : list[str]
+        The rules.
+    """
+
+    def __init__(self, rules: list[str]) -> None:
+        self.exact: set[tuple[str | None, str]] = set()
+        self.prefixes: list[tuple[str | None, str]] = []
+        for rule in rules:
+            method, _, path = rule.strip().rpartition(" ")
+            method = method.strip().upper() or None
+            if path.endswith("*"):
+                self.prefixes.append((method, path[:-1]))
+            else:
+                self.exact.add((method, path))
+
+    def match(self, method: str, path: str) -> bool:
+        """
+        Tell whether a request matches any rule.
+
+        Parameters
+        ----------
+        method : str
+            The HTTP method of the request.
+        path : str
+            The path of the request.
+
+        Returns
+        -------
+        bool
+            True if a rule matches.
+        """
+        if (None, path) in self.exact or (method, path) in self.exact:
+            return True
+        return any(
+            (rule_method is None or rule_method == method) and path.startswith(prefix)
+            for rule_method, prefix in self.prefixes
+        )
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Per-worker limit of concurrent requests that adapts to latency.
+
+    The limit follows the gradient of the latency: while requests are
+    as fast as the long-term average, it grows by a small queue
+    allowance; when they get slower than `tolerance` times the average,
+    it shrinks in proportion. A server error shrinks it by `backoff`.
+    The limit only grows while it is actually used, so an idle worker
+    does not drift to the maximum.
+
+    Requests above their share of the limit are rejected immediately
+    instead of waiting, so callers get a fast 503 and retry elsewhere.
+    High priority requests may use the whole limit, the others only a
+    share of it, so they are shed first.
+
+    Parameters
+    ----------
+    initial_limit : int
+        The limit before any latency is observed.
+    min_limit : int
+        The lowest limit.
+    max_limit : int
+        The highest limit.
+    tolerance : float
+        How much slower than the long-term latency requests may get
+        before the limit shrinks.
+    smoothing : float
+        The weight of every new estimate of the limit.
+    backoff : float
+        The factor applied to the limit after a server error.
+    shares : dict[str, float]
+        The share of the limit each priority may use.
+    """
+
+    LONG_WINDOW = 500
+    SHORT_WINDOW = 10
+
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        tolerance: float,
+        smoothing: float,
+        backoff: float,
+        shares: dict[str, float],
+    ) -> None:
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.backoff = backoff
+        self.shares = shares
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.long_latency: float | None = None
+        self.short_latency: float | None = None
+        concurrency_limit.set(self.limit)
+
+    def try_acquire(self, priority: str) -> bool:
+        """
+        Admit a request if its priority has room under the limit.
+
+        Parameters
+        ----------
+        priority : str
+            The priority of the request.
+
+        Returns
+        -------
+        bool
+            True if the request is admitted; it must then call
+            `release` when it completes.
+        """
+        if self.in_flight >= max(self.limit * self.shares[priority], 1):
+            self.rejected += 1
+            requests_shed.labels(priority).inc()
+            return False
+        self.in_flight += 1
+        self.admitted += 1
+        return True
+
+    def release(self, latency: float, failed: bool) -> None:
+        """
+        Complete an admitted request and adapt the limit.
+
+        Parameters
+        ----------
+        latency : float
+            Seconds the request took.
+        failed : bool
+            Whether the request failed with a server error.
+        """
+        in_flight = self.in_flight
+        self.in_flight -= 1
+        if failed:
+            self._set_limit(self.limit * self.backoff)
+            return
+        if self.long_latency is None:
+            self.long_latency = self.short_latency = latency
+            return
+        self.short_latency += (
+            (latency - self.short_latency) * 2 / (self.SHORT_WINDOW + 1)
+        )
+        self.long_latency += (latency - self.long_latency) * 2 / (self.LONG_WINDOW + 1)
+        # Recover the baseline quickly after a long period of slowness.
+        if self.long_latency > 2 * self.short_latency:
+            self.long_latency = 2 * self.short_latency
+        if in_flight < self.limit / 2:
+            # The limit is not what holds the requests back.
+            return
+        gradient = max(
+            0.5,
+            min(1.0, self.tolerance * self.long_latency / self.short_latency),
+        )
+        estimate = self.limit * gradient + math.sqrt(self.limit)
+        self._set_limit(self.limit + (estimate - self.limit) * self.smoothing)
+
+    def _set_limit(self, limit: float) -> None:
+        self.limit = min(max(limit, self.min_limit), self.max_limit)
+        concurrency_limit.set(self.limit)
+
+    def stats(self) -> dict:
+        """
+        Return the state of the limiter.
+
+        Returns
+        -------
+        dict
+            The current limit, the requests in flight, the admitted and
+            rejected requests and the short and long-term latency in
+            milliseconds.
+        """
+        return {
+            "limit": round(self.limit, 1),
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "short_latency_ms": (
+                self.short_latency * 1000 if self.short_latency is not None else None
+            ),
+            "long_latency_ms": (
+                self.long_latency * 1000 if self.long_latency is not None else None
+            ),
+        }
+
+
+class RequestPrioritizer:
+    """
+    Assigns a priority to every request by its method and path.
+
+    Parameters
+    ----------
+    high : list[str]
+        Rules of the high priority requests.
+    low : list[str]
+        Rules of the low priority requests.
+    exempt : list[str]
+        Rules of the requests that are never limited.
+    """
+
+    def __init__(self, high: list[str], low: list[str], exempt: list[str]) -> None:
+        self.rules = [
+            (EXEMPT, PathRules(exempt)),
+            (HIGH_PRIORITY, PathRules(high)),
+            (LOW_PRIORITY, PathRules(low)),
+        ]
+        self._cache: dict[tuple[str, str], str] = {}
+
+    def priority(self, method: str, path: str) -> str:
+        """
+        Return the priority of a request.
+
+        Parameters
+        ----------
+        method : str
+            The HTTP method of the request.
+        path : str
+            The path of the request.
+
+        Returns
+        -------
+        str
+            "exempt", "high", "normal" or "low".
+        """
+        key = (method, path)
+        priority = self._cache.get(key)
+        if priority is None:
+            priority = next(
+                (name for name, rules in self.rules if rules.match(method, path)),
+                NORMAL_PRIORITY,
+            )
+            # Paths with IDs would grow the cache without bound.
+            if len(self._cache) < 10_000:
+                self._cache[key] = priority
+        return priority
+
+
+def _create_limiter() -> AdaptiveConcurrencyLimiter:
+    load_shedding = settings.load_shedding
+    return AdaptiveConcurrencyLimiter(
+        initial_limit=load_shedding.initial_limit,
+        min_limit=load_shedding.min_limit,
+        max_limit=load_shedding.max_limit,
+        tolerance=load_shedding.tolerance,
+        smoothing=load_shedding.smoothing,
+        backoff=load_shedding.backoff,
+        shares={
+            HIGH_PRIORITY: 1.0,
+            NORMAL_PRIORITY: load_shedding.normal_priority_share,
+            LOW_PRIORITY: load_shedding.low_priority_share,
+        },
+    )
+
+
+concurrency_limiter: AdaptiveConcurrencyLimiter = LazyObject(_create_limiter)
+request_prioritizer: RequestPrioritizer = LazyObject(
+    lambda: RequestPrioritizer(
+        high=settings.load_shedding.high_priority_paths,
+        low=settings.load_shedding.low_priority_paths,
+        exempt=settings.load_shedding.exempt_paths,
+    )
+)
@@ -1,20 +1,348 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+
 from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer
+from starlette.routing import BaseRoute, Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .core.config import settings
+from .core.deadline import (CANCEL_GRACE, DeadlineExceeded, request_timeouts,
+                            start_deadline, stop_deadline)
+from .core.timing import start_request_timing, stop_request_timing
+from .db.archiver import task_archiver
+from .db.db_metrics import track_request_acquire_time
+from .db.dbhelper import db_helper
+from .db.query_profiler import check_query_budget, count_queries
+from .db.read_coalescer import read_coalescer
+from .db.rebalancer import position_rebalancer
+from .db.write_coalescer import task_insert_coalescer
+from .diagnostics import loop_monitor
+from .load_shedding import EXEMPT, concurrency_limiter, request_prioritizer
+from .metrics import (http_request_duration, http_requests,
+                      http_requests_in_progress, mark_process_dead)
+from .redis_client import (RedisUnavailableError, close_redis, redis,
+                           redis_cache)
+from .routers import auth, jobs, metrics, service, tasks
+from .startup import initialize, readiness, run_warm_up
+
+logger = logging.getLogger(__name__)
+timing_logger = logging.getLogger("api.timing")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Start and stop the background work of the application.
+
+    The settings, JWT keys and clients deferred from import time are
+    created before the first request. Every worker process creates its
+    own database and Redis connection pools here and closes them on
+    shutdown. The worker reports ready once the warm-up has finished,
+    and not ready again as soon as it starts shutting down.
+
+    Parameters
+    ----------
+    app : FastAPI
+        The application being started.
+    """
+    timings = initialize()
+    logger.info(
+        "Initialized in %.1f ms (%s)",
+        sum(timings.values()),
+        ", ".join(f"{phase} {duration:.1f} ms" for phase, duration in timings.items()),
+    )
+    db_helper.replicas.start_health_checks()
+    if settings.db_settings.archive_enabled:
+        task_archiver.start()
+    if settings.db_settings.rebalance_enabled:
+        position_rebalancer.start()
+    if settings.redis_settings.client_cache_enabled:
+        redis_cache.start()
+    read_coalescer.start()
+    if settings.server.loop_monitor_enabled:
+        loop_monitor.start()
+    if settings.server.warmup_enabled:
+        warmup = asyncio.create_task(run_warm_up())
+    else:
+        warmup = None
+        readiness.ready = True
+    yield
+    readiness.ready = False
+    if warmup is not None:
+        warmup.cancel()
+    await loop_monitor.stop()
+    await redis_cache.stop()
+    await read_coalescer.stop()
+    await task_archiver.stop()
+    await position_rebalancer.stop()
+    await task_insert_coalescer.drain()
+    await db_helper.dispose()
+    await close_redis(redis)
+    mark_process_dead()
 
-from .routers import auth, tasks
 
 http_bearer = HTTPBearer(auto_error=False)
-app = FastAPI(
-    dependencies=[Depends(http_bearer)],
-)
-app.include_router(auth.router)
-app.include_router(tasks.router)
 
 
-@app.exception_handler(HTTPException)
+async def track_db_usage(request: Request, call_next):
+    """
+    Measure the time the request spends acquiring database connections
+    and count the queries it runs.
+
+    Requests that run more queries than `DbSettings.query_budget` are
+    logged.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming HTTP request.
+    call_next : Callable
+        The next handler in the middleware chain.
+
+    Returns
+    -------
+    Response
+        The response of the next handler.
+    """
+    with track_request_acquire_time(), count_queries() as queries:
+        response = await call_next(request)
+    check_query_budget(queries, request.method, request.url.path)
+    return response
+
+
+def deadline_exceeded_response() -> JSONResponse:
+    """
+    Return the response to a request whose deadline has passed.
+
+    Returns
+    -------
+    JSONResponse
+        A response object with a 504 status code and a JSON body
+        containing error details.
+    """
+    return JSONResponse(
+        status_code=504,
+        content={
+            "result": False,
+            "error_type": DeadlineExceeded.__name__,
+            "error_message": "The request did not complete before its deadline",
+        },
+    )
+
+
+class DeadlineMiddleware:
+    """
+    Cancel every request when its deadline passes.
+
+    The timeout is the one asked for in the
+    `ServerSettings.request_timeout_header` of the request, or the one
+    of its route. The database transactions and the Redis calls of the
+    request are bounded by the same deadline, so its work stops holding
+    connections once the client has given up waiting. They get
+    `CANCEL_GRACE` seconds to fail cleanly before the whole request is
+    cancelled: a query cancelled by the server leaves its connection
+    usable, while one cancelled on the client has to be discarded.
+
+    Unlike the other middleware, this one is a plain ASGI application:
+    the "http" middleware of Starlette waits for the rest of the
+    application to finish even after it has returned a response, so it
+    could not cancel the request.
+
+    Parameters
+    ----------
+    app : ASGIApp
+        The rest of the application.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        timeout = request_timeouts.timeout(
+            request.method,
+            request.url.path,
+            request.headers.get(settings.server.request_timeout_header),
+        )
+        if timeout is None:
+            await self.app(scope, receive, send)
+            return
+        response_started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        token = start_deadline(timeout)
+        try:
+            await asyncio.wait_for(
+                self.app(scope, receive, send_wrapper), timeout + CANCEL_GRACE
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                "%s %s was cancelled at its deadline of %.3f s",
+                request.method,
+                request.url.path,
+                timeout,
+            )
+            if response_started:
+                # The client gets a truncated response.
+                raise
+            await deadline_exceeded_response()(scope, receive, send)
+        finally:
+            stop_deadline(token)
+
+
+async def shed_load(request: Request, call_next):
+    """
+    Reject requests above the adaptive concurrency limit of the worker.
+
+    Rejected requests get status code 503 with a Retry-After header at
+    once instead of piling up while the database is slow. Requests of
+    low priority are rejected first; exempt requests, such as the
+    health probes, are never rejected.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming HTTP request.
+    call_next : Callable
+        The next handler in the middleware chain.
+
+    Returns
+    -------
+    Response
+        The response of the next handler, or the rejection.
+    """
+    if not settings.load_shedding.enabled:
+        return await call_next(request)
+    priority = request_prioritizer.priority(request.method, request.url.path)
+    if priority == EXEMPT:
+        return await call_next(request)
+    if not concurrency_limiter.try_acquire(priority):
+        return JSONResponse(
+            status_code=503,
+            headers={"Retry-After": str(settings.load_shedding.retry_after)},
+            content={
+                "result": False,
+                "error_type": "Overloaded",
+                "error_message": "Service temporarily overloaded",
+            },
+        )
+    start = time.perf_counter()
+    failed = True
+    try:
+        response = await call_next(request)
+        # 503 answers fail fast, e.g. during a Redis outage, and say
+        # nothing about the load on the worker.
+        failed = response.status_code >= 500 and response.status_code != 503
+        return response
+    finally:
+        concurrency_limiter.release(time.perf_counter() - start, failed)
+
+
+def _find_route(request: Request) -> BaseRoute | None:
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route
+    return None
+
+
+async def record_request_metrics(request: Request, call_next):
+    """
+    Count the request and measure its latency for Prometheus.
+
+    Requests are labelled with the path template of the matched route,
+    e.g. "/api/v1/tasks/id", so the number of series stays bounded.
+    Requests rejected before routing, e.g. by `shed_load`, are
+    labelled with the route they would have reached.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming HTTP request.
+    call_next : Callable
+        The next handler in the middleware chain.
+
+    Returns
+    -------
+    Response
+        The response of the next handler.
+    """
+    in_progress = http_requests_in_progress.labels(request.method)
+    in_progress.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        in_progress.dec()
+        route = request.scope.get("route") or _find_route(request)
+        path = route.path if route is not None else "unmatched"
+        http_request_duration.labels(request.method, path).observe(
+            time.perf_counter() - start
+        )
+        http_requests.labels(request.method, path, str(status)).inc()
+
+
+async def server_timing(request: Request, call_next):
+    """
+    Measure where the time of a sampled request went.
+
+    The hooks in the dependencies, the JWT utilities, the database
+    engine and the Redis client add to the timing of the request. The
+    timing is returned in the `Server-Timing` header and logged.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming HTTP request.
+    call_next : Callable
+        The next handler in the middleware chain.
+
+    Returns
+    -------
+    Response
+        The response of the next handler.
+    """
+    server_settings = settings.server
+    if (
+        not server_settings.timing_enabled
+        or random.random() >= server_settings.timing_sample_rate
+    ):
+        return await call_next(request)
+    timing, token = start_request_timing()
+    try:
+        response = await call_next(request)
+    finally:
+        stop_request_timing(token)
+    if server_settings.timing_header:
+        response.headers["Server-Timing"] = timing.header()
+    timing_logger.info(
+        "method=%s path=%s status=%d %s",
+        request.method,
+        request.url.path,
+        response.status_code,
+        timing.log_fields(),
+    )
+    return response
+
+
 async def custom_http_exception_handler(request: Request, exc: HTTPException):
     """
     Exception handler for HTTPException in FastAPI applications.
@@ -47,7 +375,72 @@ async def custom_http_exception_handler(request: Request, exc: HTTPException):
     )
 
 
-@app.exception_handler(RequestValidationError)
+async def redis_unavailable_exception_handler(
+    request: Request,
+    exc: RedisUnavailableError,
+):
+    """
+    Exception handler for Redis outages in FastAPI applications.
+
+    Requests that cannot do without Redis fail fast with status code
+    503 while the Redis circuit breaker is open.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming HTTP request.
+    exc : RedisUnavailableError
+        The error of the failed or rejected Redis call.
+
+    Returns
+    -------
+    JSONResponse
+        A response object with a 503 status code, a Retry-After header
+        and a JSON body containing error details.
+    """
+    return JSONResponse(
+        status_code=503,
+        headers={
+            "Retry-After": str(
+                int(settings.redis_settings.circuit_breaker_reset_timeout)
+            )
+        },
+        content=jsonable_encoder(
+            {
+                "result": False,
+                "error_type": type(exc).__name__,
+                "error_message": "Service temporarily unavailable",
+            },
+        ),
+    )
+
+
+async def deadline_exceeded_exception_handler(
+    request: Request,
+    exc: DeadlineExceeded,
+):
+    """
+    Exception handler for requests whose deadline has passed.
+
+    Raised by the database and Redis calls made after the deadline, or
+    cancelled by it.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming HTTP request.
+    exc : DeadlineExceeded
+        The error of the cancelled call.
+
+    Returns
+    -------
+    JSONResponse
+        A response object with a 504 status code and a JSON body
+        containing error details.
+    """
+    return deadline_exceeded_response()
+
+
 async def validation_exception_handler(
     request: Request,
     exc: RequestValidationError,
@@ -86,3 +479,45 @@ async def validation_exception_handler(
             },
         ),
     )
+
+
+def create_app() -> FastAPI:
+    """
+    Create the application.
+
+    Used as the factory of `uvicorn --factory api.main:create_app`.
+    Nothing is connected or read from disk until the startup of the
+    returned application.
+
+    Returns
+    -------
+    FastAPI
+        The application with its routers, middleware and exception
+        handlers.
+    """
+    app = FastAPI(
+        dependencies=[Depends(http_bearer)],
+        lifespan=lifespan,
+    )
+    app.include_router(auth.router)
+    app.include_router(tasks.router)
+    app.include_router(service.router)
+    app.include_router(jobs.router)
+    app.include_router(metrics.router)
+    app.middleware("http")(track_db_usage)
+    app.middleware("http")(server_timing)
+    app.add_middleware(DeadlineMiddleware)
+    # Registered last, so it is the outermost middleware and counts
+    # the rejections of shed_load too.
+    app.middleware("http")(shed_load)
+    app.middleware("http")(record_request_metrics)
+    app.add_exception_handler(HTTPException, custom_http_exception_handler)
+    app.add_exception_handler(
+        RedisUnavailableError, redis_unavailable_exception_handler
+    )
+    app.add_exception_handler(DeadlineExceeded, deadline_exceeded_exception_handler)
+    app.add_exception_handler(RequestValidationError, validation_exception_handler)
+    return app
+
+
+app = create_app()
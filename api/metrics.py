@@ -0,0 +1,160 @@
+import os
+import tempfile
+from pathlib import Path
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+
+MULTIPROCESS_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+FAST_TIME_BUCKETS = (0.0001, 0.00025, 0.0005, *TIME_BUCKETS)
+
+http_requests = Counter(
+    "http_requests_total",
+    "HTTP requests by route template and status code.",
+    ["method", "route", "status"],
+)
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Time to answer HTTP requests by route template.",
+    ["method", "route"],
+    buckets=TIME_BUCKETS,
+)
+http_requests_in_progress = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests being answered.",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+db_pool_size = Gauge(
+    "db_pool_size",
+    "Configured size of the database connection pools.",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+db_pool_checked_out = Gauge(
+    "db_pool_checked_out",
+    "Database connections checked out of the pools.",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+db_pool_wait = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a database connection on each checkout.",
+    ["pool"],
+    buckets=TIME_BUCKETS,
+)
+db_pool_timeouts = Counter(
+    "db_pool_timeouts_total",
+    "Checkouts that gave up after the pool timeout.",
+    ["pool"],
+)
+db_statement_cache = Counter(
+    "db_statement_cache_total",
+    "Statements by compiled statement cache result.",
+    ["result"],
+)
+redis_command_duration = Histogram(
+    "redis_command_duration_seconds",
+    "Time of Redis commands and pipelines.",
+    ["command"],
+    buckets=FAST_TIME_BUCKETS,
+)
+redis_client_cache = Counter(
+    "redis_client_cache_total",
+    "Reads of cacheable keys by client-side cache result.",
+    ["result"],
+)
+bcrypt_duration = Histogram(
+    "bcrypt_duration_seconds",
+    "Time of bcrypt password hashing and checks.",
+    ["operation"],
+    buckets=TIME_BUCKETS,
+)
+coalesced_reads = Counter(
+    "coalesced_reads_total",
+    "Reads that ran a query (leader) or joined an identical one (follower).",
+    ["read", "role"],
+)
+concurrency_limit = Gauge(
+    "concurrency_limit",
+    "Adaptive limit of concurrent requests, summed over the workers.",
+    multiprocess_mode="livesum",
+)
+requests_shed = Counter(
+    "http_requests_shed_total",
+    "Requests rejected by the concurrency limit, by priority.",
+    ["priority"],
+)
+event_loop_lag = Histogram(
+    "event_loop_lag_seconds",
+    "Delay of the event loop heartbeat, i.e. time the loop was blocked.",
+    buckets=TIME_BUCKETS,
+)
+
+
+def is_multiprocess() -> bool:
+    """
+    Tell whether metrics are shared by several worker processes.
+
+    Returns
+    -------
+    bool
+        True if `PROMETHEUS_MULTIPROC_DIR` is set, in which case every
+        process writes its metrics to files in that directory.
+    """
+    return MULTIPROCESS_DIR_ENV in os.environ
+
+
+def prepare_multiprocess_dir() -> Path:
+    """
+    Prepare the directory the worker processes share their metrics in.
+
+    Must be called before the workers are started. If
+    `PROMETHEUS_MULTIPROC_DIR` is not set, a new temporary directory is
+    used; otherwise the files left there by a previous run are removed.
+
+    Returns
+    -------
+    Path
+        The directory.
+    """
+    path = os.environ.get(MULTIPROCESS_DIR_ENV)
+    if path is None:
+        path = tempfile.mkdtemp(prefix="prometheus-")
+        os.environ[MULTIPROCESS_DIR_ENV] = path
+    directory = Path(path)
+    directory.mkdir(parents=True, exist_ok=True)
+    for stale in directory.glob("*.db"):
+        stale.unlink()
+    return directory
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Render the metrics in the Prometheus text format.
+
+    With several worker processes, the metrics of all live and dead
+    workers are aggregated, so any worker answers the scrape.
+
+    Returns
+    -------
+    tuple[bytes, str]
+        The body and the content type of the response.
+    """
+    if is_multiprocess():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+    """
+    Drop the live gauges of the current worker process on shutdown.
+    """
+    if is_multiprocess():
+        multiprocess.mark_process_dead(os.getpid())
@@ -1,5 +1,658 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Iterable
+
 import aioredis
+from aioredis import Redis
+from aioredis.client import Pipeline, PubSub
+from aioredis.connection import (Connection, SSLConnection,
+                                 UnixDomainSocketConnection)
+from aioredis.exceptions import ConnectionError as RedisConnectionError
+from aioredis.exceptions import TimeoutError as RedisTimeoutError
+
+from api.core.config import settings
+from api.core.deadline import within_deadline
+from api.core.lazy import LazyObject, resolve
+from api.core.timing import timed
+from api.metrics import redis_client_cache, redis_command_duration
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "__redis__:invalidate"
+
+
+class RedisUnavailableError(RedisConnectionError):
+    """
+    Raised instead of a Redis call that failed to reach the server, or
+    that was rejected because the circuit breaker is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker that makes calls fail fast while Redis is down.
+
+    After `failure_threshold` consecutive connection errors or timeouts
+    the circuit opens and every call raises `RedisUnavailableError`
+    without touching the network. After `reset_timeout` seconds one
+    probe call is let through: its success closes the circuit, its
+    failure opens it again.
+
+    Parameters
+    ----------
+    failure_threshold : int
+        The number of consecutive failures that opens the circuit.
+    reset_timeout : float
+        Seconds the circuit stays open before a probe call.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.rejected = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def _allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def _record_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info("Redis circuit breaker closed")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def _record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning("Redis circuit breaker opened")
+                self.opened += 1
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    async def call(self, func: Callable[..., Awaitable], *args, **kwargs) -> Any:
+        """
+        Run a Redis call through the breaker.
+
+        Parameters
+        ----------
+        func : Callable[..., Awaitable]
+            The coroutine function that talks to Redis.
+        *args, **kwargs
+            Its arguments.
+
+        Returns
+        -------
+        Any
+            The result of the call.
+
+        Raises
+        ------
+        RedisUnavailableError
+            If the circuit is open, or the call failed with a connection
+            error or a timeout.
+        """
+        if not self._allow():
+            self.rejected += 1
+            raise RedisUnavailableError("Redis circuit breaker is open")
+        try:
+            result = await func(*args, **kwargs)
+        except (RedisConnectionError, RedisTimeoutError, OSError) as exc:
+            self._record_failure()
+            raise RedisUnavailableError(str(exc)) from exc
+        except asyncio.CancelledError:
+            self._probing = False
+            raise
+        except Exception:
+            # Errors of the command itself prove the server is reachable.
+            self._record_success()
+            raise
+        self._record_success()
+        return result
+
+    def stats(self) -> dict:
+        """
+        Return the breaker counters.
+
+        Returns
+        -------
+        dict
+            The state, the current number of consecutive failures, how
+            many times the circuit opened and how many calls it rejected.
+        """
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+_exported_pipeline_duration = redis_command_duration.labels("PIPELINE")
+_exported_cache_hits = redis_client_cache.labels("hit")
+_exported_cache_misses = redis_client_cache.labels("miss")
+
+
+class CancelSafeConnection(Connection):
+    """
+    Connection that is dropped at once when a command is cancelled
+    while it is sent or its reply is read.
+
+    A cancelled command may leave its reply unread, and the next caller
+    of the pooled connection would read it as its own. aioredis
+    disconnects in that case, but awaits the close, so a second
+    cancellation, e.g. of the whole request after the deadline of the
+    command, leaves the connection closed yet marked as connected. The
+    connection is therefore closed without awaiting anything and is
+    opened anew by its next command.
+    """
+
+    async def send_packed_command(self, command, check_health: bool = True):
+        try:
+            return await super().send_packed_command(command, check_health)
+        except asyncio.CancelledError:
+            self._drop()
+            raise
+
+    async def read_response(self):
+        try:
+            return await super().read_response()
+        except asyncio.CancelledError:
+            self._drop()
+            raise
+
+    def _drop(self) -> None:
+        self._parser.on_disconnect()
+        if self._writer is not None and os.getpid() == self.pid:
+            self._writer.close()
+        self._reader = None
+        self._writer = None
+
+
+class CancelSafeSSLConnection(CancelSafeConnection, SSLConnection):
+    """
+    `CancelSafeConnection` over TLS.
+    """
+
+
+class CancelSafeUnixDomainSocketConnection(
+    CancelSafeConnection, UnixDomainSocketConnection
+):
+    """
+    `CancelSafeConnection` over a Unix domain socket.
+    """
+
+
+CANCEL_SAFE_CONNECTIONS = {
+    Connection: CancelSafeConnection,
+    SSLConnection: CancelSafeSSLConnection,
+    UnixDomainSocketConnection: CancelSafeUnixDomainSocketConnection,
+}
+
+
+class BreakerPipeline(Pipeline):
+    """
+    Pipeline whose execution goes through the circuit breaker of the
+    client that created it.
+
+    Every execution is added to the "redis" metric of the Server-Timing
+    of the current request and, unless the breaker rejects it, to the
+    Prometheus command latencies as "PIPELINE". It is cancelled at the
+    deadline of the current request, which does not count as a failure
+    of Redis.
+    """
+
+    breaker: CircuitBreaker
+
+    async def execute(self, raise_on_error: bool = True):
+        with timed("redis"):
+            return await within_deadline(
+                self.breaker.call, self._execute_observed, raise_on_error
+            )
+
+    async def _execute_observed(self, raise_on_error: bool):
+        start = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            _exported_pipeline_duration.observe(time.perf_counter() - start)
+
+
+class BreakerRedis(Redis):
+    """
+    Redis client whose commands and pipelines go through a circuit
+    breaker.
+
+    Every command is added to the "redis" metric of the Server-Timing
+    of the current request and, unless the breaker rejects it, to the
+    Prometheus command latencies. Commands are cancelled at the deadline
+    of the current request, which does not count as a failure of Redis.
+    """
+
+    breaker: CircuitBreaker
+
+    async def execute_command(self, *args, **options):
+        with timed("redis"):
+            return await within_deadline(
+                self.breaker.call, self._execute_command_observed, *args, **options
+            )
+
+    async def _execute_command_observed(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            redis_command_duration.labels(args[0]).observe(time.perf_counter() - start)
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> BreakerPipeline:
+        pipe = BreakerPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+        pipe.breaker = self.breaker
+        return pipe
+
+
+def create_redis(
+    url: str,
+    max_connections: int | None = None,
+    breaker: CircuitBreaker | None = None,
+) -> Redis:
+    """
+    Create a Redis client with the pool limits and timeouts from
+    `RedisSettings` whose connections are safe to cancel.
+
+    Parameters
+    ----------
+    url : str
+        The connection string of the Redis server.
+    max_connections : int, optional
+        The maximum number of pooled connections. Defaults to
+        `RedisSettings.redis_max_connections`.
+    breaker : CircuitBreaker, optional
+        The circuit breaker of every command and pipeline of the client.
+
+    Returns
+    -------
+    Redis
+        The client that decodes responses into strings.
+    """
+    redis_settings = settings.redis_settings
+    client = (BreakerRedis if breaker else Redis).from_url(
+        url,
+        decode_responses=True,
+        max_connections=max_connections or redis_settings.redis_max_connections,
+        socket_timeout=redis_settings.redis_socket_timeout,
+        socket_connect_timeout=redis_settings.redis_socket_connect_timeout,
+        health_check_interval=redis_settings.redis_health_check_interval,
+    )
+    pool = client.connection_pool
+    pool.connection_class = CANCEL_SAFE_CONNECTIONS[pool.connection_class]
+    if breaker is not None:
+        client.breaker = breaker
+    return client
+
+
+async def get_many(redis: Redis, keys: Iterable[str]) -> list[str | None]:
+    """
+    Read several keys in one round trip.
+
+    Parameters
+    ----------
+    redis : Redis
+        The Redis connection.
+    keys : Iterable[str]
+        The keys to read.
+
+    Returns
+    -------
+    list[str or None]
+        The values in the order of `keys`, None for missing keys.
+    """
+    async with redis.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.get(key)
+        return await pipe.execute()
+
+
+async def set_many(
+    redis: Redis,
+    mapping: dict[str, Any],
+    ex: int | timedelta | None = None,
+) -> None:
+    """
+    Write several keys in one round trip.
+
+    Parameters
+    ----------
+    redis : Redis
+        The Redis connection.
+    mapping : dict[str, Any]
+        The keys and their values.
+    ex : int or timedelta, optional
+        The expiration time of every key.
+    """
+    async with redis.pipeline(transaction=False) as pipe:
+        for key, value in mapping.items():
+            pipe.set(key, value, ex=ex)
+        await pipe.execute()
+
+
+class ClientSideCache:
+    """
+    Local cache of hot Redis keys kept valid by server-assisted
+    invalidation.
+
+    A dedicated connection enables `CLIENT TRACKING` in broadcasting
+    mode for `prefixes` and redirects the invalidation messages to a
+    second dedicated connection subscribed to `__redis__:invalidate`.
+    Every change of a matching key made by any client evicts it from
+    the cache. Until both connections are set up, and whenever one of
+    them fails, the cache is emptied and reads go straight to Redis.
+
+    Parameters
+    ----------
+    redis : Redis
+        The client that serves cache misses.
+    url : str
+        The connection string of the same Redis server, used to open
+        the tracking connections.
+    prefixes : list[str]
+        Prefixes of the cached keys. Other keys are never cached.
+    max_keys : int
+        The maximum number of cached keys. The least recently used keys
+        are evicted first.
+    health_check_interval : float
+        Seconds of silence on the invalidation connection after which
+        both tracking connections are checked with PING.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        url: str,
+        prefixes: list[str],
+        max_keys: int,
+        health_check_interval: float,
+    ) -> None:
+        self.redis = redis
+        self.url = url
+        self.prefixes = tuple(prefixes)
+        self.max_keys = max_keys
+        self.health_check_interval = health_check_interval
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, str | None] = OrderedDict()
+        self._epoch = 0
+        self._active = False
+        self._task: asyncio.Task | None = None
+
+    def is_cacheable(self, key: str) -> bool:
+        """
+        Tell whether a key is served from the cache.
+
+        Parameters
+        ----------
+        key : str
+            The Redis key.
+
+        Returns
+        -------
+        bool
+            True if tracking is active and the key matches a prefix.
+        """
+        return self._active and key.startswith(self.prefixes)
+
+    async def get(self, key: str) -> str | None:
+        """
+        Read a key from the cache, or from Redis on a miss.
+
+        Parameters
+        ----------
+        key : str
+            The Redis key.
+
+        Returns
+        -------
+        str or None
+            The value of the key, None if it does not exist.
+        """
+        if not self.is_cacheable(key):
+            return await self.redis.get(key)
+        if key in self._entries:
+            self.hits += 1
+            _exported_cache_hits.inc()
+            self._entries.move_to_end(key)
+            return self._entries[key]
+        self.misses += 1
+        _exported_cache_misses.inc()
+        epoch = self._epoch
+        value = await self.redis.get(key)
+        self._store(key, value, epoch)
+        return value
+
+    async def get_many(self, keys: list[str]) -> list[str | None]:
+        """
+        Read several keys, fetching all misses in one round trip.
+
+        Parameters
+        ----------
+        keys : list[str]
+            The Redis keys.
+
+        Returns
+        -------
+        list[str or None]
+            The values in the order of `keys`, None for missing keys.
+        """
+        values = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            if self.is_cacheable(key) and key in self._entries:
+                self.hits += 1
+                _exported_cache_hits.inc()
+                self._entries.move_to_end(key)
+                values[key] = self._entries[key]
+            else:
+                missing.append(key)
+        if missing:
+            epoch = self._epoch
+            fetched = await self.redis.mget(missing)
+            for key, value in zip(missing, fetched):
+                values[key] = value
+                if self.is_cacheable(key):
+                    self.misses += 1
+                    _exported_cache_misses.inc()
+                    self._store(key, value, epoch)
+        return [values[key] for key in keys]
+
+    def _store(self, key: str, value: str | None, epoch: int) -> None:
+        # A value read before any invalidation that arrived while it was
+        # in flight may already be stale.
+        if not self._active or epoch != self._epoch:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, keys: list[str] | None) -> None:
+        """
+        Evict keys changed on the server.
+
+        Parameters
+        ----------
+        keys : list[str] or None
+            The changed keys, or None when the server database was
+            flushed and every key must be evicted.
+        """
+        self._epoch += 1
+        if keys is None:
+            self.invalidations += len(self._entries)
+            self.clear()
+            return
+        for key in keys:
+            if key in self._entries:
+                del self._entries[key]
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        """
+        Evict every key, including the values still being loaded.
+        """
+        self._epoch += 1
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Return the cache counters.
+
+        Returns
+        -------
+        dict
+            Whether tracking is active, the number of cached keys, the
+            hits, misses, invalidations and evictions, and the hit rate.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "active": self._active,
+            "size": len(self._entries),
+            "max_keys": self.max_keys,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
+
+    async def _track(self) -> None:
+        listener = create_redis(self.url, max_connections=1)
+        tracker = aioredis.Redis(
+            connection_pool=aioredis.ConnectionPool.from_url(
+                self.url, decode_responses=True, max_connections=1
+            ),
+            single_connection_client=True,
+        )
+        pubsub: PubSub | None = None
+        try:
+            # The only pooled connection of `listener` is reused by the
+            # pubsub, so its ID is the redirection target.
+            listener_id = await listener.client_id()
+            pubsub = listener.pubsub()
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            prefixes = [arg for prefix in self.prefixes for arg in ("PREFIX", prefix)]
+            await tracker.execute_command(
+                "CLIENT", "TRACKING", "ON", "REDIRECT", listener_id, "BCAST", *prefixes
+            )
+            self._active = True
+            logger.info("Redis client-side cache is tracking %s", self.prefixes)
+            last_seen = time.monotonic()
+            while True:
+                message = await pubsub.get_message(timeout=self.health_check_interval)
+                now = time.monotonic()
+                if message is not None:
+                    last_seen = now
+                    if message["type"] == "message":
+                        self.invalidate(message["data"])
+                    continue
+                if now - last_seen > 2 * self.health_check_interval:
+                    raise ConnectionError("Invalidation connection is not responding")
+                await tracker.ping()
+                await pubsub.ping()
+        finally:
+            self._active = False
+            self.clear()
+            if pubsub is not None:
+                await pubsub.close()
+            await tracker.close()
+            await listener.connection_pool.disconnect()
+            await tracker.connection_pool.disconnect()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._track()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Redis client-side cache tracking failed")
+            await asyncio.sleep(self.health_check_interval)
+
+    def start(self) -> None:
+        """
+        Start tracking in the running event loop.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stop tracking and empty the cache.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+async def close_redis(redis: Redis) -> None:
+    """
+    Close every pooled connection of a Redis client.
+
+    Parameters
+    ----------
+    redis : Redis
+        The client to close.
+    """
+    await redis.close()
+    await redis.connection_pool.disconnect()
 
-from api.core import settings
 
-redis = aioredis.from_url(settings.redis_settings.redis_url, decode_responses=True)
+redis_breaker: CircuitBreaker = LazyObject(
+    lambda: CircuitBreaker(
+        failure_threshold=settings.redis_settings.circuit_breaker_failure_threshold,
+        reset_timeout=settings.redis_settings.circuit_breaker_reset_timeout,
+    )
+)
+redis: Redis = LazyObject(
+    lambda: create_redis(
+        settings.redis_settings.redis_url, breaker=resolve(redis_breaker)
+    )
+)
+redis_cache: ClientSideCache = LazyObject(
+    lambda: ClientSideCache(
+        redis=resolve(redis),
+        url=settings.redis_settings.redis_url,
+        prefixes=settings.redis_settings.client_cache_prefixes,
+        max_keys=settings.redis_settings.client_cache_max_keys,
+        health_check_interval=settings.redis_settings.redis_health_check_interval,
+    )
+)
@@ -6,4 +6,9 @@ Components of the package.
     requests with the 'auth' prefix.
 2. The 'tasks' module provides logic for processing URL
     requests with the 'task' prefix.
+3. The 'service' module provides logic for processing URL
+    requests with the 'service' prefix.
+4. The 'jobs' module provides logic for processing URL
+    requests with the 'jobs' prefix.
+5. The 'metrics' module exposes the Prometheus metrics.
 """
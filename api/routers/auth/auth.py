@@ -1,3 +1,4 @@
+import logging
 from datetime import timedelta
 from typing import Annotated
 
@@ -7,22 +8,27 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.core import schemas, settings
+from api.core.timing import TimedRoute
 from api.db import user_qr
 from api.dependencies import (get_current_auth_user_for_refresh, get_redis,
-                              scoped_session_db, validate_auth_user)
+                              get_redis_cache, session_db, validate_auth_user)
+from api.redis_client import ClientSideCache, RedisUnavailableError
 from api.routers.auth.auth_helpers import (create_access_token,
                                            create_refresh_token, hash_password)
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix="/api/v1/auth",
     tags=["auth"],
+    route_class=TimedRoute,
 )
 
 
 @router.post("/register")
 async def register_user(
     user: Annotated[schemas.UserCreate, Form()],
-    session: Annotated[AsyncSession, Depends(scoped_session_db)],
+    session: Annotated[AsyncSession, Depends(session_db)],
 ):
     """
     Register a new user.
@@ -69,6 +75,9 @@ async def login_user(
     """
     Log in a user and create access and refresh tokens.
 
+    If Redis is unavailable, the tokens are issued without storing the
+    refresh token, which `refresh_jwt` then checks statelessly.
+
     Parameters
     ----------
     redis : Redis.
@@ -86,12 +95,14 @@ async def login_user(
     access_token = await create_access_token(user)
     refresh_token = await create_refresh_token(user)
 
-    await redis.set(
-        f"refresh_token_{user.id}",
-        refresh_token,
-        ex=timedelta(days=settings.auth_jwt.refresh_token_expire_days),
-    )
-    await redis.get(f"refresh_token_{user.id}")
+    try:
+        await redis.set(
+            f"refresh_token_{user.id}",
+            refresh_token,
+            ex=timedelta(days=settings.auth_jwt.refresh_token_expire_days),
+        )
+    except RedisUnavailableError:
+        logger.warning("Refresh token of user %s is not stored", user.id)
     return schemas.TokenInfo(
         access_token=access_token,
         refresh_token=refresh_token,
@@ -104,17 +115,21 @@ async def login_user(
     response_model_exclude_none=True,
 )
 async def refresh_jwt(
-    redis: Annotated[Redis, Depends(get_redis)],
+    redis_cache: Annotated[ClientSideCache, Depends(get_redis_cache)],
     user: Annotated[schemas.UserSchema, Depends(get_current_auth_user_for_refresh)],
 ):
     """
     Refresh the JSON Web Token (JWT) for an authenticated user.
 
+    While Redis is unavailable, a valid refresh token is accepted
+    without checking that it is stored, if
+    `stateless_refresh_fallback` is set.
+
     Parameters
     ----------
-    redis : Redis.
-        An instance of Redis used for storing the refresh token
-        associated with the user.
+    redis_cache : ClientSideCache.
+        The client-side cache through which the stored refresh token
+        of the user is read.
     user : UserSchema.
         The user data that has been validated for authentication.
         This is obtained through the `validate_auth_user` dependency.
@@ -125,9 +140,17 @@ async def refresh_jwt(
         An instance of TokenInfo containing the newly generated access token
         for the user.
     """
-    stored_refresh_token = await redis.get(f"refresh_token_{user.id}")
-    if stored_refresh_token is None:
-        raise HTTPException(status_code=401, detail="Invalid or expired refresh token")
+    try:
+        stored_refresh_token = await redis_cache.get(f"refresh_token_{user.id}")
+    except RedisUnavailableError:
+        if not settings.redis_settings.stateless_refresh_fallback:
+            raise
+        logger.warning("Refresh token of user %s is not checked in Redis", user.id)
+    else:
+        if stored_refresh_token is None:
+            raise HTTPException(
+                status_code=401, detail="Invalid or expired refresh token"
+            )
     access_token = await create_access_token(user)
     return schemas.TokenInfo(
         access_token=access_token,
@@ -1,16 +1,18 @@
+import asyncio
 from datetime import timedelta
 
 import bcrypt
 
 from api.core import schemas
 from api.core.config import settings
+from api.metrics import bcrypt_duration
 from api.routers.auth.jwt_utils import encode_jwt
 
 
 async def create_jwt(
     token_type: str,
     token_data: dict,
-    expire_minutes: int = settings.auth_jwt.access_token_expire_minutes,
+    expire_minutes: int | None = None,
     expire_timedelta: timedelta | None = None,
 ) -> str:
     """
@@ -97,19 +99,47 @@ async def create_refresh_token(user: schemas.UserSchema):
     )
 
 
+async def create_admin_token(subject: str) -> str:
+    """
+    Create an admin token that gives access to the diagnostics of the
+    workers.
+
+    Admin tokens are not issued by the API; they are created with the
+    private key by `python -m api.admin_token`.
+
+    Parameters
+    ----------
+    subject : str
+        Who the token is issued to, e.g. the name of an operator.
+
+    Returns
+    -------
+    str
+        An encoded admin token as a string.
+    """
+    return await create_jwt(
+        token_type=settings.auth_jwt.ADMIN_TOKEN_TYPE,
+        token_data={"sub": subject},
+        expire_minutes=settings.auth_jwt.admin_token_expire_minutes,
+    )
+
+
 async def hash_password(
     password: str,
 ) -> bytes:
     salt = bcrypt.gensalt()
     pwd_bytes: bytes = password.encode("utf-8")
-    return bcrypt.hashpw(pwd_bytes, salt)
+    with bcrypt_duration.labels("hash").time():
+        return await asyncio.to_thread(bcrypt.hashpw, pwd_bytes, salt)
 
 
 async def validate_password(
     password: str,
     hashed_password: bytes,
 ) -> bool:
-    return bcrypt.checkpw(
-        password=password.encode("utf-8"),
-        hashed_password=hashed_password,
-    )
+    with bcrypt_duration.labels("check").time():
+        return await asyncio.to_thread(
+            bcrypt.checkpw,
+            password=password.encode("utf-8"),
+            hashed_password=hashed_password,
+        )
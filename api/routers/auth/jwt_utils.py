@@ -1,15 +1,52 @@
 from datetime import datetime, timedelta, timezone
+from functools import cache
 
 import jwt
+from cryptography.hazmat.primitives.asymmetric.types import (PrivateKeyTypes,
+                                                             PublicKeyTypes)
+from cryptography.hazmat.primitives.serialization import (load_pem_private_key,
+                                                          load_pem_public_key)
 
 from api import settings
+from api.core.timing import timed
+
+
+@cache
+def load_private_key() -> PrivateKeyTypes:
+    """
+    Read and parse the private key used to sign tokens on first use.
+
+    The parsed key is reused, so signing a token does not parse the
+    PEM file again.
+
+    Returns
+    -------
+    PrivateKeyTypes
+        The private key.
+    """
+    return load_pem_private_key(
+        settings.auth_jwt.private_key.read_bytes(), password=None
+    )
+
+
+@cache
+def load_public_key() -> PublicKeyTypes:
+    """
+    Read and parse the public key used to verify tokens on first use.
+
+    Returns
+    -------
+    PublicKeyTypes
+        The public key.
+    """
+    return load_pem_public_key(settings.auth_jwt.public_key_path.read_bytes())
 
 
 async def encode_jwt(
     payload: dict,
-    private_key: str = settings.auth_jwt.private_key.read_text(),
-    algorithm: str = settings.auth_jwt.algorithm,
-    expire_minutes: int = settings.auth_jwt.access_token_expire_minutes,
+    private_key: str | None = None,
+    algorithm: str | None = None,
+    expire_minutes: int | None = None,
     expire_timedelta: timedelta | None = None,
 ) -> str:
     """
@@ -19,12 +56,15 @@ async def encode_jwt(
     ----------
     payload : dict
         The payload (claims) to include in the JWT.
-    private_key : str
-        The private key used to sign the token.
-    algorithm : str
-        The algorithm used for encoding the JWT.
-    expire_minutes : int
-        The number of minutes before the token expires.
+    private_key : str, optional
+        The private key used to sign the token. Defaults to the key
+        at `AuthJWT.private_key`.
+    algorithm : str, optional
+        The algorithm used for encoding the JWT. Defaults to
+        `AuthJWT.algorithm`.
+    expire_minutes : int, optional
+        The number of minutes before the token expires. Defaults to
+        `AuthJWT.access_token_expire_minutes`.
     expire_timedelta : timedelta, optional
         A `timedelta` object specifying a custom expiration time for the token.
 
@@ -33,6 +73,8 @@ async def encode_jwt(
     str
         The encoded JWT as a string.
     """
+    if expire_minutes is None:
+        expire_minutes = settings.auth_jwt.access_token_expire_minutes
     to_encode = payload.copy()
 
     now = datetime.now(timezone.utc)
@@ -44,18 +86,19 @@ async def encode_jwt(
         exp=expire,
         iat=now,
     )
-    encoded = jwt.encode(
-        to_encode,
-        private_key,
-        algorithm=algorithm,
-    )
+    with timed("jwt"):
+        encoded = jwt.encode(
+            to_encode,
+            private_key or load_private_key(),
+            algorithm=algorithm or settings.auth_jwt.algorithm,
+        )
     return encoded
 
 
 async def decode_jwt(
     token: str | bytes,
-    public_key: str = settings.auth_jwt.public_key_path.read_text(),
-    algorithm: str = settings.auth_jwt.algorithm,
+    public_key: str | None = None,
+    algorithm: str | None = None,
 ) -> dict:
     """
     Decode a JSON Web Token (JWT) using a specified public key and algorithm.
@@ -64,19 +107,22 @@ async def decode_jwt(
     ----------
     token : str or bytes
         The JWT token to decode.
-    public_key : str
-        The public key used to verify the token's signature.
-    algorithm : str
-        The algorithm used for encoding the JWT.
+    public_key : str, optional
+        The public key used to verify the token's signature. Defaults
+        to the key at `AuthJWT.public_key_path`.
+    algorithm : str, optional
+        The algorithm used for encoding the JWT. Defaults to
+        `AuthJWT.algorithm`.
 
     Returns
     -------
     dict
         The decoded payload of the JWT as a dictionary containing the claims.
     """
-    decode = jwt.decode(
-        token,
-        public_key,
-        algorithms=[algorithm],
-    )
+    with timed("jwt"):
+        decode = jwt.decode(
+            token,
+            public_key or load_public_key(),
+            algorithms=[algorithm or settings.auth_jwt.algorithm],
+        )
     return decode
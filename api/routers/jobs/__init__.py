@@ -0,0 +1,11 @@
+"""
+Package 'jobs'.
+
+Components of the package.
+1. The 'jobs' module provides logic for processing URL
+    requests with the 'jobs' prefix.
+"""
+
+__all__ = ("router",)
+
+from .jobs import router
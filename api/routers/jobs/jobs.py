@@ -0,0 +1,48 @@
+from typing import Annotated
+
+from aioredis import Redis
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from api.core import schemas
+from api.core.timing import TimedRoute
+from api.dependencies import get_current_auth_user, get_redis
+from api.jobs import get_job, job_info
+
+router = APIRouter(
+    prefix="/api/v1/jobs",
+    tags=["jobs"],
+    route_class=TimedRoute,
+)
+
+
+@router.get("/{job_id}", response_model=schemas.JobInfo)
+async def get_job_status(
+    job_id: str,
+    user: Annotated[schemas.UserSchema, Depends(get_current_auth_user)],
+    redis: Annotated[Redis, Depends(get_redis)],
+):
+    """
+    Retrieve the status of a background job of the current user.
+
+    Parameters
+    ----------
+    job_id : str.
+        The ID of the job.
+    user : UserSchema.
+        An instance of UserSchema representing the currently authenticated user.
+    redis : Redis.
+        An instance of Redis that holds the job queue.
+
+    Returns
+    -------
+    JobInfo :
+        The status, number of attempts, progress, result and error
+        of the job.
+    """
+    state = await get_job(redis, job_id)
+    if state is None or state.get("user_id") != str(user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job with id: {job_id} not found.",
+        )
+    return job_info(state)
@@ -0,0 +1,11 @@
+"""
+Package 'metrics'.
+
+Components of the package.
+1. The 'metrics' module exposes the Prometheus metrics of the
+    application at '/metrics'.
+"""
+
+__all__ = ("router",)
+
+from .metrics import router
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Response
+
+from api.core.timing import TimedRoute
+from api.metrics import render_metrics
+
+router = APIRouter(
+    tags=["metrics"],
+    route_class=TimedRoute,
+)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Return the metrics of the application for Prometheus.
+
+    With several worker processes the metrics of all workers are
+    aggregated, so the scrape may be answered by any of them.
+
+    Returns
+    -------
+    Response :
+        The metrics in the Prometheus text format: HTTP request counts,
+        latencies and requests in progress, database pool gauges and
+        wait times, Redis command latencies, bcrypt times and the hit
+        counters of the statement and client-side caches.
+    """
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,11 @@
+"""
+Package 'service'.
+
+Components of the package.
+1. The 'service' module provides logic for processing URL
+    requests with the 'service' prefix.
+"""
+
+__all__ = ("router",)
+
+from .service import router
@@ -0,0 +1,191 @@
+import asyncio
+import threading
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from api.core.config import settings
+from api.core.timing import TimedRoute
+from api.db.dbhelper import db_helper
+from api.dependencies import get_admin_token_payload
+from api.diagnostics import SamplingProfiler, loop_monitor
+from api.load_shedding import concurrency_limiter
+from api.redis_client import redis_breaker, redis_cache
+from api.startup import readiness
+
+router = APIRouter(
+    prefix="/api/v1/service",
+    tags=["service"],
+    route_class=TimedRoute,
+)
+
+profiler_lock = asyncio.Lock()
+
+
+@router.get("/db-pool")
+async def get_db_pool_metrics():
+    """
+    Return the live metrics of the database connection pools.
+
+    Returns
+    -------
+    dict :
+        For the primary and every replica: the pool size, checked out
+        and checked in connections, overflow, checkout timeouts and the
+        histogram of checkout wait times. Also the histograms of the time
+        each request spent acquiring connections and of the time
+        connections were held, and the compiled statement cache counters.
+    """
+    return db_helper.pool_metrics()
+
+
+@router.get("/redis-cache")
+async def get_redis_cache_stats():
+    """
+    Return the counters of the client-side cache of hot Redis keys.
+
+    Returns
+    -------
+    dict :
+        Whether invalidation tracking is active, the number of cached
+        keys, the hits, misses, invalidations, evictions and hit rate.
+    """
+    return redis_cache.stats()
+
+
+@router.get("/redis-breaker")
+async def get_redis_breaker_stats():
+    """
+    Return the state of the Redis circuit breaker.
+
+    Returns
+    -------
+    dict :
+        The state of the circuit, the current number of consecutive
+        failures, how many times it opened and how many calls it rejected.
+    """
+    return redis_breaker.stats()
+
+
+@router.get("/concurrency")
+async def get_concurrency_stats():
+    """
+    Return the state of the adaptive concurrency limit of the worker.
+
+    Returns
+    -------
+    dict :
+        The current limit, the requests in flight, the admitted and
+        rejected requests and the short and long-term latency.
+    """
+    return concurrency_limiter.stats()
+
+
+@router.get("/health/live")
+async def get_liveness():
+    """
+    Report that the worker process is serving requests.
+
+    Returns
+    -------
+    dict :
+        The status "alive". Nothing else is checked.
+    """
+    return {"status": "alive"}
+
+
+@router.get("/health/ready")
+async def get_readiness():
+    """
+    Report whether the worker is ready for traffic.
+
+    The status is cached by the worker and never queries the database
+    or Redis, so frequent probes cost nothing.
+
+    Returns
+    -------
+    JSONResponse :
+        Status code 200 once the warm-up has finished, or status code
+        503 SERVICE UNAVAILABLE while the worker warms up or shuts down,
+        with the warm-up timings and the last warm-up error.
+    """
+    return JSONResponse(
+        status_code=(
+            status.HTTP_200_OK
+            if readiness.ready
+            else status.HTTP_503_SERVICE_UNAVAILABLE
+        ),
+        content=readiness.snapshot(),
+    )
+
+
+@router.get(
+    "/profile",
+    response_class=PlainTextResponse,
+    dependencies=[Depends(get_admin_token_payload)],
+)
+async def get_profile(
+    seconds: Annotated[float, Query(gt=0)] = 10,
+    interval_ms: Annotated[float, Query(ge=1, le=1000)] = 5,
+):
+    """
+    Profile the event loop of the worker that answers the request.
+
+    The stacks of the event loop thread are sampled for the requested
+    time while the worker keeps serving requests. Only one profile runs
+    at a time in a worker. Requires an admin token.
+
+    Parameters
+    ----------
+    seconds : float
+        The duration of the profile, at most
+        `ServerSettings.profiler_max_seconds`. Defaults to 10.
+    interval_ms : float
+        Milliseconds between two samples. Defaults to 5.
+
+    Returns
+    -------
+    str :
+        The sampled stacks in the collapsed stack format, ready for
+        `flamegraph.pl` or speedscope.
+
+    Raises
+    ------
+    HTTPException
+        With status code 422 if the duration is too long, or 409
+        CONFLICT if the worker is already being profiled.
+    """
+    if seconds > settings.server.profiler_max_seconds:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"A profile may last at most "
+            f"{settings.server.profiler_max_seconds:g} seconds.",
+        )
+    if profiler_lock.locked():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="The worker is already being profiled.",
+        )
+    async with profiler_lock:
+        profiler = SamplingProfiler(
+            thread_id=threading.get_ident(), interval=interval_ms / 1000
+        )
+        await profiler.run(seconds)
+    return profiler.collapsed()
+
+
+@router.get("/loop-lag", dependencies=[Depends(get_admin_token_payload)])
+async def get_loop_lag():
+    """
+    Return the recent blocks of the event loop of the worker that
+    answers the request. Requires an admin token.
+
+    Returns
+    -------
+    dict :
+        Whether the monitor runs, its threshold in milliseconds and,
+        for every block, when it ended, how long it lasted, the blocking
+        task and coroutine and the stack of the loop thread.
+    """
+    return loop_monitor.stats()
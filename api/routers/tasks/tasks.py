@@ -1,28 +1,91 @@
+import asyncio
+import logging
+import shutil
+import uuid
 from typing import Annotated
 
+from aioredis import Redis
 from fastapi import (APIRouter, Depends, Form, HTTPException, Query, Response,
-                     status)
+                     UploadFile, status)
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from api.core import schemas
+from api import tasks_import
+from api.core import schemas, settings
+from api.core.timing import TimedRoute
 from api.db import tasks_qr
-from api.dependencies import get_current_auth_user, scoped_session_db
+from api.db.dbhelper import db_helper
+from api.db.read_coalescer import read_coalescer
+from api.db.write_coalescer import task_insert_coalescer
+from api.dependencies import get_current_auth_user, get_redis, session_db
+from api.jobs import enqueue
+from api.redis_client import RedisUnavailableError
+from api.write_behind import (enqueue_task_write, merge_pending_writes,
+                              pending_task_writes, task_order_key)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/api/v1/tasks",
     tags=["tasks"],
+    route_class=TimedRoute,
 )
 
 
+async def queue_task_write(
+    redis: Redis,
+    op: str,
+    user_id: int,
+    task_id: int | None = None,
+    data: dict | None = None,
+) -> JSONResponse:
+    """
+    Queue a validated task write in the write-behind mode.
+
+    Parameters
+    ----------
+    redis : Redis.
+        An instance of Redis that holds the stream of writes.
+    op : str.
+        The operation: "create", "update" or "delete".
+    user_id : int.
+        The ID of the user who makes the write.
+    task_id : int, optional.
+        The ID of the updated or deleted task.
+    data : dict, optional.
+        The validated fields of the created or updated task.
+
+    Returns
+    -------
+    JSONResponse :
+        A response with status code 202 ACCEPTED and the ID of the
+        queued write.
+    """
+    write_id = await enqueue_task_write(
+        redis, op=op, user_id=user_id, task_id=task_id, data=data
+    )
+    await read_coalescer.invalidate(user_id)
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"write_id": write_id},
+    )
+
+
 @router.post("/")
 async def create_task(
     task: Annotated[schemas.TaskCreate, Form()],
     user: Annotated[schemas.UserSchema, Depends(get_current_auth_user)],
-    session: Annotated[AsyncSession, Depends(scoped_session_db)],
+    session: Annotated[AsyncSession, Depends(session_db)],
+    redis: Annotated[Redis, Depends(get_redis)],
 ):
     """
     Create a new task associated with the current authenticated user.
 
+    When `insert_batch_enabled` is set, the task is written together
+    with other concurrent inserts by `task_insert_coalescer`. In the
+    write-behind mode the task is queued and written later.
+
     Parameters
     ----------
     task : TaskCreate.
@@ -32,33 +95,302 @@ async def create_task(
         An instance of UserSchema representing the currently authenticated user.
     session : AsyncSession.
         An instance of AsyncSession for database operations.
+    redis : Redis.
+        An instance of Redis used for queueing writes in the
+        write-behind mode.
 
     Returns
     -------
     Response :
         An HTTP response with status code 200 if the task creation is
-        successful, or status code 422 UNPROCESSABLE ENTITY if the
-        task creation fails.
+        successful, status code 202 ACCEPTED with the ID of the queued
+        write in the write-behind mode, or status code 422 UNPROCESSABLE
+        ENTITY if the task creation fails.
     """
-    result = await tasks_qr.create_task(
-        session=session,
-        user_id=user.id,
-        task_data=task,
-    )
+    if settings.write_behind.enabled:
+        return await queue_task_write(
+            redis, op="create", user_id=user.id, data=task.model_dump()
+        )
+    if settings.db_settings.insert_batch_enabled:
+        await task_insert_coalescer.insert(user_id=user.id, task_data=task)
+        result = True
+    else:
+        result = await tasks_qr.create_task(
+            session=session,
+            user_id=user.id,
+            task_data=task,
+        )
+    await read_coalescer.invalidate(user.id)
     if result:
         return Response(status_code=status.HTTP_200_OK)
     else:
         return Response(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY)
 
 
+@router.post("/import", response_model=schemas.ImportReport)
+async def upload_tasks(
+    file: UploadFile,
+    user: Annotated[schemas.UserSchema, Depends(get_current_auth_user)],
+    redis: Annotated[Redis, Depends(get_redis)],
+    file_format: Annotated[schemas.ImportFormat | None, Query(alias="format")] = None,
+):
+    """
+    Import tasks of the current authenticated user from a CSV or
+    NDJSON file.
+
+    Every row is validated against `TaskCreate` and the valid rows are
+    loaded with COPY in chunks. Small files are imported during the
+    request; larger ones are saved and imported by a background job.
+
+    Parameters
+    ----------
+    file : UploadFile.
+        The CSV file with a header row, or the NDJSON file with one
+        task object per line.
+    user : UserSchema.
+        An instance of UserSchema representing the currently authenticated user.
+    redis : Redis.
+        An instance of Redis that holds the job queue.
+    file_format : ImportFormat, optional.
+        The format of the file. Defaults to the extension of the file name.
+
+    Returns
+    -------
+    ImportReport :
+        The numbers of imported and failed rows and the row errors, or
+        status code 202 ACCEPTED with the ID of the import job for
+        large files.
+    """
+    if file_format is None:
+        extension = (file.filename or "").rpartition(".")[2].lower()
+        if extension not in schemas.ImportFormat.__members__:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Unknown file format, expected csv or ndjson.",
+            )
+        file_format = schemas.ImportFormat(extension)
+
+    if file.size is not None and file.size <= settings.jobs.import_inline_max_bytes:
+        return await tasks_import.import_tasks(file.file, file_format, user.id)
+
+    import_dir = settings.jobs.import_dir
+    import_dir.mkdir(parents=True, exist_ok=True)
+    path = import_dir / f"{uuid.uuid4().hex}.{file_format.value}"
+    with path.open("wb") as destination:
+        await asyncio.to_thread(shutil.copyfileobj, file.file, destination)
+    job_id = await enqueue(
+        redis,
+        "tasks.import",
+        {"path": str(path), "file_format": file_format.value, "user_id": user.id},
+        user_id=user.id,
+    )
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"job_id": job_id},
+    )
+
+
+def encode_cursor(task: dict) -> str:
+    """
+    Encode the cursor of the page after a task.
+
+    Parameters
+    ----------
+    task : dict
+        The last task of the page, with its "position" and "id".
+
+    Returns
+    -------
+    str
+        The cursor. Archived tasks have no position.
+    """
+    return f"{task['position'] or ''}.{task['id']}"
+
+
+def decode_cursor(cursor: str) -> tuple[str | None, int]:
+    """
+    Decode a cursor made by `encode_cursor`.
+
+    Parameters
+    ----------
+    cursor : str
+        The cursor.
+
+    Returns
+    -------
+    tuple[str or None, int]
+        The position and the ID of the last task of the previous page.
+
+    Raises
+    ------
+    HTTPException
+        With status code 422 if the cursor is malformed.
+    """
+    position, _, task_id = cursor.rpartition(".")
+    if not task_id.isdigit():
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Invalid cursor.",
+        )
+    return position or None, int(task_id)
+
+
+def task_dict(task) -> dict:
+    """
+    Convert a task row read by `tasks_qr.get_tasks` into a dictionary.
+
+    Parameters
+    ----------
+    task : Row
+        The row of the task.
+
+    Returns
+    -------
+    dict
+        The fields of the task in `TasksResponse`.
+    """
+    return {
+        "id": task.id,
+        "title": task.title,
+        "description": task.description,
+        "status": task.status,
+        "tags": task.tags,
+        "parent_id": task.parent_id,
+        "position": task.position,
+    }
+
+
+async def load_tasks(
+    redis: Redis,
+    user_id: int,
+    status_filter: schemas.TaskStatus,
+    tags_all: list[str],
+    tags_any: list[str],
+    cursor: str | None,
+    limit: int | None,
+) -> bytes:
+    """
+    Load a page of the tasks of a user in their order and serialize
+    the response.
+
+    The tasks are read in a session of their own, so the read can be
+    shared by concurrent requests of the user. In the write-behind mode
+    the user's writes that are not applied yet are merged into the
+    result, and the created tasks are appended to the last page. The
+    tasks that pending updates refer to are read regardless of the
+    filters, so an update can move a task into the page as well as out
+    of it. While Redis is unavailable only the applied writes are
+    returned.
+
+    Parameters
+    ----------
+    redis : Redis.
+        An instance of Redis used for reading the pending writes in the
+        write-behind mode.
+    user_id : int.
+        The ID of the user who reads the tasks.
+    status_filter : TaskStatus.
+        The status filter used to retrieve specific tasks.
+    tags_all : list[str].
+        The tags all returned tasks have.
+    tags_any : list[str].
+        The tags of which every returned task has at least one.
+    cursor : str or None.
+        The `next_cursor` of the previous page.
+    limit : int or None.
+        The size of the page, or None for all tasks.
+
+    Returns
+    -------
+    bytes :
+        The JSON body of a `TasksResponse`.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    async with db_helper.get_session() as session:
+        session.info["user_id"] = user_id
+        tasks = await tasks_qr.get_tasks(
+            session=session,
+            user_id=user_id,
+            status=status_filter,
+            tags_all=tags_all,
+            tags_any=tags_any,
+            after=after,
+            limit=limit + 1 if limit is not None else None,
+        )
+    task_response = [task_dict(task) for task in tasks]
+    next_cursor = None
+    if limit is not None and len(task_response) > limit:
+        del task_response[limit:]
+        next_cursor = encode_cursor(task_response[-1])
+    if settings.write_behind.enabled:
+        try:
+            pending = await pending_task_writes(redis, user_id=user_id)
+        except RedisUnavailableError:
+            logger.warning("Pending task writes of user %s are skipped", user_id)
+        else:
+            listed = {task["id"] for task in task_response}
+            updated_ids = {
+                write["task_id"]
+                for write in pending
+                if write["op"] == "update" and write["task_id"] not in listed
+            }
+            updated = []
+            if updated_ids:
+                async with db_helper.get_session() as session:
+                    session.info["user_id"] = user_id
+                    rows = await tasks_qr.get_tasks_by_ids(
+                        session=session, user_id=user_id, task_ids=list(updated_ids)
+                    )
+                # Only the tasks that sort into this page may join it.
+                start = (
+                    task_order_key({"position": after[0], "id": after[1]})
+                    if after
+                    else None
+                )
+                end = task_order_key(task_response[-1]) if next_cursor else None
+                updated = [
+                    task
+                    for task in map(task_dict, rows)
+                    if (start is None or task_order_key(task) > start)
+                    and (end is None or task_order_key(task) < end)
+                ]
+            task_response = merge_pending_writes(
+                task_response,
+                pending,
+                status=status_filter,
+                tags_all=tags_all,
+                tags_any=tags_any,
+                include_created=next_cursor is None,
+                updated=updated,
+            )
+    return (
+        schemas.TasksResponse(tasks=task_response, next_cursor=next_cursor)
+        .model_dump_json()
+        .encode()
+    )
+
+
 @router.get("/", response_model=schemas.TasksResponse)
 async def get_tasks(
     status_filter: schemas.TaskStatus,
     user: Annotated[schemas.UserSchema, Depends(get_current_auth_user)],
-    session: Annotated[AsyncSession, Depends(scoped_session_db)],
+    redis: Annotated[Redis, Depends(get_redis)],
+    tags_all: Annotated[list[str], Query()] = [],
+    tags_any: Annotated[list[str], Query()] = [],
+    cursor: str | None = None,
+    limit: Annotated[int | None, Query(ge=1, le=schemas.MAX_PAGE_SIZE)] = None,
 ):
     """
-    Retrieve all tasks filtered by a specified task status.
+    Retrieve the tasks of the current authenticated user filtered by a
+    specified task status and tags, in the order set by moving them.
+
+    Without `limit` all matching tasks are returned. With it, the
+    response has up to `limit` tasks and, if there are more, the
+    `next_cursor` to pass as `cursor` for the next page.
+
+    Identical concurrent requests of the user share one query and one
+    serialized response through `read_coalescer`; a request made after
+    a write of the user always reads anew.
 
     Parameters
     ----------
@@ -66,23 +398,36 @@ async def get_tasks(
         The status filter used to retrieve specific tasks.
     user : UserSchema.
         An instance of UserSchema representing the currently authenticated user.
-    session : AsyncSession.
-        An instance of AsyncSession for database operations.
+    redis : Redis.
+        An instance of Redis used for reading the pending writes in the
+        write-behind mode.
+    tags_all : list[str], optional.
+        Only return the tasks that have all of these tags. The
+        parameter may be repeated or hold comma-separated tags.
+    tags_any : list[str], optional.
+        Only return the tasks that have at least one of these tags.
+    cursor : str, optional.
+        The `next_cursor` of the previous page.
+    limit : int, optional.
+        The maximum number of returned tasks.
 
     Returns
     -------
     TasksResponse :
-        A structured response containing a list of tasks.
+        A structured response containing a list of tasks and the cursor
+        of the next page.
     """
-    tasks = await tasks_qr.get_tasks(
-        session=session,
-        status=status_filter,
+    tags_all = schemas.normalize_tags(tags_all)
+    tags_any = schemas.normalize_tags(tags_any)
+    body = await read_coalescer.run(
+        scope=user.id,
+        key=("tasks", status_filter, tuple(tags_all), tuple(tags_any), cursor, limit),
+        read=lambda: load_tasks(
+            redis, user.id, status_filter, tags_all, tags_any, cursor, limit
+        ),
+        name="tasks",
     )
-    task_response = [
-        {"title": task.title, "description": task.description, "status": task.status}
-        for task in tasks
-    ]
-    return {"tasks": task_response}
+    return Response(content=body, media_type="application/json")
 
 
 @router.put("/id", response_model=schemas.Task)
@@ -90,7 +435,8 @@ async def update_task(
     id: Annotated[int, Query()],
     task: Annotated[schemas.TaskUpdate, Form()],
     user: Annotated[schemas.UserSchema, Depends(get_current_auth_user)],
-    session: Annotated[AsyncSession, Depends(scoped_session_db)],
+    session: Annotated[AsyncSession, Depends(session_db)],
+    redis: Annotated[Redis, Depends(get_redis)],
 ):
     """
 
@@ -105,15 +451,29 @@ async def update_task(
         An instance of UserSchema representing the currently authenticated user.
     session : AsyncSession.
         An instance of AsyncSession for database operations.
+    redis : Redis.
+        An instance of Redis used for queueing writes in the
+        write-behind mode.
 
     Returns
     -------
     Task :
-        The updated task object that reflects the changes made.
+        The updated task object that reflects the changes made, status
+        code 404 NOT FOUND if the user has no task with the ID, or
+        status code 202 ACCEPTED with the ID of the queued write in the
+        write-behind mode.
     """
-    updated_task = await tasks_qr.update_task(
-        task_id=id, update_data=task, session=session
-    )
+    if settings.write_behind.enabled:
+        return await queue_task_write(
+            redis, op="update", user_id=user.id, task_id=id, data=task.model_dump()
+        )
+    try:
+        updated_task = await tasks_qr.update_task(
+            session=session, user_id=user.id, task_id=id, update_data=task
+        )
+    except NoResultFound as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    await read_coalescer.invalidate(user.id)
     return updated_task
 
 
@@ -121,7 +481,8 @@ async def update_task(
 async def delete_task(
     id: Annotated[int, Query()],
     user: Annotated[schemas.UserSchema, Depends(get_current_auth_user)],
-    session: Annotated[AsyncSession, Depends(scoped_session_db)],
+    session: Annotated[AsyncSession, Depends(session_db)],
+    redis: Annotated[Redis, Depends(get_redis)],
 ):
     """
 
@@ -133,17 +494,260 @@ async def delete_task(
         An instance of UserSchema representing the currently authenticated user.
     session : AsyncSession.
         An instance of AsyncSession for database operations.
+    redis : Redis.
+        An instance of Redis used for queueing writes in the
+        write-behind mode.
 
     Returns
     -------
     dict:
         A dictionary containing a success message confirming the deletion
-        of the specified task.
+        of the specified task, or status code 202 ACCEPTED with the ID of
+        the queued write in the write-behind mode.
     """
+    if settings.write_behind.enabled:
+        return await queue_task_write(redis, op="delete", user_id=user.id, task_id=id)
     result = await tasks_qr.delete_task(
         session=session,
+        user_id=user.id,
         task_id=id,
     )
+    await read_coalescer.invalidate(user.id)
     if not result:
         raise HTTPException(status_code=404, detail=f"Task with id: {id} not found.")
     return {"message": f"Task with id: {id} successfully deleted"}
+
+
+@router.patch("/{id}/move", response_model=schemas.Task)
+async def move_task(
+    id: int,
+    move: Annotated[schemas.TaskMove, Form()],
+    user: Annotated[schemas.UserSchema, Depends(get_current_auth_user)],
+    session: Annotated[AsyncSession, Depends(session_db)],
+):
+    """
+    Move a task of the current authenticated user right after another
+    of its tasks, or to the top.
+
+    Only the moved task is updated, by giving it a position between
+    its new neighbours. Moves are written immediately, also in the
+    write-behind mode.
+
+    Parameters
+    ----------
+    id : int.
+        The unique identifier of the task to be moved.
+    move : TaskMove.
+        An instance of TaskMove schema with the ID of the task the moved
+        task is placed after, or no ID to move it to the top.
+    user : UserSchema.
+        An instance of UserSchema representing the currently authenticated user.
+    session : AsyncSession.
+        An instance of AsyncSession for database operations.
+
+    Returns
+    -------
+    Task :
+        The moved task, or status code 404 NOT FOUND if the user has no
+        task with either ID.
+    """
+    try:
+        moved_task = await tasks_qr.move_task(
+            session=session, user_id=user.id, task_id=id, after_id=move.after_id
+        )
+    except NoResultFound as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    await read_coalescer.invalidate(user.id)
+    return moved_task
+
+
+@router.patch("/tags")
+async def update_tags(
+    tags: Annotated[schemas.TaskTagsUpdate, Form()],
+    user: Annotated[schemas.UserSchema, Depends(get_current_auth_user)],
+    session: Annotated[AsyncSession, Depends(session_db)],
+):
+    """
+    Add and remove tags of several tasks of the current authenticated
+    user at once.
+
+    All tasks are updated by a single statement. Tags are written
+    immediately, also in the write-behind mode.
+
+    Parameters
+    ----------
+    tags : TaskTagsUpdate.
+        An instance of TaskTagsUpdate schema with the IDs of the tasks
+        and the tags to be added and removed.
+    user : UserSchema.
+        An instance of UserSchema representing the currently authenticated user.
+    session : AsyncSession.
+        An instance of AsyncSession for database operations.
+
+    Returns
+    -------
+    dict:
+        A dictionary with the number of updated tasks. Tasks of other
+        users, archived tasks and tasks that would get too many tags are
+        not updated.
+    """
+    updated = await tasks_qr.update_tags(
+        session=session,
+        user_id=user.id,
+        task_ids=tags.task_ids,
+        add=tags.add,
+        remove=tags.remove,
+    )
+    await read_coalescer.invalidate(user.id)
+    return {"updated": updated}
+
+
+@router.post("/{id}/subtasks", response_model=schemas.Task)
+async def create_subtask(
+    id: int,
+    task: Annotated[schemas.TaskCreate, Form()],
+    user: Annotated[schemas.UserSchema, Depends(get_current_auth_user)],
+    session: Annotated[AsyncSession, Depends(session_db)],
+):
+    """
+    Create a subtask of a task of the current authenticated user.
+
+    Subtasks are written immediately, also in the write-behind mode.
+
+    Parameters
+    ----------
+    id : int.
+        The unique identifier of the parent task.
+    task : TaskCreate.
+        An instance of TaskCreate schema containing the details of the
+        subtask to be created.
+    user : UserSchema.
+        An instance of UserSchema representing the currently authenticated user.
+    session : AsyncSession.
+        An instance of AsyncSession for database operations.
+
+    Returns
+    -------
+    Task :
+        The created subtask, status code 404 NOT FOUND if the user has
+        no task with the ID, or status code 422 UNPROCESSABLE ENTITY if
+        the subtask would be deeper than `SUBTASKS_MAX_DEPTH` or the
+        task already has `SUBTASKS_MAX_CHILDREN` subtasks.
+    """
+    try:
+        subtask = await tasks_qr.create_subtask(
+            session=session,
+            user_id=user.id,
+            parent_id=id,
+            task_data=task,
+            max_depth=settings.subtasks.max_depth,
+            max_children=settings.subtasks.max_children,
+        )
+    except NoResultFound as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    except tasks_qr.TreeLimitError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc)
+        )
+    await read_coalescer.invalidate(user.id)
+    return subtask
+
+
+@router.get("/{id}/subtree", response_model=schemas.TaskTree)
+async def get_subtree(
+    id: int,
+    user: Annotated[schemas.UserSchema, Depends(get_current_auth_user)],
+    session: Annotated[AsyncSession, Depends(session_db)],
+):
+    """
+    Retrieve a task of the current authenticated user with all its
+    subtasks, nested in the order of their positions.
+
+    The whole subtree is read by a single query.
+
+    Parameters
+    ----------
+    id : int.
+        The unique identifier of the root of the subtree.
+    user : UserSchema.
+        An instance of UserSchema representing the currently authenticated user.
+    session : AsyncSession.
+        An instance of AsyncSession for database operations.
+
+    Returns
+    -------
+    TaskTree :
+        The task with its subtasks, or status code 404 NOT FOUND if the
+        user has no task with the ID.
+    """
+    rows = await tasks_qr.get_subtree(session=session, user_id=user.id, task_id=id)
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"Task with id {id} not found.")
+    # Parents come before their subtasks, which are in order.
+    nodes = {}
+    for row in rows:
+        node = schemas.TaskTree(
+            id=row.id,
+            title=row.title,
+            description=row.description,
+            status=row.status,
+            tags=row.tags,
+            parent_id=row.parent_id,
+        )
+        nodes[row.id] = node
+        if row.id != id:
+            nodes[row.parent_id].subtasks.append(node)
+    return nodes[id]
+
+
+@router.patch("/{id}/parent")
+async def move_subtree(
+    id: int,
+    parent: Annotated[schemas.TaskParent, Form()],
+    user: Annotated[schemas.UserSchema, Depends(get_current_auth_user)],
+    session: Annotated[AsyncSession, Depends(session_db)],
+):
+    """
+    Make a task of the current authenticated user, with all its
+    subtasks, a subtask of another of its tasks, or a top-level task.
+
+    The whole subtree is moved by a single statement. Moves are written
+    immediately, also in the write-behind mode.
+
+    Parameters
+    ----------
+    id : int.
+        The unique identifier of the moved task.
+    parent : TaskParent.
+        An instance of TaskParent schema with the ID of the new parent
+        task, or no ID to make the task a top-level task.
+    user : UserSchema.
+        An instance of UserSchema representing the currently authenticated user.
+    session : AsyncSession.
+        An instance of AsyncSession for database operations.
+
+    Returns
+    -------
+    dict:
+        A dictionary with the number of moved tasks, status code 404
+        NOT FOUND if the user has no task with either ID, or status code
+        422 UNPROCESSABLE ENTITY if the new parent is one of the moved
+        tasks or the move would break the limits of the subtasks.
+    """
+    try:
+        moved = await tasks_qr.move_subtree(
+            session=session,
+            user_id=user.id,
+            task_id=id,
+            parent_id=parent.parent_id,
+            max_depth=settings.subtasks.max_depth,
+            max_children=settings.subtasks.max_children,
+        )
+    except NoResultFound as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
+    except tasks_qr.TreeLimitError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc)
+        )
+    await read_coalescer.invalidate(user.id)
+    return {"moved": moved}
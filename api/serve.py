@@ -0,0 +1,80 @@
+import argparse
+import logging
+import sys
+
+import uvicorn
+
+from api.core.config import settings
+from api.metrics import prepare_multiprocess_dir
+
+
+def serve(workers: int, host: str, port: int) -> None:
+    """
+    Run the API in one or more worker processes.
+
+    With several workers, uvicorn spawns fresh interpreters and
+    restarts the ones that die. Each worker creates its own database
+    and Redis connection pools in the lifespan of the application and
+    closes them on shutdown. On SIGTERM or SIGINT the workers stop
+    accepting connections and finish running requests within
+    `ServerSettings.graceful_shutdown_timeout` seconds. The workers
+    share their Prometheus metrics through files in
+    `PROMETHEUS_MULTIPROC_DIR`.
+
+    Parameters
+    ----------
+    workers : int
+        The number of worker processes.
+    host : str
+        The address the server binds to.
+    port : int
+        The port the server listens on.
+    """
+    if workers > 1:
+        prepare_multiprocess_dir()
+    uvicorn.run(
+        "api.main:create_app",
+        factory=True,
+        host=host,
+        port=port,
+        workers=workers,
+        backlog=settings.server.backlog,
+        timeout_keep_alive=settings.server.keep_alive_timeout,
+        timeout_graceful_shutdown=settings.server.graceful_shutdown_timeout,
+        proxy_headers=True,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the API server.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="the number of worker processes",
+    )
+    parser.add_argument("--host", default=None, help="the address to bind to")
+    parser.add_argument("--port", type=int, default=None, help="the port to listen on")
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="print the import time and the startup phases instead of serving",
+    )
+    parser.add_argument(
+        "--import-budget-ms",
+        type=float,
+        default=None,
+        help="with --profile-startup, fail if importing api.main takes longer",
+    )
+    args = parser.parse_args()
+    if args.profile_startup:
+        from api.startup import profile_startup
+
+        sys.exit(profile_startup(import_budget_ms=args.import_budget_ms))
+
+    logging.basicConfig(level=logging.INFO)
+    serve(
+        workers=args.workers or settings.server.workers,
+        host=args.host or settings.server.host,
+        port=args.port or settings.server.port,
+    )
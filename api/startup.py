@@ -0,0 +1,280 @@
+import argparse
+import asyncio
+import logging
+import re
+import subprocess
+import sys
+import time
+from contextlib import AsyncExitStack, contextmanager
+from dataclasses import dataclass, field
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from api.core import schemas
+from api.core.config import get_settings, settings
+from api.core.lazy import resolve
+from api.db import tasks_qr, user_qr
+from api.db.dbhelper import db_helper
+from api.redis_client import RedisUnavailableError, redis, redis_cache
+from api.routers.auth.jwt_utils import (decode_jwt, encode_jwt,
+                                        load_private_key, load_public_key)
+
+logger = logging.getLogger(__name__)
+
+_IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+@contextmanager
+def _timed(timings: dict[str, float], phase: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = (time.perf_counter() - start) * 1000
+
+
+def initialize() -> dict[str, float]:
+    """
+    Do the work deferred from import time: load the settings and the
+    JWT keys, and create the database and Redis clients.
+
+    Called by the startup of the application, so a missing key or an
+    invalid setting stops the server before it accepts requests. No
+    connection is opened.
+
+    Returns
+    -------
+    dict[str, float]
+        The milliseconds spent in every phase.
+    """
+    timings = {}
+    with _timed(timings, "settings"):
+        get_settings()
+    with _timed(timings, "jwt_keys"):
+        load_private_key()
+        load_public_key()
+    with _timed(timings, "database"):
+        resolve(db_helper)
+    with _timed(timings, "redis"):
+        resolve(redis)
+        resolve(redis_cache)
+    return timings
+
+
+@dataclass
+class Readiness:
+    """
+    The cached health of the worker served to the health probes.
+
+    Attributes
+    ----------
+    ready : bool
+        Whether the worker has warmed up and is not shutting down.
+    warmup : dict[str, float]
+        The milliseconds spent in every warm-up phase.
+    error : str or None
+        The error of the last failed warm-up attempt.
+    """
+
+    ready: bool = False
+    warmup: dict[str, float] = field(default_factory=dict)
+    error: str | None = None
+
+    def snapshot(self) -> dict:
+        """
+        Return the status reported by the readiness probe.
+
+        Returns
+        -------
+        dict
+            The status, the warm-up timings and the last warm-up error.
+        """
+        return {
+            "status": "ready" if self.ready else "starting",
+            "warmup": self.warmup,
+            "error": self.error,
+        }
+
+
+readiness = Readiness()
+
+
+async def _open_connections(engine: AsyncEngine, count: int) -> None:
+    # The connections are held together, so the pool opens `count`
+    # of them instead of reusing one.
+    async with AsyncExitStack() as stack:
+        for _ in range(count):
+            connection = await stack.enter_async_context(engine.connect())
+            await connection.execute(text("SELECT 1"))
+
+
+async def warm_up() -> dict[str, float]:
+    """
+    Pay the costs of the first requests before the worker reports
+    ready.
+
+    Opens `ServerSettings.warmup_connections` connections in every
+    database pool, which also runs the type introspection of asyncpg,
+    runs the hot queries of `user_qr` and `tasks_qr` once to fill the
+    compiled and prepared statement caches, signs and verifies a token
+    and connects to Redis. An unavailable Redis does not fail the
+    warm-up, since the API has degraded modes for it.
+
+    Returns
+    -------
+    dict[str, float]
+        The milliseconds spent in every phase.
+    """
+    timings = {}
+    with _timed(timings, "jwt"):
+        token = await encode_jwt({"sub": 0, settings.auth_jwt.TOKEN_TIPE_FIELD: ""})
+        await decode_jwt(token)
+    with _timed(timings, "database_connections"):
+        count = settings.server.warmup_connections
+        await _open_connections(db_helper.engine, count)
+        for engine in db_helper.replicas.engines:
+            await _open_connections(engine, count)
+    with _timed(timings, "hot_queries"):
+        async with db_helper.get_session() as session:
+            await user_qr.get_user_by_id(session=session, id=0)
+            await user_qr.get_user_by_username(session=session, username="")
+            for status in schemas.TaskStatus:
+                await tasks_qr.get_tasks(session=session, user_id=0, status=status)
+    with _timed(timings, "redis"):
+        try:
+            await redis.ping()
+        except RedisUnavailableError:
+            logger.warning("Redis is unavailable during the warm-up")
+    return timings
+
+
+async def run_warm_up() -> None:
+    """
+    Warm up until it succeeds, then mark the worker as ready.
+    """
+    while True:
+        try:
+            readiness.warmup = await warm_up()
+        except Exception as exc:
+            readiness.error = repr(exc)
+            logger.exception("Warm-up failed")
+            await asyncio.sleep(settings.server.warmup_retry_interval)
+        else:
+            readiness.error = None
+            readiness.ready = True
+            logger.info(
+                "Warmed up in %.1f ms (%s)",
+                sum(readiness.warmup.values()),
+                ", ".join(
+                    f"{phase} {duration:.1f} ms"
+                    for phase, duration in readiness.warmup.items()
+                ),
+            )
+            return
+
+
+def measure_import_time(module: str = "api.main") -> tuple[float, list[tuple]]:
+    """
+    Import a module in a fresh interpreter with `-X importtime`.
+
+    Parameters
+    ----------
+    module : str, optional
+        The imported module. Defaults to "api.main".
+
+    Returns
+    -------
+    tuple[float, list[tuple]]
+        The cumulative import time of the module in milliseconds, and
+        the self time, cumulative time and name of every imported
+        top-level package, slowest first.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total = 0.0
+    packages = {}
+    for line in process.stderr.splitlines():
+        match = _IMPORT_TIME_LINE.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, _, name = match.groups()
+        if name == module:
+            total = int(cumulative_us) / 1000
+        top_level = name.partition(".")[0]
+        self_ms, cumulative_ms = packages.get(top_level, (0.0, 0.0))
+        packages[top_level] = (
+            self_ms + int(self_us) / 1000,
+            max(cumulative_ms, int(cumulative_us) / 1000),
+        )
+    ranking = sorted(
+        (
+            (self_ms, cumulative_ms, name)
+            for name, (self_ms, cumulative_ms) in packages.items()
+        ),
+        key=lambda package: package[0],
+        reverse=True,
+    )
+    return total, ranking
+
+
+def profile_startup(import_budget_ms: float | None = None, top: int = 15) -> int:
+    """
+    Print how long the application takes to import and to start.
+
+    Parameters
+    ----------
+    import_budget_ms : float, optional
+        The maximum import time of `api.main` in milliseconds.
+    top : int, optional
+        The number of slowest packages listed. Defaults to 15.
+
+    Returns
+    -------
+    int
+        The exit status: 1 if the import time exceeds the budget,
+        otherwise 0.
+    """
+    import_ms, packages = measure_import_time()
+    print(f"import api.main: {import_ms:.1f} ms")
+    print(f"{'self ms':>10} {'cumulative ms':>14}  package")
+    for self_ms, cumulative_ms, name in packages[:top]:
+        print(f"{self_ms:>10.1f} {cumulative_ms:>14.1f}  {name}")
+
+    from api.main import create_app
+
+    timings = {}
+    with _timed(timings, "create_app"):
+        create_app()
+    timings.update(initialize())
+    print("startup:")
+    for phase, duration in timings.items():
+        print(f"{duration:>10.1f} ms  {phase}")
+
+    if import_budget_ms is not None and import_ms > import_budget_ms:
+        print(f"import time exceeds the budget of {import_budget_ms:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the startup of the API.")
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="print the import time and the time of every startup phase",
+    )
+    parser.add_argument(
+        "--import-budget-ms",
+        type=float,
+        default=None,
+        help="fail if importing api.main takes longer",
+    )
+    args = parser.parse_args()
+    if not args.profile_startup:
+        parser.error("nothing to do, pass --profile-startup")
+    sys.exit(profile_startup(import_budget_ms=args.import_budget_ms))
@@ -0,0 +1,183 @@
+import codecs
+import csv
+import json
+from datetime import datetime, timedelta, timezone
+from typing import IO, Awaitable, Callable, Iterator
+
+from pydantic import ValidationError
+from sqlalchemy import delete
+
+from api.core import schemas
+from api.core.config import settings
+from api.core.models import TaskImport
+from api.db import tasks_qr
+from api.db.dbhelper import db_helper
+from api.db.read_coalescer import read_coalescer
+
+
+def iter_records(file: IO[bytes], file_format: str) -> Iterator[tuple[int, dict]]:
+    """
+    Read the records of an uploaded CSV or NDJSON file one by one.
+
+    Parameters
+    ----------
+    file : IO[bytes]
+        The binary file. Only one line is held in memory at a time.
+    file_format : str
+        "csv" with a header row, or "ndjson" with one JSON object
+        per line. Empty and missing CSV fields are left out, so their
+        defaults apply.
+
+    Yields
+    ------
+    tuple[int, dict]
+        The line number and the fields of each record. A line that is
+        not a JSON object yields an empty dict with the error under the
+        "__error__" key.
+    """
+    lines = codecs.iterdecode(file, "utf-8")
+    if file_format == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, {
+                field: value
+                for field, value in record.items()
+                if field is not None and value not in (None, "")
+            }
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            record = {"__error__": f"Invalid JSON: {exc}"}
+        if not isinstance(record, dict):
+            record = {"__error__": "Expected a JSON object"}
+        yield line_number, record
+
+
+async def import_tasks(
+    file: IO[bytes],
+    file_format: str,
+    user_id: int,
+    import_id: str | None = None,
+    on_progress: Callable[..., Awaitable] | None = None,
+) -> schemas.ImportReport:
+    """
+    Validate the records of a file against `TaskCreate` and load the
+    valid ones in chunks with COPY.
+
+    Every chunk is committed on its own and invalidates the shared
+    reads of the user. The progress of an import with an ID is saved
+    in the same transaction as the chunk, so an interrupted import is
+    resumed after the last committed chunk with its counts and errors.
+
+    Parameters
+    ----------
+    file : IO[bytes]
+        The binary CSV or NDJSON file.
+    file_format : str
+        "csv" or "ndjson".
+    user_id : int
+        The ID of the user to whom the tasks are assigned.
+    import_id : str, optional
+        The ID under which the progress is saved, usually that of the
+        import job. An import with the ID of an interrupted one resumes
+        it.
+    on_progress : Callable, optional
+        Coroutine function called after every committed chunk with the
+        keyword arguments `line`, `imported` and `failed`.
+
+    Returns
+    -------
+    ImportReport
+        The numbers of imported and failed rows, and the errors of the
+        first `JobSettings.import_max_errors` failed rows.
+    """
+    chunk_size = settings.jobs.import_chunk_size
+    max_errors = settings.jobs.import_max_errors
+    progress = None
+    if import_id is not None:
+        async with db_helper.get_session() as session:
+            progress = await session.get(TaskImport, import_id)
+    start_line = last_line = progress.line if progress else 0
+    imported = progress.imported if progress else 0
+    failed = progress.failed if progress else 0
+    errors = list(progress.errors) if progress else []
+    chunk = []
+
+    async def flush() -> None:
+        nonlocal imported
+        if chunk or import_id is not None:
+            async with db_helper.get_session() as session:
+                if chunk:
+                    imported += await tasks_qr.copy_tasks(session=session, rows=chunk)
+                if import_id is not None:
+                    await session.merge(
+                        TaskImport(
+                            id=import_id,
+                            line=last_line,
+                            imported=imported,
+                            failed=failed,
+                            errors=list(errors),
+                            updated_at=datetime.now(timezone.utc),
+                        )
+                    )
+                await session.commit()
+        if chunk:
+            chunk.clear()
+            await read_coalescer.invalidate(user_id)
+        if on_progress is not None:
+            await on_progress(line=last_line, imported=imported, failed=failed)
+
+    for line_number, record in iter_records(file, file_format):
+        if line_number <= start_line:
+            continue
+        last_line = line_number
+        error = record.pop("__error__", None)
+        if error is None:
+            try:
+                task = schemas.TaskCreate.model_validate(record)
+            except ValidationError as exc:
+                error = "; ".join(
+                    f"{'.'.join(map(str, detail['loc']))}: {detail['msg']}"
+                    for detail in exc.errors()
+                )
+        if error is not None:
+            failed += 1
+            if len(errors) < max_errors:
+                errors.append({"line": line_number, "error": error})
+            continue
+
+        chunk.append((task.title, task.description, task.status, task.tags, user_id))
+        if len(chunk) >= chunk_size:
+            await flush()
+    await flush()
+
+    return schemas.ImportReport(imported=imported, failed=failed, errors=errors)
+
+
+async def delete_stale_imports(older_than: float) -> int:
+    """
+    Delete the saved progress of the imports that were last updated
+    long ago.
+
+    Parameters
+    ----------
+    older_than : float
+        The age in seconds of the progress to delete.
+
+    Returns
+    -------
+    int
+        The number of deleted imports.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=older_than)
+    async with db_helper.get_session() as session:
+        result = await session.execute(
+            delete(TaskImport).where(TaskImport.updated_at < cutoff)
+        )
+        await session.commit()
+    return result.rowcount
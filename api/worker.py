@@ -0,0 +1,187 @@
+import argparse
+import asyncio
+import json
+import logging
+
+from aioredis import Redis
+
+from api.core.config import settings
+from api.db.dbhelper import db_helper
+from api.jobs.queue import (JOB_HANDLERS, JobContext, JobHandler, claim_job,
+                            finish_job, get_job, job_key, promote_due_jobs,
+                            queue_key)
+from api.redis_client import RedisUnavailableError, close_redis, redis
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    """
+    Runs jobs from the queue in a separate process.
+
+    Every job is claimed for `JobSettings.visibility_timeout` seconds
+    and the claim is renewed while the job runs. If the worker dies,
+    the job is handed to another worker once the claim expires. A
+    failed job is retried with exponential backoff until it runs out
+    of attempts.
+
+    Parameters
+    ----------
+    redis : Redis
+        The Redis connection with the queue.
+    concurrency : int
+        The number of jobs run at the same time.
+    """
+
+    def __init__(self, redis: Redis, concurrency: int) -> None:
+        self.redis = redis
+        self.concurrency = concurrency
+
+    async def run(self) -> None:
+        """
+        Run jobs until the worker is cancelled.
+        """
+        await asyncio.gather(
+            self._promote_due_jobs(),
+            *(self._consume() for _ in range(self.concurrency)),
+        )
+
+    async def _promote_due_jobs(self) -> None:
+        while True:
+            try:
+                await promote_due_jobs(self.redis)
+            except RedisUnavailableError:
+                await self._wait_for_redis()
+                continue
+            await asyncio.sleep(settings.jobs.poll_interval)
+
+    async def _consume(self) -> None:
+        while True:
+            try:
+                job_id = await claim_job(self.redis)
+                if job_id is None:
+                    await asyncio.sleep(settings.jobs.poll_interval)
+                    continue
+                await self.run_job(job_id)
+            except RedisUnavailableError:
+                # A job left in flight is retried after its visibility timeout.
+                await self._wait_for_redis()
+
+    async def _wait_for_redis(self) -> None:
+        logger.warning("Redis is unavailable, jobs are paused")
+        await asyncio.sleep(settings.redis_settings.circuit_breaker_reset_timeout)
+
+    async def _heartbeat(self, ctx: JobContext) -> None:
+        while True:
+            await asyncio.sleep(settings.jobs.visibility_timeout / 3)
+            await ctx.heartbeat()
+
+    async def run_job(self, job_id: str) -> None:
+        """
+        Run one attempt of a claimed job and record its outcome.
+
+        Parameters
+        ----------
+        job_id : str
+            The ID of the claimed job.
+        """
+        state = await get_job(self.redis, job_id)
+        if state is None:
+            await self.redis.zrem(queue_key("inflight"), job_id)
+            return
+        handler = JOB_HANDLERS.get(state["name"])
+        if handler is None:
+            await finish_job(
+                self.redis, job_id, "failed", error=f"Unknown job {state['name']!r}"
+            )
+            return
+
+        attempt = await self.redis.hincrby(job_key(job_id), "attempts", 1)
+        max_attempts = handler.max_attempts or settings.jobs.max_attempts
+        if attempt > max_attempts:
+            # The previous attempts were lost with their workers, which
+            # the job itself may have killed.
+            await finish_job(
+                self.redis,
+                job_id,
+                "failed",
+                error=f"The job did not finish in {max_attempts} attempts",
+            )
+            await self._clean_up(handler, job_id, state)
+            return
+        await self.redis.hset(job_key(job_id), "status", "running")
+        ctx = JobContext(
+            job_id=job_id,
+            attempt=attempt,
+            redis=self.redis,
+            progress=json.loads(state.get("progress") or "{}"),
+        )
+        heartbeat = asyncio.create_task(self._heartbeat(ctx))
+        try:
+            result = await handler.func(ctx, **json.loads(state["payload"]))
+        except asyncio.CancelledError:
+            await self._stop_heartbeat(heartbeat)
+            await finish_job(self.redis, job_id, "queued", retry_in=0)
+            raise
+        except Exception as exc:
+            await self._stop_heartbeat(heartbeat)
+            logger.exception("Job %s (%s) failed", job_id, state["name"])
+            if attempt < max_attempts:
+                retry_in = min(
+                    settings.jobs.retry_backoff * 2 ** (attempt - 1),
+                    settings.jobs.retry_backoff_max,
+                )
+                await finish_job(
+                    self.redis, job_id, "retrying", error=repr(exc), retry_in=retry_in
+                )
+            else:
+                await finish_job(self.redis, job_id, "failed", error=repr(exc))
+                await self._clean_up(handler, job_id, state)
+        else:
+            await self._stop_heartbeat(heartbeat)
+            await finish_job(self.redis, job_id, "succeeded", result=result)
+
+    @staticmethod
+    async def _clean_up(handler: JobHandler, job_id: str, state: dict) -> None:
+        if handler.on_failure is None:
+            return
+        try:
+            await handler.on_failure(**json.loads(state["payload"]))
+        except Exception:
+            logger.exception("Clean-up of job %s (%s) failed", job_id, state["name"])
+
+    @staticmethod
+    async def _stop_heartbeat(heartbeat: asyncio.Task) -> None:
+        # The job is released only after the last heartbeat has ended,
+        # so a late one cannot put it back in flight to be run again.
+        heartbeat.cancel()
+        await asyncio.wait([heartbeat])
+
+
+async def main(concurrency: int) -> None:
+    """
+    Run a worker until it is interrupted.
+
+    Parameters
+    ----------
+    concurrency : int
+        The number of jobs run at the same time.
+    """
+    try:
+        await Worker(redis=redis, concurrency=concurrency).run()
+    finally:
+        await db_helper.dispose()
+        await close_redis(redis)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run background jobs.")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.jobs.concurrency,
+        help="the number of jobs run at the same time",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(args.concurrency))
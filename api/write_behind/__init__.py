@@ -0,0 +1,22 @@
+"""
+Package 'write_behind'.
+
+Components of the package.
+1. The 'producer' module contains functions for appending task
+    writes to the Redis Stream and merging the pending writes
+    into reads.
+2. The 'worker' module contains the consumer group worker that
+    applies the writes to the database.
+3. The '__main__' module starts the worker with
+    `python -m api.write_behind`.
+"""
+
+__all__ = (
+    "enqueue_task_write",
+    "merge_pending_writes",
+    "pending_task_writes",
+    "task_order_key",
+)
+
+from .producer import (enqueue_task_write, merge_pending_writes,
+                       pending_task_writes, task_order_key)
@@ -0,0 +1,23 @@
+import asyncio
+import logging
+
+from api.db.dbhelper import db_helper
+from api.redis_client import close_redis, redis
+from api.write_behind.worker import WriteBehindWorker
+
+
+async def main() -> None:
+    """
+    Run a write-behind worker until it is interrupted.
+    """
+    worker = WriteBehindWorker(redis=redis, db_helper=db_helper)
+    try:
+        await worker.run()
+    finally:
+        await db_helper.dispose()
+        await close_redis(redis)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,179 @@
+import json
+import time
+import uuid
+
+from aioredis import Redis
+
+from api.core.config import settings
+
+
+def pending_key(user_id: int) -> str:
+    """
+    Return the key of the hash with the user's pending writes.
+
+    Parameters
+    ----------
+    user_id : int
+        The ID of the user.
+
+    Returns
+    -------
+    str
+        The Redis key of the hash.
+    """
+    return f"{settings.write_behind.pending_key_prefix}{user_id}"
+
+
+async def enqueue_task_write(
+    redis: Redis,
+    op: str,
+    user_id: int,
+    task_id: int | None = None,
+    data: dict | None = None,
+) -> str:
+    """
+    Append a task write to the stream and remember it as pending
+    for the user.
+
+    Parameters
+    ----------
+    redis : Redis
+        The Redis connection.
+    op : str
+        The operation: "create", "update" or "delete".
+    user_id : int
+        The ID of the user who makes the write.
+    task_id : int, optional
+        The ID of the updated or deleted task.
+    data : dict, optional
+        The validated fields of the created or updated task.
+
+    Returns
+    -------
+    str
+        The ID of the write.
+    """
+    write_id = uuid.uuid4().hex
+    write = {
+        "op": op,
+        "task_id": task_id,
+        "data": data or {},
+        "queued_at": time.time(),
+    }
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.xadd(
+            settings.write_behind.stream,
+            {
+                "write_id": write_id,
+                "user_id": user_id,
+                "write": json.dumps(write),
+            },
+        )
+        pipe.hset(pending_key(user_id), write_id, json.dumps(write))
+        await pipe.execute()
+    return write_id
+
+
+async def pending_task_writes(redis: Redis, user_id: int) -> list[dict]:
+    """
+    Return the user's writes that are not applied yet, oldest first.
+
+    Parameters
+    ----------
+    redis : Redis
+        The Redis connection.
+    user_id : int
+        The ID of the user.
+
+    Returns
+    -------
+    list[dict]
+        The pending writes.
+    """
+    writes = await redis.hvals(pending_key(user_id))
+    return sorted(map(json.loads, writes), key=lambda write: write["queued_at"])
+
+
+def task_order_key(task: dict) -> tuple:
+    """
+    Return the key that sorts tasks in the order they are listed in.
+
+    Parameters
+    ----------
+    task : dict
+        A task with its "position" and "id". Archived tasks have no
+        position.
+
+    Returns
+    -------
+    tuple
+        Tasks by position and ID, then archived tasks by ID.
+    """
+    return (task["position"] is None, task["position"] or "", task["id"])
+
+
+def merge_pending_writes(
+    tasks: list[dict],
+    pending_writes: list[dict],
+    status: str,
+    tags_all: list[str] | None = None,
+    tags_any: list[str] | None = None,
+    include_created: bool = True,
+    updated: list[dict] | None = None,
+) -> list[dict]:
+    """
+    Apply the pending writes to a list of tasks read from the database.
+
+    The status and tag filters are applied after the writes, so a
+    pending update can move a task out of the list or into it.
+
+    Parameters
+    ----------
+    tasks : list[dict]
+        The tasks read from the database in the order of
+        `task_order_key`. Each one has an "id" key.
+    pending_writes : list[dict]
+        The pending writes returned by `pending_task_writes`.
+    status : str
+        The status the listed tasks are filtered by.
+    tags_all : list[str], optional
+        The tags all listed tasks have.
+    tags_any : list[str], optional
+        The tags of which every listed task has at least one.
+    include_created : bool, optional
+        Whether the created tasks are appended, which is only done on
+        the last page of the tasks. Defaults to True.
+    updated : list[dict], optional
+        The tasks of the same page that pending updates refer to but
+        that are not in `tasks` because they do not match the filters
+        yet, read without the filters.
+
+    Returns
+    -------
+    list[dict]
+        The tasks as they will be once the pending writes are applied.
+    """
+    tasks_by_id = {task["id"]: task for task in (*tasks, *(updated or ()))}
+    created = []
+    for write in pending_writes:
+        if write["op"] == "create":
+            if include_created:
+                created.append({"id": None, **write["data"]})
+        elif write["op"] == "update" and write["task_id"] in tasks_by_id:
+            task = tasks_by_id[write["task_id"]]
+            task.update(
+                {
+                    field: value
+                    for field, value in write["data"].items()
+                    if value is not None
+                }
+            )
+        elif write["op"] == "delete":
+            tasks_by_id.pop(write["task_id"], None)
+    return [
+        task
+        for task in (*sorted(tasks_by_id.values(), key=task_order_key), *created)
+        if task["status"] == status
+        and set(tags_all or ()).issubset(task.get("tags", ()))
+        and (not tags_any or not set(tags_any).isdisjoint(task.get("tags", ())))
+    ]
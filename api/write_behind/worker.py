@@ -0,0 +1,330 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta, timezone
+
+from aioredis import Redis
+from aioredis.exceptions import ResponseError
+from sqlalchemy import delete, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.core.config import settings
+from api.core.models import AppliedTaskWrite, Task
+from api.db.db_queries.tasks_qr import assign_positions
+from api.db.dbhelper import DataBaseHelper
+from api.db.read_coalescer import read_coalescer
+from api.redis_client import RedisUnavailableError
+from api.write_behind.producer import pending_key
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two deletions of the old IDs of applied writes.
+PRUNE_INTERVAL = 3600
+
+
+def entry_order(entry_id: str) -> tuple[int, int]:
+    """
+    Return the key that orders stream entries by their IDs.
+
+    Parameters
+    ----------
+    entry_id : str
+        The ID of the stream entry, "<milliseconds>-<sequence>".
+
+    Returns
+    -------
+    tuple[int, int]
+        The milliseconds and the sequence number.
+    """
+    milliseconds, _, sequence = entry_id.partition("-")
+    return int(milliseconds), int(sequence or 0)
+
+
+class WriteBehindWorker:
+    """
+    Consumer group worker that applies task writes from the Redis
+    Stream to the database.
+
+    Writes are read in batches and applied in one transaction. If the
+    transaction fails, the writes of the batch are applied one by one.
+    A write that still fails stays unacknowledged and is retried after
+    `retry_idle_ms`, possibly by another worker. After `max_retries`
+    deliveries it is moved to the dead-letter stream.
+
+    Every applied write is recorded in the same transaction, so a write
+    delivered again after its acknowledgement was lost is not applied
+    twice, and a retried update or delete of a task that a newer write
+    has already changed is dropped. Updates and deletes only change the
+    tasks of the user who queued them.
+
+    Parameters
+    ----------
+    redis : Redis
+        The Redis connection.
+    db_helper : DataBaseHelper
+        The helper whose sessions apply the writes.
+    consumer : str, optional
+        The name of the consumer in the group. Defaults to the host
+        name and the process ID.
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        db_helper: DataBaseHelper,
+        consumer: str | None = None,
+    ) -> None:
+        self.redis = redis
+        self.db_helper = db_helper
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.settings = settings.write_behind
+        self._pruned_at = 0.0
+
+    async def ensure_group(self) -> None:
+        """
+        Create the stream and the consumer group if they do not exist.
+        """
+        try:
+            await self.redis.xgroup_create(
+                self.settings.stream, self.settings.group, id="0", mkstream=True
+            )
+        except ResponseError as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+
+    async def run(self) -> None:
+        """
+        Apply writes from the stream until the worker is cancelled.
+        """
+        await self.ensure_group()
+        while True:
+            try:
+                if time.monotonic() - self._pruned_at > PRUNE_INTERVAL:
+                    await self.prune_applied()
+                await self.retry_stale()
+                response = await self.redis.xreadgroup(
+                    self.settings.group,
+                    self.consumer,
+                    {self.settings.stream: ">"},
+                    count=self.settings.batch_size,
+                    block=self.settings.block_ms,
+                )
+                for _, entries in response:
+                    await self.apply(entries)
+            except RedisUnavailableError:
+                # Unacknowledged writes are retried once Redis is back.
+                logger.warning("Redis is unavailable, task writes are paused")
+                await asyncio.sleep(
+                    settings.redis_settings.circuit_breaker_reset_timeout
+                )
+
+    async def retry_stale(self) -> None:
+        """
+        Claim the writes that stayed unacknowledged for `retry_idle_ms`,
+        retry them and move those delivered too many times to the
+        dead-letter stream.
+        """
+        pending = await self.redis.xpending_range(
+            self.settings.stream,
+            self.settings.group,
+            min="-",
+            max="+",
+            count=self.settings.batch_size,
+        )
+        stale = [
+            entry
+            for entry in pending
+            if entry["time_since_delivered"] >= self.settings.retry_idle_ms
+        ]
+        if not stale:
+            return
+        entries = await self.redis.xclaim(
+            self.settings.stream,
+            self.settings.group,
+            self.consumer,
+            self.settings.retry_idle_ms,
+            [entry["message_id"] for entry in stale],
+        )
+        deliveries = {entry["message_id"]: entry["times_delivered"] for entry in stale}
+        retry = []
+        for entry_id, fields in entries:
+            if fields is None:
+                continue
+            if deliveries.get(entry_id, 0) >= self.settings.max_retries:
+                await self.dead_letter(entry_id, fields)
+            else:
+                retry.append((entry_id, fields))
+        if retry:
+            await self.apply(retry)
+
+    async def apply(self, entries: list[tuple[str, dict]]) -> None:
+        """
+        Apply a batch of writes, invalidate the shared reads of their
+        users and acknowledge the applied writes.
+
+        Parameters
+        ----------
+        entries : list[tuple[str, dict]]
+            The stream entries with the writes.
+        """
+        try:
+            async with self.db_helper.get_session() as session:
+                await self._apply_writes(session, entries)
+                await session.commit()
+        except Exception:
+            logger.exception("Batch of %d task writes failed", len(entries))
+            if len(entries) > 1:
+                for entry in entries:
+                    await self.apply([entry])
+            return
+        for user_id in {fields["user_id"] for _, fields in entries}:
+            await read_coalescer.invalidate(int(user_id))
+        await self.acknowledge(entries)
+
+    async def _apply_writes(
+        self,
+        session: AsyncSession,
+        entries: list[tuple[str, dict]],
+    ) -> None:
+        writes = [
+            (
+                entry_id,
+                fields["write_id"],
+                int(fields["user_id"]),
+                json.loads(fields["write"]),
+            )
+            for entry_id, fields in entries
+        ]
+        task_ids = {
+            write["task_id"] for *_, write in writes if write["task_id"] is not None
+        }
+        result = await session.execute(
+            select(
+                AppliedTaskWrite.write_id,
+                AppliedTaskWrite.task_id,
+                AppliedTaskWrite.entry_id,
+            ).where(
+                or_(
+                    AppliedTaskWrite.write_id.in_(
+                        [write_id for _, write_id, _, _ in writes]
+                    ),
+                    AppliedTaskWrite.task_id.in_(task_ids),
+                )
+            )
+        )
+        applied = set()
+        latest: dict[int, tuple[int, int]] = {}
+        for write_id, task_id, entry_id in result:
+            applied.add(write_id)
+            if task_id is not None:
+                latest[task_id] = max(
+                    latest.get(task_id, (0, 0)), entry_order(entry_id)
+                )
+
+        fresh = []
+        recorded = []
+        for entry_id, write_id, user_id, write in writes:
+            if write_id in applied:
+                # Applied before, but its acknowledgement was lost.
+                continue
+            if entry_order(entry_id) < latest.get(write["task_id"], (0, 0)):
+                logger.warning("Task write %s is superseded by a newer one", entry_id)
+            else:
+                fresh.append((user_id, write))
+            applied.add(write_id)
+            recorded.append(
+                {
+                    "write_id": write_id,
+                    "entry_id": entry_id,
+                    "task_id": write["task_id"],
+                }
+            )
+        if recorded:
+            await session.execute(insert(AppliedTaskWrite), recorded)
+
+        created = [
+            {**write["data"], "user_id": user_id}
+            for user_id, write in fresh
+            if write["op"] == "create"
+        ]
+        if created:
+            await session.execute(
+                insert(Task), await assign_positions(session, created)
+            )
+        for user_id, write in fresh:
+            if write["op"] == "update":
+                values = {
+                    field: value
+                    for field, value in write["data"].items()
+                    if value is not None
+                }
+                await session.execute(
+                    update(Task)
+                    .where(Task.id == write["task_id"], Task.user_id == user_id)
+                    .values(**values)
+                )
+            elif write["op"] == "delete":
+                await session.execute(
+                    delete(Task).where(
+                        Task.id == write["task_id"], Task.user_id == user_id
+                    )
+                )
+
+    async def prune_applied(self) -> None:
+        """
+        Delete the IDs of writes applied longer than
+        `applied_retention_hours` ago.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(
+            hours=self.settings.applied_retention_hours
+        )
+        async with self.db_helper.get_session() as session:
+            await session.execute(
+                delete(AppliedTaskWrite).where(AppliedTaskWrite.applied_at < cutoff)
+            )
+            await session.commit()
+        self._pruned_at = time.monotonic()
+
+    async def acknowledge(self, entries: list[tuple[str, dict]]) -> None:
+        """
+        Acknowledge applied writes and remove them from the pending
+        writes of their users.
+
+        Parameters
+        ----------
+        entries : list[tuple[str, dict]]
+            The stream entries with the applied writes.
+        """
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.xack(
+                self.settings.stream,
+                self.settings.group,
+                *(entry_id for entry_id, _ in entries),
+            )
+            for _, fields in entries:
+                pipe.hdel(pending_key(fields["user_id"]), fields["write_id"])
+            await pipe.execute()
+
+    async def dead_letter(self, entry_id: str, fields: dict) -> None:
+        """
+        Move a write that failed too many times to the dead-letter stream.
+
+        Parameters
+        ----------
+        entry_id : str
+            The ID of the stream entry.
+        fields : dict
+            The fields of the stream entry.
+        """
+        logger.error("Task write %s moved to the dead-letter stream", entry_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.xadd(
+                self.settings.dead_letter_stream,
+                {**fields, "entry_id": entry_id},
+            )
+            pipe.xack(self.settings.stream, self.settings.group, entry_id)
+            pipe.hdel(pending_key(fields["user_id"]), fields["write_id"])
+            await pipe.execute()
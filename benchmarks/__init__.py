@@ -0,0 +1,19 @@
+"""
+Package 'benchmarks'.
+
+Benchmarks of the API endpoints. The application is driven in process
+through an ASGI transport, so the results cover routing, validation,
+the database and Redis, but not the network and the server.
+
+Components of the package:
+1. The 'harness' module runs scenarios with a fixed concurrency,
+    summarizes the latencies, stores the results as JSON and compares
+    them with a baseline.
+2. The 'dataset' module creates the schema and seeds users and tasks.
+3. The 'scenarios' module contains the requests of every benchmarked
+    endpoint.
+4. The '__main__' module runs the benchmarks with
+    `python -m benchmarks`.
+5. The 'micro' module compares single optimizations with and without
+    them, with `python -m benchmarks.micro`.
+"""
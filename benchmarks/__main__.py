@@ -0,0 +1,231 @@
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import httpx
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from api.core import schemas
+from api.core.config import settings
+from api.core.lazy import override, resolve
+from api.db.dbhelper import DataBaseHelper, db_helper
+from api.redis_client import create_redis, redis, redis_breaker
+from api.routers.auth.auth_helpers import (create_access_token,
+                                           create_refresh_token)
+from api.startup import readiness
+from benchmarks.dataset import reset_schema, seed
+from benchmarks.harness import compare, drive, format_table, write_results
+from benchmarks.scenarios import POSTGRESQL_ONLY, SCENARIOS
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def ensure_jwt_keys() -> None:
+    """
+    Generate a temporary key pair if the configured JWT keys do not
+    exist, so the benchmark runs on a fresh checkout.
+    """
+    auth_jwt = settings.auth_jwt
+    if auth_jwt.private_key.exists() and auth_jwt.public_key_path.exists():
+        return
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    directory = Path(tempfile.mkdtemp(prefix="bench-certs-"))
+    auth_jwt.private_key = directory / "jwt-private.pem"
+    auth_jwt.public_key_path = directory / "jwt-public.pem"
+    auth_jwt.private_key.write_bytes(
+        key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    )
+    auth_jwt.public_key_path.write_bytes(
+        key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+    )
+
+
+def git_commit() -> str | None:
+    """
+    Return the commit of the benchmarked tree, if it is a git checkout.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace) -> int:
+    """
+    Seed the database, run the scenarios against the application in
+    process and store the results.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        The command line arguments.
+
+    Returns
+    -------
+    int
+        The exit status: 1 if a scenario regressed against the
+        baseline, otherwise 0.
+    """
+    ensure_jwt_keys()
+    engine_options = (
+        {
+            "statement_timeout": settings.db_settings.statement_timeout,
+            **settings.db_settings.engine_options(),
+        }
+        if args.database_url.startswith("postgresql")
+        else {}
+    )
+    override(db_helper, DataBaseHelper(url=args.database_url, **engine_options))
+    if args.fakeredis:
+        from fakeredis.aioredis import FakeRedis
+
+        override(redis, FakeRedis(decode_responses=True))
+    else:
+        override(
+            redis,
+            create_redis(
+                args.redis_url or settings.redis_settings.redis_url,
+                breaker=resolve(redis_breaker),
+            ),
+        )
+
+    print(f"Seeding {args.users} users with {args.tasks_per_user} tasks each")
+    await reset_schema(db_helper)
+    dataset = await seed(db_helper, args.users, args.tasks_per_user)
+    for user_id, username in zip(dataset.user_ids, dataset.usernames):
+        user = schemas.UserSchema(id=user_id, username=username)
+        refresh_token = await create_refresh_token(user)
+        await redis.set(
+            f"refresh_token_{user_id}",
+            refresh_token,
+            ex=timedelta(days=settings.auth_jwt.refresh_token_expire_days),
+        )
+        dataset.access_tokens.append(await create_access_token(user))
+        dataset.refresh_tokens.append(refresh_token)
+
+    from api.main import app
+
+    run_id = uuid.uuid4().hex[:8]
+    results = []
+    async with app.router.lifespan_context(app):
+        deadline = time.monotonic() + args.warmup_timeout
+        while not readiness.ready and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark"
+        ) as client:
+            default_scenarios = [
+                name
+                for name in SCENARIOS
+                if name not in POSTGRESQL_ONLY
+                or db_helper.engine.dialect.name == "postgresql"
+            ]
+            for name in args.scenario or default_scenarios:
+                requests = args.requests
+                if name == "delete_task":
+                    requests = min(requests, len(dataset.task_ids))
+                send = SCENARIOS[name](client, dataset, run_id)
+                result = await drive(name, requests, args.concurrency, send)
+                print(f"{name}: {requests} requests in {result.duration:.2f} s")
+                results.append(result)
+
+    meta = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "database": db_helper.engine.dialect.name,
+        "redis": "fakeredis" if args.fakeredis else "redis",
+        "users": args.users,
+        "tasks_per_user": args.tasks_per_user,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+    }
+    output = args.output or RESULTS_DIR / f"{meta['timestamp'][:19]}.json"
+    document = write_results(Path(output), meta, results)
+    print(format_table(document))
+    print(f"Results stored in {output}")
+
+    if args.baseline is None:
+        return 0
+    baseline = json.loads(Path(args.baseline).read_text())
+    regressions = compare(document, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the API endpoints in process.",
+    )
+    parser.add_argument(
+        "--database-url",
+        required=True,
+        help="the database to benchmark against; all its tables are dropped",
+    )
+    parser.add_argument(
+        "--redis-url",
+        default=None,
+        help="the Redis server, defaults to RedisSettings.redis_url",
+    )
+    parser.add_argument(
+        "--fakeredis",
+        action="store_true",
+        help="use an in-process fakeredis instead of a Redis server",
+    )
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--tasks-per-user", type=int, default=100)
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=1000,
+        help="the number of requests of every scenario",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=32,
+        help="the number of requests in flight",
+    )
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=list(SCENARIOS),
+        help="run only this scenario, can be repeated",
+    )
+    parser.add_argument("--warmup-timeout", type=float, default=60)
+    parser.add_argument("--output", default=None, help="the results JSON file")
+    parser.add_argument(
+        "--baseline",
+        default=None,
+        help="a results JSON file to compare against",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=10,
+        help="the tolerated regression against the baseline in percent",
+    )
+    sys.exit(asyncio.run(run(parser.parse_args())))
@@ -0,0 +1,142 @@
+from dataclasses import dataclass, field
+
+import bcrypt
+from sqlalchemy import insert, select
+
+from api.core.models import Base, Task, User
+from api.db.dbhelper import DataBaseHelper
+from api.db.fractional_index import keys_after
+
+PASSWORD = "Bench#Pass1"
+TAGS = ("work", "home", "urgent", "errand", "idea", "health", "finance", "travel")
+
+
+def task_tags(number: int) -> list[str]:
+    """
+    Return the tags of a seeded task.
+
+    Every task has one of `TAGS` in turn, and every fifth task is also
+    "urgent", so the tag filters match from 1/40 to about 1/3 of the
+    tasks.
+
+    Parameters
+    ----------
+    number : int
+        The number of the task among the tasks of its user.
+
+    Returns
+    -------
+    list[str]
+        The tags.
+    """
+    tags = [TAGS[number % len(TAGS)]]
+    if number % 5 == 0 and "urgent" not in tags:
+        tags.append("urgent")
+    return tags
+
+
+@dataclass
+class Dataset:
+    """
+    The seeded users and tasks the scenarios work on.
+
+    Attributes
+    ----------
+    user_ids : list[int]
+        The IDs of the seeded users.
+    usernames : list[str]
+        The names of the seeded users, all with the password `PASSWORD`.
+    task_ids : list[int]
+        The IDs of the seeded tasks.
+    access_tokens : list[str]
+        An access token of every seeded user.
+    refresh_tokens : list[str]
+        A refresh token of every seeded user, stored in Redis as by a
+        login.
+    """
+
+    user_ids: list[int]
+    usernames: list[str]
+    task_ids: list[int]
+    access_tokens: list[str] = field(default_factory=list)
+    refresh_tokens: list[str] = field(default_factory=list)
+
+
+async def reset_schema(db_helper: DataBaseHelper) -> None:
+    """
+    Drop and create all tables of the benchmark database.
+
+    Parameters
+    ----------
+    db_helper : DataBaseHelper
+        The helper of the benchmark database.
+    """
+    async with db_helper.engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+
+
+async def seed(
+    db_helper: DataBaseHelper,
+    users: int,
+    tasks_per_user: int,
+    chunk_size: int = 10000,
+) -> Dataset:
+    """
+    Insert the users and tasks of the benchmark.
+
+    All users share one bcrypt hash, so seeding does not pay for
+    hashing every password.
+
+    Parameters
+    ----------
+    db_helper : DataBaseHelper
+        The helper of the benchmark database.
+    users : int
+        The number of users.
+    tasks_per_user : int
+        The number of tasks of every user, half of them completed,
+        tagged by `task_tags`.
+    chunk_size : int, optional
+        The number of rows inserted by one statement. Defaults to 10000.
+
+    Returns
+    -------
+    Dataset
+        The seeded users and tasks.
+    """
+    password_hash = bcrypt.hashpw(PASSWORD.encode("utf-8"), bcrypt.gensalt())
+    usernames = [f"bench_user_{number}" for number in range(users)]
+    async with db_helper.get_session() as session:
+        await session.execute(
+            insert(User),
+            [
+                {"username": username, "password_hash": password_hash}
+                for username in usernames
+            ],
+        )
+        user_ids = (await session.scalars(select(User.id).order_by(User.id))).all()
+        rows = []
+        for user_id in user_ids:
+            positions = keys_after(None)
+            for number in range(tasks_per_user):
+                rows.append(
+                    {
+                        "title": f"Task {number}",
+                        "description": f"Benchmark task {number} of user {user_id}",
+                        "status": "completed" if number % 2 else "in_progress",
+                        "tags": task_tags(number),
+                        "user_id": user_id,
+                        "position": next(positions),
+                    }
+                )
+                if len(rows) >= chunk_size:
+                    await session.execute(insert(Task), rows)
+                    rows.clear()
+        if rows:
+            await session.execute(insert(Task), rows)
+        task_ids = (await session.scalars(select(Task.id).order_by(Task.id))).all()
+        await session.commit()
+    return Dataset(
+        user_ids=list(user_ids), usernames=usernames, task_ids=list(task_ids)
+    )
@@ -0,0 +1,238 @@
+import asyncio
+import json
+import statistics
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import httpx
+
+
+@dataclass
+class ScenarioResult:
+    """
+    The measurements of one benchmark scenario.
+
+    Attributes
+    ----------
+    name : str
+        The name of the scenario.
+    requests : int
+        The number of sent requests.
+    concurrency : int
+        The number of requests in flight at the same time.
+    duration : float
+        Seconds from the first request to the last response.
+    errors : int
+        The number of responses with a status code outside 2xx and of
+        requests that raised an exception.
+    latencies : list[float]
+        The latency of every request in seconds.
+    """
+
+    name: str
+    requests: int
+    concurrency: int
+    duration: float = 0.0
+    errors: int = 0
+    latencies: list[float] = field(default_factory=list)
+
+    def summary(self) -> dict:
+        """
+        Summarize the measurements.
+
+        Returns
+        -------
+        dict
+            The number of requests and errors, the throughput in
+            requests per second, and the mean, p50, p95, p99 and
+            maximum latencies in milliseconds.
+        """
+        latencies = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "concurrency": self.concurrency,
+            "errors": self.errors,
+            "throughput": self.requests / self.duration if self.duration else 0.0,
+            "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+        }
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """
+    Return a percentile by linear interpolation between the closest
+    ranks.
+
+    Parameters
+    ----------
+    sorted_values : list[float]
+        The values in ascending order.
+    q : float
+        The percentile between 0 and 100.
+
+    Returns
+    -------
+    float
+        The percentile, or 0 for no values.
+    """
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+    return sorted_values[lower] * (1 - fraction) + sorted_values[upper] * fraction
+
+
+async def drive(
+    name: str,
+    requests: int,
+    concurrency: int,
+    send: Callable[[int], Awaitable[httpx.Response]],
+) -> ScenarioResult:
+    """
+    Send requests with a fixed number of them in flight and measure
+    every latency.
+
+    Parameters
+    ----------
+    name : str
+        The name of the scenario.
+    requests : int
+        The number of requests.
+    concurrency : int
+        The number of requests in flight at the same time.
+    send : Callable[[int], Awaitable[httpx.Response]]
+        Sends the request with the given sequence number.
+
+    Returns
+    -------
+    ScenarioResult
+        The measurements.
+    """
+    result = ScenarioResult(name=name, requests=requests, concurrency=concurrency)
+    numbers = iter(range(requests))
+
+    async def client() -> None:
+        for number in numbers:
+            start = time.perf_counter()
+            try:
+                response = await send(number)
+            except Exception:
+                result.errors += 1
+                continue
+            result.latencies.append(time.perf_counter() - start)
+            if not response.is_success:
+                result.errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    result.duration = time.perf_counter() - start
+    return result
+
+
+def write_results(path: Path, meta: dict, results: list[ScenarioResult]) -> dict:
+    """
+    Store the summaries of a run as JSON.
+
+    Parameters
+    ----------
+    path : Path
+        The output file. Its directory is created if needed.
+    meta : dict
+        The parameters of the run.
+    results : list[ScenarioResult]
+        The measurements of every scenario.
+
+    Returns
+    -------
+    dict
+        The stored document.
+    """
+    document = {
+        "meta": meta,
+        "scenarios": {result.name: result.summary() for result in results},
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(document, indent=2))
+    return document
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Find the scenarios that got slower than a baseline run.
+
+    A scenario regresses if its p95 or p99 latency grew, or its
+    throughput fell, by more than `threshold` percent, or if it has
+    errors while the baseline had none.
+
+    Parameters
+    ----------
+    current : dict
+        The results document of this run.
+    baseline : dict
+        The results document of the baseline run.
+    threshold : float
+        The tolerated change in percent.
+
+    Returns
+    -------
+    list[str]
+        A description of every regression.
+    """
+    regressions = []
+    limit = threshold / 100
+    for name, summary in current["scenarios"].items():
+        reference = baseline["scenarios"].get(name)
+        if reference is None:
+            continue
+        for metric in ("p95_ms", "p99_ms"):
+            if reference[metric] and summary[metric] > reference[metric] * (1 + limit):
+                regressions.append(
+                    f"{name}: {metric} {summary[metric]:.2f} > "
+                    f"{reference[metric]:.2f} + {threshold:g}%"
+                )
+        if reference["throughput"] and summary["throughput"] < reference[
+            "throughput"
+        ] * (1 - limit):
+            regressions.append(
+                f"{name}: throughput {summary['throughput']:.1f} < "
+                f"{reference['throughput']:.1f} - {threshold:g}%"
+            )
+        if summary["errors"] and not reference["errors"]:
+            regressions.append(f"{name}: {summary['errors']} errors")
+    return regressions
+
+
+def format_table(document: dict) -> str:
+    """
+    Render the summaries of a run as a text table.
+
+    Parameters
+    ----------
+    document : dict
+        The results document.
+
+    Returns
+    -------
+    str
+        One line per scenario.
+    """
+    width = max(map(len, ["scenario", *document["scenarios"]]))
+    lines = [
+        f"{'scenario':<{width}} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} "
+        f"{'p99 ms':>9} {'errors':>7}"
+    ]
+    for name, summary in document["scenarios"].items():
+        lines.append(
+            f"{name:<{width}} {summary['throughput']:>9.1f} "
+            f"{summary['p50_ms']:>9.2f} "
+            f"{summary['p95_ms']:>9.2f} {summary['p99_ms']:>9.2f} "
+            f"{summary['errors']:>7}"
+        )
+    return "\n".join(lines)
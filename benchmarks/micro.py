@@ -0,0 +1,309 @@
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from sqlalchemy import select
+
+from api.core import schemas
+from api.core.models import Task, User
+from api.db.db_metrics import Histogram, connection_hold_time
+from api.db.db_queries import tasks_qr, user_qr
+from api.db.dbhelper import DataBaseHelper
+from api.db.write_coalescer import TaskInsertCoalescer
+from benchmarks.dataset import Dataset, reset_schema, seed
+
+# A measurement of every variant: its name and its metrics.
+Results = list[tuple[str, dict[str, float]]]
+
+
+async def run_concurrently(
+    jobs: int, concurrency: int, job: Callable[[int], Awaitable[None]]
+) -> float:
+    """
+    Run jobs with a fixed number of them in flight.
+
+    Parameters
+    ----------
+    jobs : int
+        The number of jobs.
+    concurrency : int
+        The number of jobs running at the same time.
+    job : Callable[[int], Awaitable[None]]
+        Runs the job with the given sequence number.
+
+    Returns
+    -------
+    float
+        Seconds from the start of the first job to the end of the last.
+    """
+    numbers = iter(range(jobs))
+
+    async def worker() -> None:
+        for number in numbers:
+            await job(number)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start
+
+
+def _mean_ms(histogram: Histogram, count: int, total: float) -> float:
+    # The mean of the values observed since the histogram had `count`
+    # values summing to `total`.
+    observed = histogram.count - count
+    return (histogram.sum - total) / observed * 1000 if observed else 0.0
+
+
+async def release_connection(
+    db_helper: DataBaseHelper, dataset: Dataset, args: argparse.Namespace
+) -> Results:
+    """
+    Compare holding the connection of a request until its end with
+    returning it to the pool right after the last query.
+
+    Every request reads the tasks of a user and then spends
+    `--work-ms` on work that does not need the database, such as
+    serializing the response. The pool is smaller than the number of
+    requests in flight, as under load.
+    """
+    variants = {
+        "held until the end": tasks_qr.get_tasks.__wrapped__,
+        "released after the query": tasks_qr.get_tasks,
+    }
+    pool = db_helper.engine.pool
+    results = []
+    for name, get_tasks in variants.items():
+
+        async def request(number: int) -> None:
+            async with db_helper.get_session() as session:
+                await get_tasks(
+                    session=session,
+                    user_id=dataset.user_ids[number % len(dataset.user_ids)],
+                    status="in_progress",
+                )
+                await asyncio.sleep(args.work_ms / 1000)
+
+        hold = (connection_hold_time.count, connection_hold_time.sum)
+        wait = (pool.metrics.wait_time.count, pool.metrics.wait_time.sum)
+        duration = await run_concurrently(args.requests, args.concurrency, request)
+        results.append(
+            (
+                name,
+                {
+                    "req/s": args.requests / duration,
+                    "hold ms": _mean_ms(connection_hold_time, *hold),
+                    "wait ms": _mean_ms(pool.metrics.wait_time, *wait),
+                },
+            )
+        )
+    return results
+
+
+async def lambda_statements(
+    db_helper: DataBaseHelper, dataset: Dataset, args: argparse.Namespace
+) -> Results:
+    """
+    Compare the per-query cost of the user lookup and the task list
+    built as plain select() on every call with the lambda statements
+    they use.
+
+    The queries run one after another in one transaction, so the time
+    per query is mostly the Python overhead of building, compiling and
+    executing the statement.
+    """
+
+    async def select_user(session, id):
+        return await session.scalar(select(User).where(User.id == id))
+
+    async def select_tasks(session, user_id, status, limit):
+        stmt = (
+            select(
+                Task.id,
+                Task.title,
+                Task.description,
+                Task.status,
+                Task.tags,
+                Task.parent_id,
+                Task.position,
+            )
+            .where(Task.user_id == user_id, Task.status == status)
+            .order_by(Task.position, Task.id)
+            .limit(limit)
+        )
+        return list(await session.execute(stmt))
+
+    def user_lookup(get_user):
+        return lambda session, number: get_user(
+            session=session, id=dataset.user_ids[number % len(dataset.user_ids)]
+        )
+
+    def task_list(get_tasks):
+        return lambda session, number: get_tasks(
+            session=session,
+            user_id=dataset.user_ids[number % len(dataset.user_ids)],
+            status="in_progress",
+            limit=50,
+        )
+
+    variants = {
+        "user, select()": user_lookup(select_user),
+        "user, lambda_stmt()": user_lookup(user_qr.get_user_by_id.__wrapped__),
+        "tasks, select()": task_list(select_tasks),
+        "tasks, lambda_stmt()": task_list(tasks_qr.get_tasks.__wrapped__),
+    }
+    results = []
+    for name, query in variants.items():
+        async with db_helper.get_session() as session:
+            await query(session, 0)
+            start = time.perf_counter()
+            for number in range(args.requests):
+                await query(session, number)
+            duration = time.perf_counter() - start
+        results.append(
+            (
+                name,
+                {
+                    "queries/s": args.requests / duration,
+                    "us/query": duration / args.requests * 1e6,
+                },
+            )
+        )
+    return results
+
+
+async def insert_coalescing(
+    db_helper: DataBaseHelper, dataset: Dataset, args: argparse.Namespace
+) -> Results:
+    """
+    Compare the throughput of task inserts written one transaction
+    each with inserts coalesced by `TaskInsertCoalescer`, with 1, 10
+    and 100 concurrent writers.
+    """
+    coalescer = TaskInsertCoalescer(db_helper)
+
+    async def direct(user_id: int, task_data: schemas.TaskCreate) -> None:
+        async with db_helper.get_session() as session:
+            await tasks_qr.create_task(
+                session=session, user_id=user_id, task_data=task_data
+            )
+
+    results = []
+    for writers in (1, 10, 100):
+        for name, insert in (("direct", direct), ("coalesced", coalescer.insert)):
+
+            latency = Histogram()
+
+            async def write(number: int) -> None:
+                start = time.perf_counter()
+                await insert(
+                    dataset.user_ids[number % len(dataset.user_ids)],
+                    schemas.TaskCreate(title=f"Task {number}", description=""),
+                )
+                latency.observe(time.perf_counter() - start)
+
+            duration = await run_concurrently(args.requests, writers, write)
+            results.append(
+                (
+                    f"{name}, {writers} in flight",
+                    {
+                        "inserts/s": args.requests / duration,
+                        "mean ms": _mean_ms(latency, 0, 0.0),
+                    },
+                )
+            )
+    return results
+
+
+BENCHMARKS: dict[
+    str,
+    Callable[[DataBaseHelper, Dataset, argparse.Namespace], Awaitable[Results]],
+] = {
+    "release_connection": release_connection,
+    "lambda_statements": lambda_statements,
+    "insert_coalescing": insert_coalescing,
+}
+
+
+def format_results(name: str, results: Results) -> str:
+    """
+    Render the measurements of a benchmark as a text table.
+
+    Parameters
+    ----------
+    name : str
+        The name of the benchmark.
+    results : Results
+        The metrics of every variant.
+
+    Returns
+    -------
+    str
+        The name of the benchmark and one line per variant.
+    """
+    metrics = list(results[0][1])
+    width = max(len(variant) for variant, _ in results)
+    lines = [
+        name,
+        f"  {'':<{width}}" + "".join(f" {metric:>10}" for metric in metrics),
+    ]
+    for variant, values in results:
+        lines.append(
+            f"  {variant:<{width}}"
+            + "".join(f" {values[metric]:>10.2f}" for metric in metrics)
+        )
+    return "\n".join(lines)
+
+
+async def run(args: argparse.Namespace) -> None:
+    """
+    Seed the database and run the micro-benchmarks.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        The command line arguments.
+    """
+    db_helper = DataBaseHelper(
+        url=args.database_url,
+        pool_size=args.pool_size,
+        max_overflow=0,
+    )
+    try:
+        await reset_schema(db_helper)
+        dataset = await seed(db_helper, args.users, args.tasks_per_user)
+        for name in args.benchmark or list(BENCHMARKS):
+            print(
+                format_results(name, await BENCHMARKS[name](db_helper, dataset, args))
+            )
+    finally:
+        await db_helper.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark single optimizations with and without them.",
+    )
+    parser.add_argument(
+        "--database-url",
+        required=True,
+        help="the database to benchmark against; all its tables are dropped",
+    )
+    parser.add_argument(
+        "--benchmark",
+        action="append",
+        choices=list(BENCHMARKS),
+        help="run only this benchmark, can be repeated",
+    )
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--tasks-per-user", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--pool-size", type=int, default=5)
+    parser.add_argument(
+        "--work-ms",
+        type=float,
+        default=5,
+        help="the time a request spends after its query",
+    )
+    asyncio.run(run(parser.parse_args()))
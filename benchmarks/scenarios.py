@@ -0,0 +1,212 @@
+from typing import Awaitable, Callable
+
+import httpx
+
+from benchmarks.dataset import PASSWORD, Dataset
+
+Send = Callable[[int], Awaitable[httpx.Response]]
+
+# Consecutive requests of the duplicate-heavy scenario sent by the
+# same user, as several tabs and retries of one client would.
+DUPLICATES = 8
+# Tasks per page of the paginated scenarios and per bulk tag update.
+PAGE_SIZE = 50
+# The tag filters use the PostgreSQL array operators.
+POSTGRESQL_ONLY = {"list_tasks_tags_all", "list_tasks_tags_any", "tag_tasks"}
+
+
+def _bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def register(client: httpx.AsyncClient, dataset: Dataset, run_id: str) -> Send:
+    async def send(number: int) -> httpx.Response:
+        return await client.post(
+            "/api/v1/auth/register",
+            data={"username": f"bench_new_{run_id}_{number}", "password": PASSWORD},
+        )
+
+    return send
+
+
+def login(client: httpx.AsyncClient, dataset: Dataset, run_id: str) -> Send:
+    async def send(number: int) -> httpx.Response:
+        username = dataset.usernames[number % len(dataset.usernames)]
+        return await client.post(
+            "/api/v1/auth/login",
+            data={"username": username, "password": PASSWORD},
+        )
+
+    return send
+
+
+def refresh(client: httpx.AsyncClient, dataset: Dataset, run_id: str) -> Send:
+    async def send(number: int) -> httpx.Response:
+        token = dataset.refresh_tokens[number % len(dataset.refresh_tokens)]
+        return await client.post("/api/v1/auth/refresh", headers=_bearer(token))
+
+    return send
+
+
+def create_task(client: httpx.AsyncClient, dataset: Dataset, run_id: str) -> Send:
+    async def send(number: int) -> httpx.Response:
+        token = dataset.access_tokens[number % len(dataset.access_tokens)]
+        return await client.post(
+            "/api/v1/tasks/",
+            data={
+                "title": f"New task {number}",
+                "description": "Created by the benchmark",
+                "status": "in_progress",
+            },
+            headers=_bearer(token),
+        )
+
+    return send
+
+
+def list_tasks(client: httpx.AsyncClient, dataset: Dataset, run_id: str) -> Send:
+    async def send(number: int) -> httpx.Response:
+        token = dataset.access_tokens[number % len(dataset.access_tokens)]
+        return await client.get(
+            "/api/v1/tasks/",
+            params={"status_filter": "in_progress"},
+            headers=_bearer(token),
+        )
+
+    return send
+
+
+def list_tasks_duplicates(
+    client: httpx.AsyncClient, dataset: Dataset, run_id: str
+) -> Send:
+    async def send(number: int) -> httpx.Response:
+        tokens = dataset.access_tokens
+        token = tokens[number // DUPLICATES % len(tokens)]
+        return await client.get(
+            "/api/v1/tasks/",
+            params={"status_filter": "in_progress"},
+            headers=_bearer(token),
+        )
+
+    return send
+
+
+def list_tasks_tags_all(
+    client: httpx.AsyncClient, dataset: Dataset, run_id: str
+) -> Send:
+    async def send(number: int) -> httpx.Response:
+        token = dataset.access_tokens[number % len(dataset.access_tokens)]
+        return await client.get(
+            "/api/v1/tasks/",
+            params={
+                "status_filter": "in_progress",
+                "tags_all": ["work", "urgent"],
+                "limit": PAGE_SIZE,
+            },
+            headers=_bearer(token),
+        )
+
+    return send
+
+
+def list_tasks_tags_any(
+    client: httpx.AsyncClient, dataset: Dataset, run_id: str
+) -> Send:
+    async def send(number: int) -> httpx.Response:
+        token = dataset.access_tokens[number % len(dataset.access_tokens)]
+        return await client.get(
+            "/api/v1/tasks/",
+            params={
+                "status_filter": "completed",
+                "tags_any": ["idea", "travel"],
+                "limit": PAGE_SIZE,
+            },
+            headers=_bearer(token),
+        )
+
+    return send
+
+
+def tag_tasks(client: httpx.AsyncClient, dataset: Dataset, run_id: str) -> Send:
+    users = len(dataset.user_ids)
+    tasks_per_user = len(dataset.task_ids) // users
+
+    async def send(number: int) -> httpx.Response:
+        user = number % users
+        token = dataset.access_tokens[user]
+        # Every request of a user tags the next tasks of the user.
+        start = user * tasks_per_user + number // users * PAGE_SIZE % tasks_per_user
+        task_ids = dataset.task_ids[start : (user + 1) * tasks_per_user][:PAGE_SIZE]
+        return await client.patch(
+            "/api/v1/tasks/tags",
+            data={"task_ids": task_ids, "add": ["benchmark"], "remove": ["home"]},
+            headers=_bearer(token),
+        )
+
+    return send
+
+
+def update_task(client: httpx.AsyncClient, dataset: Dataset, run_id: str) -> Send:
+    async def send(number: int) -> httpx.Response:
+        token = dataset.access_tokens[number % len(dataset.access_tokens)]
+        return await client.put(
+            "/api/v1/tasks/id",
+            params={"id": dataset.task_ids[number % len(dataset.task_ids)]},
+            data={
+                "title": f"Updated task {number}",
+                "description": "Updated by the benchmark",
+                "status": "in_progress",
+            },
+            headers=_bearer(token),
+        )
+
+    return send
+
+
+def move_task(client: httpx.AsyncClient, dataset: Dataset, run_id: str) -> Send:
+    users = len(dataset.user_ids)
+    tasks_per_user = len(dataset.task_ids) // users
+
+    async def send(number: int) -> httpx.Response:
+        user = number % users
+        token = dataset.access_tokens[user]
+        # The tasks of every user are seeded together; every request
+        # moves another task of the user right after its first one.
+        first = user * tasks_per_user
+        task = first + 1 + number // users % (tasks_per_user - 1)
+        return await client.patch(
+            f"/api/v1/tasks/{dataset.task_ids[task]}/move",
+            data={"after_id": dataset.task_ids[first]},
+            headers=_bearer(token),
+        )
+
+    return send
+
+
+def delete_task(client: httpx.AsyncClient, dataset: Dataset, run_id: str) -> Send:
+    async def send(number: int) -> httpx.Response:
+        token = dataset.access_tokens[number % len(dataset.access_tokens)]
+        # Every request deletes another task, starting from the last one.
+        return await client.delete(
+            "/api/v1/tasks/id",
+            params={"id": dataset.task_ids[-1 - number]},
+            headers=_bearer(token),
+        )
+
+    return send
+
+
+SCENARIOS: dict[str, Callable[[httpx.AsyncClient, Dataset, str], Send]] = {
+    "register": register,
+    "login": login,
+    "refresh": refresh,
+    "create_task": create_task,
+    "list_tasks": list_tasks,
+    "list_tasks_duplicates": list_tasks_duplicates,
+    "list_tasks_tags_all": list_tasks_tags_all,
+    "list_tasks_tags_any": list_tasks_tags_any,
+    "tag_tasks": tag_tasks,
+    "update_task": update_task,
+    "move_task": move_task,
+    "delete_task": delete_task,
+}
@@ -0,0 +1,127 @@
+import os
+from pathlib import Path
+
+import httpx
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fakeredis.aioredis import FakeRedis
+
+# The settings are created on first use; the tests never connect to
+# the database and Redis they point at.
+os.environ.setdefault("DB_USERNAME", "test")
+os.environ.setdefault("DB_PASSWORD", "test")
+os.environ.setdefault("DB_NAME", "test")
+os.environ.setdefault("REDIS_PASSWORD", "test")
+os.environ.setdefault("REDIS_USER", "test")
+os.environ.setdefault("REDIS_USER_PASSWORD", "test")
+
+from api.core.config import settings  # noqa: E402
+from api.core.lazy import override  # noqa: E402
+from api.core.models import Base  # noqa: E402
+from api.db.dbhelper import DataBaseHelper, db_helper  # noqa: E402
+from api.redis_client import ClientSideCache, redis, redis_cache  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def make_database(tmp_path):
+    """
+    Create SQLite databases used by `db_helper` for the duration of a
+    test.
+
+    The returned function takes the file names of the primary and the
+    replicas and the other arguments of `DataBaseHelper`. The tables
+    are created in every database that can be opened.
+    """
+    helpers = []
+    previous = db_helper._instance
+
+    async def make(primary="primary.db", replicas=(), **options) -> DataBaseHelper:
+        helper = DataBaseHelper(
+            url=f"sqlite+aiosqlite:///{tmp_path / primary}",
+            replica_urls=[
+                f"sqlite+aiosqlite:///{tmp_path / name}" for name in replicas
+            ],
+            **options,
+        )
+        helpers.append(helper)
+        for engine in (helper.engine, *helper.replicas.engines):
+            if Path(engine.url.database).parent.exists():
+                async with engine.begin() as connection:
+                    await connection.run_sync(Base.metadata.create_all)
+        override(db_helper, helper)
+        return helper
+
+    yield make
+    override(db_helper, previous)
+    for helper in helpers:
+        await helper.dispose()
+
+
+@pytest.fixture(scope="session")
+def jwt_keys(tmp_path_factory):
+    """
+    Sign and verify the tokens with a key pair generated for the tests.
+    """
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    directory = tmp_path_factory.mktemp("certs")
+    settings.auth_jwt.private_key = directory / "jwt-private.pem"
+    settings.auth_jwt.public_key_path = directory / "jwt-public.pem"
+    settings.auth_jwt.private_key.write_bytes(
+        key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    )
+    settings.auth_jwt.public_key_path.write_bytes(
+        key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+    )
+
+
+@pytest.fixture
+def app_redis():
+    """
+    The Redis client of the application in `client`. Tests that need
+    another one override this fixture.
+    """
+    return FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+async def client(make_database, jwt_keys, app_redis):
+    """
+    An HTTP client of the application with an empty SQLite database
+    and `app_redis` as its Redis.
+
+    The lifespan of the application is not run, so no background tasks
+    are started and the client-side cache is not tracking.
+    """
+    from api.main import app
+
+    await make_database()
+    previous = redis._instance, redis_cache._instance
+    override(redis, app_redis)
+    override(
+        redis_cache,
+        ClientSideCache(
+            redis=app_redis,
+            url=settings.redis_settings.redis_url,
+            prefixes=settings.redis_settings.client_cache_prefixes,
+            max_keys=settings.redis_settings.client_cache_max_keys,
+            health_check_interval=settings.redis_settings.redis_health_check_interval,
+        ),
+    )
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+    override(redis, previous[0])
+    override(redis_cache, previous[1])
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from api.core.models import Task
+from api.db.archiver import archivable_tasks
+
+pytestmark = pytest.mark.anyio
+
+LONG_AGO = datetime.now(timezone.utc) - timedelta(days=365)
+
+
+def completed(id: int, parent_id: int | None = None, path: str = "") -> Task:
+    return Task(
+        id=id,
+        title=f"Task {id}",
+        description="",
+        status="completed",
+        user_id=1,
+        position=f"a{id}",
+        parent_id=parent_id,
+        path=path,
+        updated_at=LONG_AGO,
+    )
+
+
+async def test_only_top_level_tasks_without_subtasks_are_archived(make_database):
+    helper = await make_database()
+    async with helper.get_session() as session:
+        session.add_all(
+            [
+                completed(1),
+                # A completed parent with a completed leaf subtask.
+                completed(2),
+                completed(3, parent_id=2, path="2/"),
+            ]
+        )
+        await session.commit()
+
+        batch = archivable_tasks(datetime.now(timezone.utc), batch_size=10)
+
+        # The subtask would lose its parent in the archive, and the
+        # parent stays while it has subtasks.
+        assert list(await session.scalars(batch)) == [1]
@@ -0,0 +1,31 @@
+import pytest
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_exhausted_pool_counts_waits_and_timeouts(make_database):
+    helper = await make_database(pool_size=1, max_overflow=0, pool_timeout=0.1)
+    metrics = helper.engine.pool.metrics
+    # The tables were created through the same pool.
+    checkouts = metrics.wait_time.count
+
+    async with helper.engine.connect():
+        assert metrics.wait_time.count == checkouts + 1
+        assert metrics.timeouts == 0
+
+        with pytest.raises(PoolTimeoutError):
+            async with helper.engine.connect():
+                pass
+
+    assert metrics.timeouts == 1
+    assert metrics.wait_time.count == checkouts + 2
+    # The failed checkout waited for the whole pool_timeout.
+    assert metrics.wait_time.sum >= 0.1
+
+    snapshot = helper.engine.pool.snapshot()
+    assert snapshot["size"] == 1
+    assert snapshot["checked_out"] == 0
+    assert snapshot["timeouts"] == 1
+    assert snapshot["wait_time"]["count"] == checkouts + 2
+    assert snapshot["wait_time"]["buckets"]["+Inf"] == checkouts + 2
@@ -0,0 +1,142 @@
+from types import SimpleNamespace
+
+import pytest
+from fakeredis.aioredis import FakeRedis
+
+from api.core import schemas
+from api.core.deadline import start_deadline, stop_deadline
+from api.core.models import Task
+from api.db import tasks_qr
+from api.db.dbhelper import DataBaseHelper, _bound_by_deadline
+
+pytestmark = pytest.mark.anyio
+
+
+async def insert_task(engine, title: str, user_id: int) -> None:
+    async with engine.begin() as connection:
+        await connection.execute(
+            Task.__table__.insert().values(
+                title=title,
+                description="",
+                status="in_progress",
+                user_id=user_id,
+                position="a0",
+            )
+        )
+
+
+async def read_titles(helper: DataBaseHelper, user_id: int) -> list[str]:
+    async with helper.get_session() as session:
+        session.info["user_id"] = user_id
+        tasks = await tasks_qr.get_tasks(
+            session=session, user_id=user_id, status="in_progress"
+        )
+    return [task.title for task in tasks]
+
+
+async def write_task(helper: DataBaseHelper, user_id: int) -> None:
+    async with helper.get_session() as session:
+        session.info["user_id"] = user_id
+        await tasks_qr.create_task(
+            session=session,
+            user_id=user_id,
+            task_data=schemas.TaskCreate(title="written", description=""),
+        )
+
+
+@pytest.fixture
+async def replicated(make_database):
+    """
+    A primary and a replica that are not kept in sync, so every read
+    tells which of them served it.
+    """
+    helper = await make_database(replicas=["replica.db"], read_your_writes_window=60)
+    for user_id in (1, 2):
+        await insert_task(helper.engine, "primary", user_id)
+        await insert_task(helper.replicas.engines[0], "replica", user_id)
+    return helper
+
+
+async def test_reads_follow_the_writes_of_the_user(replicated):
+    assert await read_titles(replicated, user_id=1) == ["replica"]
+
+    await write_task(replicated, user_id=1)
+
+    # The write went to the primary, and the user now reads from it.
+    assert await read_titles(replicated, user_id=1) == ["primary", "written"]
+    # Other users keep reading from the replica.
+    assert await read_titles(replicated, user_id=2) == ["replica"]
+
+
+async def test_reads_go_back_to_the_replica_after_the_window(replicated):
+    replicated.read_your_writes_window = 0
+
+    await write_task(replicated, user_id=1)
+
+    assert await read_titles(replicated, user_id=1) == ["replica"]
+
+
+async def test_failed_replica_is_retried_on_the_primary(make_database):
+    # SQLite cannot create a database in a missing directory.
+    helper = await make_database(replicas=["missing/replica.db"])
+    await insert_task(helper.engine, "primary", user_id=1)
+
+    assert await read_titles(helper, user_id=1) == ["primary"]
+    assert helper.replicas.get_engine() is None
+    # The unhealthy replica is skipped until its next health check.
+    assert await read_titles(helper, user_id=1) == ["primary"]
+
+
+class PostgresConnection:
+    """
+    Records the SQL run when a transaction begins.
+    """
+
+    dialect = SimpleNamespace(name="postgresql")
+
+    def __init__(self) -> None:
+        self.statements = []
+
+    def exec_driver_sql(self, statement: str) -> None:
+        self.statements.append(statement)
+
+
+@pytest.mark.parametrize(
+    ("deadline", "sets_timeout"),
+    [
+        # The default of the pool ends the statements at the deadline.
+        (10, False),
+        (5, True),
+        (30, True),
+        (None, False),
+    ],
+)
+def test_statement_timeout_is_set_unless_the_default_fits(deadline, sets_timeout):
+    session = SimpleNamespace(db_helper=SimpleNamespace(statement_timeout=10))
+    connection = PostgresConnection()
+    token = start_deadline(deadline)
+    try:
+        _bound_by_deadline(session, None, connection)
+    finally:
+        stop_deadline(token)
+
+    assert len(connection.statements) == sets_timeout
+    if sets_timeout:
+        assert connection.statements[0].startswith("SET LOCAL statement_timeout")
+
+
+async def test_writes_are_shared_with_other_processes(make_database):
+    shared = FakeRedis()
+    writer = await make_database(
+        replicas=["replica.db"], read_your_writes_window=60, redis=shared
+    )
+    # Another process that serves the same databases.
+    reader = await make_database(
+        replicas=["replica.db"], read_your_writes_window=60, redis=shared
+    )
+    await insert_task(reader.replicas.engines[0], "replica", user_id=1)
+
+    await write_task(writer, user_id=1)
+
+    assert await read_titles(reader, user_id=1) == ["written"]
+    assert await read_titles(reader, user_id=2) == []
@@ -0,0 +1,19 @@
+import pytest
+
+from api.core.config import settings
+from api.load_shedding import concurrency_limiter
+from api.metrics import http_requests
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_shed_requests_are_counted_with_the_other_requests(client, monkeypatch):
+    monkeypatch.setattr(settings.load_shedding, "enabled", True)
+    monkeypatch.setattr(concurrency_limiter, "try_acquire", lambda priority: False)
+    shed = http_requests.labels("GET", "/api/v1/tasks/", "503")
+    before = shed._value.get()
+
+    response = await client.get("/api/v1/tasks/")
+
+    assert response.status_code == 503
+    assert shed._value.get() == before + 1
@@ -0,0 +1,120 @@
+import pytest
+
+from api.db.query_profiler import assert_query_count
+
+pytestmark = pytest.mark.anyio
+
+PASSWORD = "Test#Pass1"
+
+
+@pytest.fixture
+async def tokens(client):
+    await client.post(
+        "/api/v1/auth/register", data={"username": "alice", "password": PASSWORD}
+    )
+    response = await client.post(
+        "/api/v1/auth/login", data={"username": "alice", "password": PASSWORD}
+    )
+    return response.json()
+
+
+@pytest.fixture
+def headers(tokens):
+    return {"Authorization": f"Bearer {tokens['access_token']}"}
+
+
+async def create_tasks(client, headers, count: int) -> None:
+    for number in range(count):
+        response = await client.post(
+            "/api/v1/tasks/",
+            data={
+                "title": f"Task {number}",
+                "description": "",
+                "status": "in_progress",
+            },
+            headers=headers,
+        )
+        assert response.status_code == 200
+
+
+async def test_register(client):
+    # The insert and the refresh of the created user.
+    with assert_query_count(2):
+        response = await client.post(
+            "/api/v1/auth/register", data={"username": "bob", "password": PASSWORD}
+        )
+    assert response.status_code == 200
+
+
+async def test_login(client, tokens):
+    with assert_query_count(1):
+        response = await client.post(
+            "/api/v1/auth/login", data={"username": "alice", "password": PASSWORD}
+        )
+    assert response.status_code == 200
+
+
+async def test_refresh(client, tokens):
+    headers = {"Authorization": f"Bearer {tokens['refresh_token']}"}
+    with assert_query_count(1):
+        response = await client.post("/api/v1/auth/refresh", headers=headers)
+    assert response.status_code == 200
+
+
+async def test_create_task(client, headers):
+    # The user, the position after the user's last task, the insert and
+    # the refresh of the created task.
+    with assert_query_count(4):
+        await create_tasks(client, headers, 1)
+
+
+@pytest.mark.parametrize("count", [1, 10])
+async def test_list_tasks_does_not_grow_with_the_tasks(client, headers, count):
+    await create_tasks(client, headers, count)
+
+    with assert_query_count(2):
+        response = await client.get(
+            "/api/v1/tasks/", params={"status_filter": "in_progress"}, headers=headers
+        )
+    assert len(response.json()["tasks"]) == count
+
+    with assert_query_count(2):
+        response = await client.get(
+            "/api/v1/tasks/",
+            params={"status_filter": "in_progress", "limit": 5},
+            headers=headers,
+        )
+    assert len(response.json()["tasks"]) == min(count, 5)
+
+
+async def test_update_task(client, headers):
+    await create_tasks(client, headers, 1)
+
+    with assert_query_count(3):
+        response = await client.put(
+            "/api/v1/tasks/id",
+            params={"id": 1},
+            data={"title": "Renamed", "description": "", "status": "completed"},
+            headers=headers,
+        )
+    assert response.status_code == 200
+
+
+async def test_move_task(client, headers):
+    await create_tasks(client, headers, 2)
+
+    # The user, the task, its new neighbours and the update.
+    with assert_query_count(4):
+        response = await client.patch("/api/v1/tasks/2/move", data={}, headers=headers)
+    assert response.status_code == 200
+
+
+async def test_delete_task(client, headers):
+    await create_tasks(client, headers, 1)
+
+    # The user, the task, its subtasks and the task itself.
+    with assert_query_count(4):
+        response = await client.delete(
+            "/api/v1/tasks/id", params={"id": 1}, headers=headers
+        )
+    assert response.status_code == 200
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+from fakeredis import FakeServer
+from fakeredis.aioredis import FakeRedis
+
+from api.db.read_coalescer import ReadCoalescer
+
+pytestmark = pytest.mark.anyio
+
+
+class Reads:
+    """
+    A read that counts its executions and blocks until released.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self) -> int:
+        self.count += 1
+        await self.release.wait()
+        return self.count
+
+
+async def wait_until(condition) -> None:
+    async def poll() -> None:
+        while not condition():
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(poll(), timeout=5)
+
+
+async def run_twice(coalescer: ReadCoalescer, read: Reads, between=None) -> None:
+    # Starts the same read twice, the second one while the first runs.
+    first = asyncio.create_task(coalescer.run(1, "tasks", read, "tasks"))
+    await asyncio.sleep(0.01)
+    if between is not None:
+        await between()
+    second = asyncio.create_task(coalescer.run(1, "tasks", read, "tasks"))
+    await asyncio.sleep(0.01)
+    read.release.set()
+    await asyncio.gather(first, second)
+
+
+@pytest.fixture
+async def workers():
+    """
+    Two coalescers of different processes listening on one Redis.
+    """
+    server = FakeServer()
+    coalescers = [
+        ReadCoalescer(
+            redis=FakeRedis(server=server, decode_responses=True),
+            health_check_interval=0.1,
+        )
+        for _ in range(2)
+    ]
+    for coalescer in coalescers:
+        coalescer.start()
+    await wait_until(lambda: all(coalescer._synced for coalescer in coalescers))
+    yield coalescers
+    for coalescer in coalescers:
+        await coalescer.stop()
+
+
+async def test_reads_are_shared_within_a_generation(workers):
+    read = Reads()
+
+    await run_twice(workers[0], read)
+
+    assert read.count == 1
+
+
+async def test_invalidation_reaches_the_other_workers(workers):
+    writer, reader = workers
+    read = Reads()
+
+    async def write() -> None:
+        await writer.invalidate(1)
+        await wait_until(lambda: 1 in reader._generations)
+
+    await run_twice(reader, read, between=write)
+
+    # The read started after the write of the other worker runs anew.
+    assert read.count == 2
+
+
+async def test_reads_are_not_shared_without_the_listener(workers):
+    coalescer = workers[0]
+    await coalescer.stop()
+    read = Reads()
+
+    await run_twice(coalescer, read)
+
+    assert read.count == 2
@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+from api.core.lazy import override
+from api.core.models import Task
+from api.db.read_coalescer import ReadCoalescer, read_coalescer
+from api.db.rebalancer import PositionRebalancer
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def helper(make_database):
+    previous = read_coalescer._instance
+    override(read_coalescer, ReadCoalescer())
+    yield await make_database()
+    override(read_coalescer, previous)
+
+
+async def test_users_that_stay_too_long_are_rebalanced_once_per_run(helper):
+    async with helper.get_session() as session:
+        session.add_all(
+            Task(
+                title="Task",
+                description="",
+                status="in_progress",
+                user_id=user_id,
+                position="a0V",
+            )
+            for user_id in (1, 2, 3)
+        )
+        await session.commit()
+    # Even the shortest keys are longer than the limit.
+    rebalancer = PositionRebalancer(helper, max_length=1, batch_size=2, interval=60)
+
+    assert await asyncio.wait_for(rebalancer.run_once(), timeout=5) == 3
+    async with helper.get_session() as session:
+        assert set(await session.scalars(select(Task.position))) == {"a0"}
@@ -0,0 +1,211 @@
+import asyncio
+import socket
+
+import pytest
+from aioredis.exceptions import ConnectionError as RedisConnectionError
+
+from api.core.config import settings
+from api.redis_client import (CircuitBreaker, RedisUnavailableError,
+                              create_redis)
+
+pytestmark = pytest.mark.anyio
+
+PASSWORD = "Test#Pass1"
+
+
+class FlakyRedis:
+    """
+    A Redis call that fails while `down` is set.
+    """
+
+    def __init__(self) -> None:
+        self.down = True
+        self.calls = 0
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        if self.down:
+            raise RedisConnectionError("Connection refused")
+        return "PONG"
+
+
+async def serve_get(reader, writer) -> None:
+    # A Redis server that replies to GET with the key itself, after
+    # a while for the key "slow", and to anything else with PONG.
+    while line := await reader.readline():
+        args = []
+        for _ in range(int(line[1:])):
+            await reader.readline()
+            args.append((await reader.readline()).strip())
+        if args[0].upper() == b"GET":
+            if args[1] == b"slow":
+                await asyncio.sleep(0.2)
+            writer.write(b"$%d\r\n%s\r\n" % (len(args[1]), args[1]))
+        else:
+            writer.write(b"+PONG\r\n")
+        await writer.drain()
+
+
+def unused_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def breaker():
+    return CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+
+@pytest.fixture
+def app_redis(breaker):
+    # Nothing listens on the port, so every call fails to connect.
+    return create_redis(f"redis://127.0.0.1:{unused_port()}", breaker=breaker)
+
+
+async def test_breaker_opens_after_consecutive_failures(breaker):
+    call = FlakyRedis()
+
+    for _ in range(2):
+        with pytest.raises(RedisUnavailableError):
+            await breaker.call(call)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # An open circuit fails fast without calling Redis.
+    with pytest.raises(RedisUnavailableError):
+        await breaker.call(call)
+    assert call.calls == 2
+    assert breaker.stats() == {
+        "state": "open",
+        "failures": 2,
+        "opened": 1,
+        "rejected": 1,
+    }
+
+
+async def test_probe_after_reset_timeout_closes_or_reopens(breaker, monkeypatch):
+    call = FlakyRedis()
+    for _ in range(2):
+        with pytest.raises(RedisUnavailableError):
+            await breaker.call(call)
+
+    monkeypatch.setattr(breaker, "reset_timeout", 0)
+    # The failed probe opens the circuit again at once.
+    with pytest.raises(RedisUnavailableError):
+        await breaker.call(call)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert call.calls == 3
+
+    call.down = False
+    assert await breaker.call(call) == "PONG"
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+
+
+async def test_half_open_circuit_lets_one_probe_through(breaker, monkeypatch):
+    call = FlakyRedis()
+    for _ in range(2):
+        with pytest.raises(RedisUnavailableError):
+            await breaker.call(call)
+    monkeypatch.setattr(breaker, "reset_timeout", 0)
+
+    async def probe():
+        # Another call made while the probe is in flight is rejected.
+        with pytest.raises(RedisUnavailableError):
+            await breaker.call(call)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        return "PONG"
+
+    assert await breaker.call(probe) == "PONG"
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert call.calls == 2
+
+
+async def test_command_errors_do_not_open_the_circuit(breaker):
+    async def wrong_type():
+        raise ValueError("WRONGTYPE")
+
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            await breaker.call(wrong_type)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+async def test_client_fails_fast_while_redis_is_down(app_redis, breaker):
+    for _ in range(2):
+        with pytest.raises(RedisUnavailableError):
+            await app_redis.get("key")
+    assert breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(RedisUnavailableError):
+        async with app_redis.pipeline() as pipe:
+            pipe.get("key")
+            await pipe.execute()
+    assert breaker.rejected == 1
+
+
+async def login(client) -> dict:
+    await client.post(
+        "/api/v1/auth/register", data={"username": "alice", "password": PASSWORD}
+    )
+    response = await client.post(
+        "/api/v1/auth/login", data={"username": "alice", "password": PASSWORD}
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+async def test_login_issues_tokens_while_redis_is_down(client, breaker):
+    tokens = await login(client)
+
+    assert tokens["access_token"] and tokens["refresh_token"]
+    assert breaker.failures == 1
+
+
+async def test_refresh_falls_back_to_the_stateless_check(client, monkeypatch):
+    tokens = await login(client)
+    headers = {"Authorization": f"Bearer {tokens['refresh_token']}"}
+
+    response = await client.post("/api/v1/auth/refresh", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["access_token"]
+
+    monkeypatch.setattr(settings.redis_settings, "stateless_refresh_fallback", False)
+    response = await client.post("/api/v1/auth/refresh", headers=headers)
+    assert response.status_code == 503
+
+
+async def test_requests_that_need_redis_answer_503(client, breaker):
+    tokens = await login(client)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    response = await client.get("/api/v1/jobs/unknown", headers=headers)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(
+        int(settings.redis_settings.circuit_breaker_reset_timeout)
+    )
+    assert response.json()["error_type"] == "RedisUnavailableError"
+
+
+async def test_cancelled_command_does_not_leave_its_reply():
+    server = await asyncio.start_server(serve_get, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    client = create_redis(f"redis://127.0.0.1:{port}", max_connections=1)
+    try:
+        slow = asyncio.create_task(client.get("slow"))
+        await asyncio.sleep(0.05)
+        # Cancelled again while aioredis closes the connection, as when
+        # the request is cancelled after the deadline of the command.
+        while not slow.done():
+            slow.cancel()
+            await asyncio.sleep(0)
+        with pytest.raises(asyncio.CancelledError):
+            await slow
+        await asyncio.sleep(0.3)
+
+        assert await client.get("fast") == "fast"
+    finally:
+        await client.connection_pool.disconnect()
+        server.close()
+        await server.wait_closed()
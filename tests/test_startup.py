@@ -0,0 +1,62 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from api.startup import measure_import_time
+
+# The self time of the modules of `api`. The third-party packages they
+# import take longer and vary more between machines.
+API_IMPORT_BUDGET_MS = 500
+
+CHECK_LAZY_OBJECTS = """
+import json
+
+import api.main
+from api.core.config import settings
+from api.core.lazy import is_resolved
+from api.db.dbhelper import db_helper
+from api.redis_client import redis, redis_cache
+
+print(json.dumps({
+    "settings": is_resolved(settings),
+    "db_helper": is_resolved(db_helper),
+    "redis": is_resolved(redis),
+    "redis_cache": is_resolved(redis_cache),
+}))
+"""
+
+
+def test_import_of_the_application_is_within_budget():
+    total_ms, packages = measure_import_time("api.main")
+
+    api_ms = next(self_ms for self_ms, _, name in packages if name == "api")
+    assert 0 < api_ms <= total_ms
+    assert api_ms < API_IMPORT_BUDGET_MS
+
+
+def test_import_does_not_load_settings_or_create_clients(tmp_path):
+    # Without the required settings in the environment, loading them
+    # at import time would fail.
+    env = {
+        name: value
+        for name, value in os.environ.items()
+        if not name.startswith(("DB_", "REDIS_"))
+    }
+    env["PYTHONPATH"] = str(Path(__file__).parents[1])
+    process = subprocess.run(
+        [sys.executable, "-c", CHECK_LAZY_OBJECTS],
+        capture_output=True,
+        text=True,
+        cwd=tmp_path,
+        env=env,
+        check=True,
+    )
+
+    assert json.loads(process.stdout) == {
+        "settings": False,
+        "db_helper": False,
+        "redis": False,
+        "redis_cache": False,
+    }
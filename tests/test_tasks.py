@@ -0,0 +1,76 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import select
+
+from api.core.models import Task, TaskArchive
+from api.db.dbhelper import db_helper
+
+pytestmark = pytest.mark.anyio
+
+PASSWORD = "Test#Pass1"
+
+
+async def login(client, username: str) -> dict:
+    await client.post(
+        "/api/v1/auth/register", data={"username": username, "password": PASSWORD}
+    )
+    response = await client.post(
+        "/api/v1/auth/login", data={"username": username, "password": PASSWORD}
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+async def alice(client):
+    return await login(client, "alice")
+
+
+@pytest.fixture
+async def bob(client):
+    return await login(client, "bob")
+
+
+async def archive_task(user_id: int, task_id: int) -> None:
+    async with db_helper.get_session() as session:
+        session.add(
+            TaskArchive(
+                id=task_id,
+                title="Archived",
+                description="",
+                status="completed",
+                tags=[],
+                user_id=user_id,
+                updated_at=datetime.now(timezone.utc),
+            )
+        )
+        await session.commit()
+
+
+async def test_users_cannot_change_tasks_of_others(client, alice, bob):
+    await client.post(
+        "/api/v1/tasks/",
+        data={"title": "Alice's", "description": "", "status": "in_progress"},
+        headers=alice,
+    )
+    async with db_helper.get_session() as session:
+        task = await session.scalar(select(Task))
+    await archive_task(task.user_id, 100)
+
+    for task_id in (task.id, 100):
+        response = await client.put(
+            "/api/v1/tasks/id",
+            params={"id": task_id},
+            data={"title": "Bob's", "description": ""},
+            headers=bob,
+        )
+        assert response.status_code == 404
+        response = await client.delete(
+            "/api/v1/tasks/id", params={"id": task_id}, headers=bob
+        )
+        assert response.status_code == 404
+
+    async with db_helper.get_session() as session:
+        assert await session.scalar(select(Task.title)) == "Alice's"
+        # The archived task is neither restored nor deleted.
+        assert await session.scalar(select(TaskArchive.title)) == "Archived"
@@ -0,0 +1,55 @@
+import io
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from api.core.config import settings
+from api.core.lazy import override
+from api.core.models import Task
+from api.db import tasks_qr
+from api.db.read_coalescer import ReadCoalescer, read_coalescer
+from api.tasks_import import import_tasks
+
+pytestmark = pytest.mark.anyio
+
+FILE = b"""{"title": "first", "description": ""}
+[]
+{"title": "second", "description": ""}
+{"title": "third", "description": ""}
+"""
+
+
+@pytest.fixture
+async def database(make_database, monkeypatch):
+    previous = read_coalescer._instance
+    override(read_coalescer, ReadCoalescer())
+    monkeypatch.setattr(settings.jobs, "import_chunk_size", 2)
+
+    async def copy_tasks(session, rows):
+        # SQLite has no COPY, the rows are inserted in the same transaction.
+        columns = ("title", "description", "status", "tags", "user_id")
+        await session.execute(
+            insert(Task),
+            [dict(zip(columns, row), position=f"a{i}") for i, row in enumerate(rows)],
+        )
+        return len(rows)
+
+    monkeypatch.setattr(tasks_qr, "copy_tasks", copy_tasks)
+    yield await make_database()
+    override(read_coalescer, previous)
+
+
+async def test_interrupted_import_is_resumed_after_the_committed_chunk(database):
+    async def crash(**progress):
+        raise RuntimeError("The worker died")
+
+    # The first chunk is committed before the progress is reported.
+    with pytest.raises(RuntimeError):
+        await import_tasks(io.BytesIO(FILE), "ndjson", 1, "job", on_progress=crash)
+
+    report = await import_tasks(io.BytesIO(FILE), "ndjson", 1, "job")
+
+    assert (report.imported, report.failed) == (3, 1)
+    assert [error["line"] for error in report.errors] == [2]
+    async with database.get_session() as session:
+        assert await session.scalar(select(func.count()).select_from(Task)) == 3
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+from fakeredis.aioredis import FakeRedis
+
+from api.core.config import settings
+from api.jobs.queue import (JOB_HANDLERS, JobHandler, enqueue, get_job,
+                            job_key, queue_key)
+from api.worker import Worker
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def redis():
+    return FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def handler_calls(monkeypatch):
+    """
+    Register the "test" job, whose handler records its contexts.
+    """
+    calls = []
+
+    async def handler(ctx, delay=0):
+        calls.append(ctx)
+        await asyncio.sleep(delay)
+        return "done"
+
+    monkeypatch.setitem(JOB_HANDLERS, "test", JobHandler(handler, max_attempts=None))
+    return calls
+
+
+async def claim(redis, payload=None):
+    # The claim script needs Lua, which fakeredis runs only with lupa.
+    job_id = await enqueue(redis, "test", payload)
+    await redis.lrem(queue_key("ready"), 1, job_id)
+    await redis.zadd(queue_key("inflight"), {job_id: 0})
+    return job_id
+
+
+async def test_job_is_released_after_its_last_heartbeat(
+    redis, handler_calls, monkeypatch
+):
+    monkeypatch.setattr(settings.jobs, "visibility_timeout", 0.03)
+    job_id = await claim(redis, {"delay": 0.1})
+
+    await Worker(redis, concurrency=1).run_job(job_id)
+    await asyncio.sleep(0.05)
+
+    assert (await get_job(redis, job_id))["status"] == "succeeded"
+    assert await redis.zscore(queue_key("inflight"), job_id) is None
+    # A heartbeat sent after the release does not claim the job again.
+    await handler_calls[0].heartbeat()
+    assert await redis.zscore(queue_key("inflight"), job_id) is None
+
+
+async def test_job_out_of_attempts_fails_without_running(redis, handler_calls):
+    job_id = await claim(redis)
+    # Every attempt so far was lost with its worker.
+    await redis.hset(job_key(job_id), "attempts", settings.jobs.max_attempts)
+
+    await Worker(redis, concurrency=1).run_job(job_id)
+
+    state = await get_job(redis, job_id)
+    assert handler_calls == []
+    assert state["status"] == "failed"
+    assert await redis.zscore(queue_key("inflight"), job_id) is None
+    assert await redis.zscore(queue_key("delayed"), job_id) is None
+
+
+async def test_job_that_failed_for_good_is_cleaned_up(redis, monkeypatch):
+    cleaned_up = []
+
+    async def handler(ctx, path):
+        raise RuntimeError("Broken file")
+
+    async def clean_up(path):
+        cleaned_up.append(path)
+
+    monkeypatch.setitem(
+        JOB_HANDLERS, "test", JobHandler(handler, max_attempts=2, on_failure=clean_up)
+    )
+    job_id = await claim(redis, {"path": "upload.csv"})
+
+    await Worker(redis, concurrency=1).run_job(job_id)
+    # The file is kept for the retry.
+    assert cleaned_up == []
+    await redis.zadd(queue_key("inflight"), {job_id: 0})
+    await Worker(redis, concurrency=1).run_job(job_id)
+
+    assert (await get_job(redis, job_id))["status"] == "failed"
+    assert cleaned_up == ["upload.csv"]
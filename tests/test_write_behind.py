@@ -0,0 +1,77 @@
+from api.write_behind import merge_pending_writes
+
+
+def task(id, status="in_progress", tags=(), position=None):
+    return {
+        "id": id,
+        "title": f"Task {id}",
+        "description": "",
+        "status": status,
+        "tags": list(tags),
+        "parent_id": None,
+        "position": position or f"a{id}",
+    }
+
+
+def update(task_id, **data):
+    return {"op": "update", "task_id": task_id, "data": data, "queued_at": 0}
+
+
+def ids(tasks):
+    return [task["id"] for task in tasks]
+
+
+def test_update_moves_a_task_out_of_the_list():
+    tasks = [task(1), task(2)]
+
+    merged = merge_pending_writes(
+        tasks, [update(1, status="completed")], status="in_progress"
+    )
+
+    assert ids(merged) == [2]
+
+
+def test_update_moves_a_task_into_the_list_in_its_place():
+    tasks = [task(1), task(3)]
+    updated = [task(2, status="completed")]
+
+    merged = merge_pending_writes(
+        tasks,
+        [update(2, status="in_progress")],
+        status="in_progress",
+        updated=updated,
+    )
+
+    assert ids(merged) == [1, 2, 3]
+    assert merged[1]["status"] == "in_progress"
+
+
+def test_tag_filters_are_applied_after_the_updates():
+    tasks = [task(1, tags=["work"])]
+    updated = [task(2, tags=["home"])]
+
+    merged = merge_pending_writes(
+        tasks,
+        [update(1, tags=["home"]), update(2, tags=["work"])],
+        status="in_progress",
+        tags_all=["work"],
+        updated=updated,
+    )
+
+    assert ids(merged) == [2]
+
+
+def test_created_tasks_come_last_and_deleted_ones_are_dropped():
+    tasks = [task(1), task(2)]
+    writes = [
+        {"op": "create", "data": {"title": "New", "status": "in_progress"}},
+        {"op": "delete", "task_id": 1},
+    ]
+
+    merged = merge_pending_writes(tasks, writes, status="in_progress")
+    assert ids(merged) == [2, None]
+
+    merged = merge_pending_writes(
+        [task(2)], writes, status="in_progress", include_created=False
+    )
+    assert ids(merged) == [2]
@@ -0,0 +1,137 @@
+import pytest
+from fakeredis.aioredis import FakeRedis
+from sqlalchemy import select
+
+from api.core.config import settings
+from api.core.lazy import override
+from api.core.models import Task
+from api.db.read_coalescer import ReadCoalescer, read_coalescer
+from api.redis_client import RedisUnavailableError
+from api.write_behind import enqueue_task_write, pending_task_writes
+from api.write_behind.worker import WriteBehindWorker
+
+pytestmark = pytest.mark.anyio
+
+CREATED = {"title": "created", "description": "", "status": "in_progress"}
+
+
+@pytest.fixture
+async def worker(make_database):
+    previous = read_coalescer._instance
+    override(read_coalescer, ReadCoalescer())
+    worker = WriteBehindWorker(
+        FakeRedis(decode_responses=True), await make_database(), consumer="test"
+    )
+    await worker.ensure_group()
+    yield worker
+    override(read_coalescer, previous)
+
+
+async def deliver(worker: WriteBehindWorker) -> list[tuple[str, dict]]:
+    # Reads the new writes, as the loop of the worker does.
+    response = await worker.redis.xreadgroup(
+        worker.settings.group, worker.consumer, {worker.settings.stream: ">"}
+    )
+    return [entry for _, entries in response for entry in entries]
+
+
+async def add_task(worker: WriteBehindWorker, user_id: int, title: str) -> int:
+    async with worker.db_helper.get_session() as session:
+        task = Task(
+            title=title,
+            description="",
+            status="in_progress",
+            user_id=user_id,
+            position="a0",
+        )
+        session.add(task)
+        await session.commit()
+        return task.id
+
+
+async def titles(worker: WriteBehindWorker) -> list[str]:
+    async with worker.db_helper.get_session() as session:
+        return list(await session.scalars(select(Task.title).order_by(Task.id)))
+
+
+async def unacknowledged(worker: WriteBehindWorker) -> int:
+    pending = await worker.redis.xpending(worker.settings.stream, worker.settings.group)
+    return pending["pending"]
+
+
+async def test_applied_writes_are_acknowledged(worker):
+    await enqueue_task_write(worker.redis, "create", 1, data=CREATED)
+
+    await worker.apply(await deliver(worker))
+
+    assert await titles(worker) == ["created"]
+    assert await unacknowledged(worker) == 0
+    assert await pending_task_writes(worker.redis, 1) == []
+
+
+async def test_write_delivered_again_is_applied_once(worker, monkeypatch):
+    monkeypatch.setattr(settings.write_behind, "retry_idle_ms", 0)
+    await enqueue_task_write(worker.redis, "create", 1, data=CREATED)
+    acknowledge = worker.acknowledge
+
+    async def lose_acknowledgement(entries):
+        raise RedisUnavailableError("Connection lost")
+
+    monkeypatch.setattr(worker, "acknowledge", lose_acknowledgement)
+    with pytest.raises(RedisUnavailableError):
+        await worker.apply(await deliver(worker))
+    monkeypatch.setattr(worker, "acknowledge", acknowledge)
+
+    await worker.retry_stale()
+
+    assert await titles(worker) == ["created"]
+    assert await unacknowledged(worker) == 0
+
+
+async def test_retried_write_does_not_overwrite_a_newer_one(worker):
+    task_id = await add_task(worker, 1, "original")
+    for title in ("older", "newer"):
+        await enqueue_task_write(
+            worker.redis, "update", 1, task_id=task_id, data={"title": title}
+        )
+    older, newer = await deliver(worker)
+
+    # The older write failed and is retried after the newer one.
+    await worker.apply([newer])
+    await worker.apply([older])
+
+    assert await titles(worker) == ["newer"]
+    assert await unacknowledged(worker) == 0
+
+
+async def test_writes_do_not_change_tasks_of_other_users(worker):
+    task_id = await add_task(worker, 2, "not yours")
+    await enqueue_task_write(
+        worker.redis, "update", 1, task_id=task_id, data={"title": "changed"}
+    )
+    await enqueue_task_write(worker.redis, "delete", 1, task_id=task_id)
+
+    await worker.apply(await deliver(worker))
+
+    assert await titles(worker) == ["not yours"]
+
+
+async def test_failing_write_is_moved_to_the_dead_letter_stream(worker, monkeypatch):
+    monkeypatch.setattr(settings.write_behind, "retry_idle_ms", 0)
+    monkeypatch.setattr(settings.write_behind, "max_retries", 2)
+    task_id = await add_task(worker, 1, "original")
+    await enqueue_task_write(
+        worker.redis, "update", 1, task_id=task_id, data={"no_such_column": 1}
+    )
+
+    await worker.apply(await deliver(worker))
+    assert await unacknowledged(worker) == 1
+    # The second delivery fails too, the third one gives up.
+    await worker.retry_stale()
+    await worker.retry_stale()
+
+    assert await unacknowledged(worker) == 0
+    dead = await worker.redis.xrange(worker.settings.dead_letter_stream)
+    assert len(dead) == 1
+    assert await pending_task_writes(worker.redis, 1) == []
+    assert await titles(worker) == ["original"]
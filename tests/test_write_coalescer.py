@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+
+from api.core import schemas
+from api.core.deadline import DeadlineExceeded, start_deadline
+from api.core.models import Task
+from api.db.write_coalescer import TaskInsertCoalescer
+
+pytestmark = pytest.mark.anyio
+
+
+async def insert_task(
+    coalescer: TaskInsertCoalescer, user_id: int, deadline: float | None
+) -> int:
+    # Runs as its own task, so the deadline is that of one request.
+    start_deadline(deadline)
+    return await coalescer.insert(
+        user_id, schemas.TaskCreate(title=f"Task of {user_id}", description="")
+    )
+
+
+async def test_batch_is_not_bound_to_the_deadline_of_one_caller(make_database):
+    helper = await make_database()
+    # The timer is started by the caller whose deadline passes before
+    # the batch is written.
+    coalescer = TaskInsertCoalescer(helper, max_delay_ms=50)
+
+    hurried = asyncio.create_task(insert_task(coalescer, 1, deadline=0.01))
+    await asyncio.sleep(0)
+    patient = asyncio.create_task(insert_task(coalescer, 2, deadline=None))
+
+    with pytest.raises(DeadlineExceeded):
+        await hurried
+    assert await patient
+    await coalescer.drain()
+    async with helper.get_session() as session:
+        # The task of the hurried caller is written all the same.
+        assert await session.scalar(select(func.count()).select_from(Task)) == 2